@@ -0,0 +1,91 @@
+'''
+Benchmark of the batch mode: the dashboards of several synthetic networks, built either with one
+`python -m vizchemoton` process per network (as a nightly script would do) or with a single
+`python -m vizchemoton batch` run over a pool of processes. Needs amk-tools to render the dashboards.
+
+Usage (from the repository root):
+    python benchmarks/bench_batch.py [--networks 12] [--size 1000] [--jobs 4] [--output results.json]
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+from bench_startup import ROOT, file_only_config
+
+
+def run(command, env):
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-m", "vizchemoton"] + command, env=env, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start, completed.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--networks", type=int, default=12, help="number of networks")
+    parser.add_argument("--size", type=int, default=1000, help="number of nodes of every network")
+    parser.add_argument("--jobs", type=int, default=4, help="processes of the batch run")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first synthetic network")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args()
+
+    if importlib.util.find_spec("RXVisualizer") is None:
+        print("## amk-tools not installed, the dashboards cannot be rendered")
+        return
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")]))
+    templates = synthetic.load_templates()
+    results = {"networks": args.networks, "size": args.size, "jobs": args.jobs}
+    with tempfile.TemporaryDirectory() as workdir:
+        base_file = file_only_config(workdir)
+        with open(base_file, "r") as fconfig:
+            base_config = yaml.safe_load(fconfig)
+        # the force-directed layout scales to the synthetic networks, kamada_kawai does not
+        base_config["graph"]["layout"] = "force_directed"
+        with open(base_file, "w") as fconfig:
+            yaml.safe_dump(base_config, fconfig)
+
+        network_dir = os.path.join(workdir, "networks")
+        os.makedirs(network_dir)
+        config_files = []
+        for ii in range(args.networks):
+            reactions, compounds = synthetic.generate_network(args.size, args.seed + ii, templates)
+            name = "net%03d_" % ii
+            synthetic.write_network(reactions, compounds, os.path.join(network_dir, name + "reactions.csv"),
+                                    os.path.join(network_dir, name + "compounds.json"))
+            base_config["files"]["reactions"]["path"] = os.path.join(network_dir, name + "reactions.csv")
+            base_config["files"]["compounds"]["path"] = os.path.join(network_dir, name + "compounds.json")
+            base_config["output"]["file"] = os.path.join(workdir, "single", name + ".html")
+            config_files.append(os.path.join(workdir, name + "config.yaml"))
+            with open(config_files[-1], "w") as fconfig:
+                yaml.safe_dump(base_config, fconfig)
+        os.makedirs(os.path.join(workdir, "single"))
+
+        start = time.perf_counter()
+        failures = sum(run(["-c", config_file], env)[1] != 0 for config_file in config_files)
+        results["separate_processes"] = {"wall_time": time.perf_counter() - start, "failed": failures}
+
+        wall_time, returncode = run(["-c", base_file, "batch", network_dir, "-o", os.path.join(workdir, "batch"),
+                                     "-j", str(args.jobs)], env)
+        results["batch"] = {"wall_time": wall_time, "failed": returncode != 0}
+
+    print("%-20s %10s %8s" % ("mode", "wall time", "failed"))
+    for mode in ["separate_processes", "batch"]:
+        print("%-20s %9.2fs %8s" % (mode, results[mode]["wall_time"], results[mode]["failed"]))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(results, fout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
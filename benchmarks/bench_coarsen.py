@@ -0,0 +1,101 @@
+'''
+Benchmark of the overview of coarsen.py on the bundled network and on synthetic ones of increasing size: the
+clustering and the graph of the clusters, then the layout of the overview, against the layout of the whole network
+with the force-directed layout. With bokeh and amk-tools installed, both dashboards are also written and their size
+is compared.
+
+Usage (from the repository root):
+    python benchmarks/bench_coarsen.py [--sizes 1000 10000 30000] [--methods community formula adduct]
+                                       [--max-nodes 300] [--output results.json]
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import importlib.util
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import synthetic
+from bench_pipeline import bundled_network
+from vizchemoton.process import build_compact_graph
+from vizchemoton.coarsen import cluster_nodes, overview_networkx
+from vizchemoton.layout import force_directed_layout
+
+
+def dashboard_mb(G, outfile):
+    # dashboard written with the force-directed layout, in MB
+    from vizchemoton.render import build_dashboard
+    build_dashboard(G, "bench", outfile, layout_function=force_directed_layout, verbose=False)
+    return os.path.getsize(outfile) / 1024.0 ** 2
+
+
+def run_case(reactions, compounds, methods, max_nodes, workdir, render):
+    G = build_compact_graph(reactions, compounds)
+    result = {"nodes": G.number_of_nodes(), "edges": G.number_of_edges()}
+    start = time.perf_counter()
+    H = G.to_networkx(lazy_geometry=True)
+    force_directed_layout(H, seed=0)
+    result["full"] = {"wall_time": time.perf_counter() - start}
+    if render:
+        result["full"]["html_mb"] = dashboard_mb(G.to_networkx(), os.path.join(workdir, "full.html"))
+    for method in methods:
+        start = time.perf_counter()
+        labels = cluster_nodes(G, method, max_nodes=max_nodes, verbose=False)
+        overview = overview_networkx(G, labels, lazy_geometry=True)
+        cluster_time = time.perf_counter() - start
+        force_directed_layout(overview, seed=0)
+        result[method] = {"wall_time": time.perf_counter() - start, "cluster_time": cluster_time,
+                          "clusters": overview.number_of_nodes(), "super_edges": overview.number_of_edges()}
+        if render:
+            result[method]["html_mb"] = dashboard_mb(overview_networkx(G, labels),
+                                                     os.path.join(workdir, "%s.html" % method))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 30000],
+                        help="number of nodes of the synthetic networks")
+    parser.add_argument("--methods", nargs="*", default=["community", "formula", "adduct"],
+                        help="coarsening methods")
+    parser.add_argument("--max-nodes", type=int, default=300, help="largest number of clusters")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic networks")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args()
+
+    render = importlib.util.find_spec("RXVisualizer") is not None and importlib.util.find_spec("bokeh") is not None
+    if not render:
+        print("## bokeh or amk-tools not installed, only the clustering and the layouts are timed")
+
+    templates = synthetic.load_templates()
+    all_results = dict()
+    cases = [("resources", bundled_network)]
+    cases += [("synthetic_%d" % size, lambda size=size: synthetic.generate_network(size, args.seed, templates))
+              for size in args.sizes]
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, build in cases:
+            reactions, compounds = build()
+            all_results[name] = run_case(reactions, compounds, args.methods, args.max_nodes, workdir, render)
+            print("## %s done" % name, flush=True)
+
+    print("%-18s %8s %10s" % ("case", "nodes", "full") + "".join(" %21s" % method for method in args.methods))
+    for name, res in all_results.items():
+        print("%-18s %8d %9.2fs" % (name, res["nodes"], res["full"]["wall_time"]) +
+              "".join(" %5d nodes %8.2fs" % (res[method]["clusters"], res[method]["wall_time"])
+                      for method in args.methods))
+    if render:
+        print("%-18s %9s" % ("html (MB)", "full") + "".join(" %10s" % method for method in args.methods))
+        for name, res in all_results.items():
+            print("%-18s %9.2f" % (name, res["full"]["html_mb"]) +
+                  "".join(" %10.2f" % res[method]["html_mb"] for method in args.methods))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(all_results, fout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
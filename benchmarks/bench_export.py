@@ -0,0 +1,118 @@
+'''
+Benchmark of the bulk export of export.py on the bundled network and on synthetic ones of increasing size: reading
+the compounds file and writing the XYZ archives and the manifest, from a json compounds file or from a compounds
+store, with one or several processes. The baseline is the export one would write with the helpers of process.py:
+every structure formatted on its own with xyz_list_to_xyz_block() and added to a single tar.gz archive.
+
+Usage (from the repository root):
+    python benchmarks/bench_export.py [--sizes 1000 10000 30000] [--jobs 4] [--archive-size 5000]
+                                      [--output results.json]
+'''
+
+import io
+import os
+import sys
+import json
+import time
+import tarfile
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import synthetic
+from bench_pipeline import bundled_network
+from vizchemoton.process import (read_compound_reactions_files, write_compound_reactions_files, scale_xyz_list,
+                                 xyz_list_to_xyz_block)
+from vizchemoton.export import export_network
+
+
+def baseline_export(compounds, archive):
+    # one XYZ file per entry structure, formatted one by one from the compounds dictionary
+    with tarfile.open(archive, "w:gz") as tar:
+        for entry in compounds.values():
+            crn_ids = entry["crn_id"] if isinstance(entry["crn_id"], list) else [entry["crn_id"]]
+            xyz_lists = entry["xyz"] if isinstance(entry["crn_id"], list) else [entry["xyz"]]
+            for crn_id, xyz in zip(crn_ids, xyz_lists):
+                data = ("%d\n%s\n%s\n" % (len(xyz), crn_id, xyz_list_to_xyz_block(scale_xyz_list(xyz)))).encode()
+                info = tarfile.TarInfo(crn_id + ".xyz")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+
+def archives_mb(paths):
+    return sum(os.path.getsize(path) for path in paths) / 1024.0 ** 2
+
+
+def run_case(name, reactions, compounds, jobs, archive_size, workdir):
+    reaction_file = os.path.join(workdir, "%s_reactions.csv" % name)
+    json_file = os.path.join(workdir, "%s_compounds.json" % name)
+    store_path = os.path.join(workdir, "%s_compounds" % name)
+    write_compound_reactions_files(reactions, compounds, reaction_file, json_file, verbose=False)
+    write_compound_reactions_files(reactions, compounds, reaction_file, store_path, compound_format="npy",
+                                   verbose=False)
+    result = {"reactions": len(reactions), "entries": len(compounds)}
+
+    start = time.perf_counter()
+    _reactions, file_compounds = read_compound_reactions_files(reaction_file, json_file, verbose=False)
+    baseline_file = os.path.join(workdir, "%s_baseline.tar.gz" % name)
+    baseline_export(file_compounds, baseline_file)
+    result["baseline"] = {"wall_time": time.perf_counter() - start, "archives_mb": archives_mb([baseline_file]),
+                          "manifest_mb": 0.0}
+
+    cases = [("json_1", json_file, "json", 1), ("npy_1", store_path, "npy", 1),
+             ("npy_%d" % jobs, store_path, "npy", jobs)]
+    for case, compound_file, compound_format, case_jobs in cases:
+        output_dir = os.path.join(workdir, "%s_%s" % (name, case))
+        start = time.perf_counter()
+        file_reactions, file_compounds = read_compound_reactions_files(reaction_file, compound_file,
+                                                                       compound_format=compound_format,
+                                                                       verbose=False)
+        manifest_file = export_network(file_reactions, file_compounds, output_dir, archive_size=archive_size,
+                                       jobs=case_jobs, verbose=False)
+        wall_time = time.perf_counter() - start
+        with open(manifest_file, "r") as fmanifest:
+            manifest = json.load(fmanifest)
+        result[case] = {"wall_time": wall_time, "structures": len(manifest["structures"]),
+                        "archives_mb": archives_mb([os.path.join(output_dir, archive)
+                                                    for archive in manifest["archives"]]),
+                        "manifest_mb": archives_mb([manifest_file])}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 30000],
+                        help="number of nodes of the synthetic networks")
+    parser.add_argument("--jobs", type=int, default=4, help="processes of the parallel export")
+    parser.add_argument("--archive-size", type=int, default=5000, help="number of XYZ files per archive")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic networks")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args()
+
+    templates = synthetic.load_templates()
+    all_results = dict()
+    cases = [("resources", bundled_network)]
+    cases += [("synthetic_%d" % size, lambda size=size: synthetic.generate_network(size, args.seed, templates))
+              for size in args.sizes]
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, build in cases:
+            reactions, compounds = build()
+            all_results[name] = run_case(name, reactions, compounds, args.jobs, args.archive_size, workdir)
+            print("## %s done" % name, flush=True)
+
+    modes = ["baseline", "json_1", "npy_1", "npy_%d" % args.jobs]
+    print("%-18s %10s " % ("case", "structures") + " ".join("%10s" % mode for mode in modes) +
+          " %12s %12s %12s" % ("baseline_MB", "archives_MB", "manifest_MB"))
+    for name, res in all_results.items():
+        print("%-18s %10d " % (name, res["json_1"]["structures"]) +
+              " ".join("%9.2fs" % res[mode]["wall_time"] for mode in modes) +
+              " %12.2f %12.2f %12.2f" % (res["baseline"]["archives_mb"], res["npy_1"]["archives_mb"],
+                                         res["npy_1"]["manifest_mb"]))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(all_results, fout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+'''
+Benchmark of the extraction backends on the bundled network and on synthetic networks, for several simulated
+round-trip latencies of the database: the SCINE backend (get_reactions_and_compounds, one call per object and
+field) and the async backend (get_reactions_and_compounds_async, batched '$in' queries over a connection pool).
+Both backends run against in-memory fakes of the database (fake_scine and fake_mongo) serving the same content,
+and their reactions and compounds are checked to be identical. The pathfinder graph is either read from its
+export (pathfinder mode 'read') or built from the database and exported by both backends (mode 'write').
+
+Usage (from the repository root):
+    python benchmarks/bench_extract.py [--sizes 1000 10000] [--latencies 0 0.0005 0.002] [--pool-size 10]
+                                       [--workers 1] [--pathfinder read] [--output results.json]
+'''
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import synthetic
+import fake_scine
+import fake_mongo
+from bench_pipeline import DICT_METHOD, bundled_network
+
+
+def run_case(name, reactions, compounds, latencies, pool_size=10, workers=1, pathfinder="read", workdir="."):
+    """
+    Runs both extraction backends on a network for every latency.
+
+    Output:
+    - results (dict): mapping latency -> {'scine': {...}, 'async': {...}} with wall times and round trips.
+    """
+    content = synthetic.database_content(reactions, compounds)
+    pathfinder_file = os.path.join(workdir, "%s_pathfinder.json" % name)
+    if pathfinder == "read":
+        with open(pathfinder_file, "w") as fpath:
+            json.dump(content["pathfinder"], fpath)
+        pathfinder_kwargs = dict(read_pathfinder=pathfinder_file)
+    else:
+        pathfinder_kwargs = dict(write_pathfinder=pathfinder_file)
+
+    results = {"nodes": len({nd for row in reactions for nd in row[:2]}), "reactions": len(reactions),
+               "latencies": dict()}
+    for latency in latencies:
+        # the fake database has to be in place before vizchemoton (and SCINE) is imported
+        fake_scine.install(content, latency=latency)
+        fake_mongo.install(content, latency=latency)
+        from vizchemoton import vizchemoton_module as vm
+
+        start = time.perf_counter()
+        scine_output = vm.get_reactions_and_compounds("bench", "localhost", 27017, DICT_METHOD, workers=workers,
+                                                      verbose=False, **pathfinder_kwargs)
+        scine_time = time.perf_counter() - start
+        scine_calls = sum(fake_scine.CALLS.values())
+
+        fake_scine.CALLS.clear()
+        start = time.perf_counter()
+        async_output = asyncio.run(vm.get_reactions_and_compounds_async("bench", "localhost", 27017, DICT_METHOD,
+                                                                        pool_size=pool_size, verbose=False,
+                                                                        **pathfinder_kwargs))
+        async_time = time.perf_counter() - start
+        if async_output != scine_output:
+            raise RuntimeError("The backends extracted different networks for %s" % name)
+
+        results["latencies"][str(latency)] = {
+            "scine": {"wall_time": scine_time, "round_trips": scine_calls},
+            "async": {"wall_time": async_time, "round_trips": sum(fake_mongo.QUERIES.values()) +
+                      sum(fake_scine.CALLS.values()), "max_in_flight": fake_mongo.STATS["max_in_flight"]}}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000],
+                        help="number of nodes of the synthetic networks")
+    parser.add_argument("--latencies", type=float, nargs="+", default=[0.0, 0.0005, 0.002],
+                        help="simulated round-trip times of the database, in seconds")
+    parser.add_argument("--pool-size", type=int, default=10, help="connections of the async backend")
+    parser.add_argument("--workers", type=int, default=1, help="processes of the SCINE backend")
+    parser.add_argument("--pathfinder", default="read", choices=["read", "write"],
+                        help="read the exported pathfinder graph, or build and export it")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic networks")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args()
+
+    templates = synthetic.load_templates()
+    all_results = dict()
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [("resources", bundled_network)]
+        cases += [("synthetic_%d" % size, lambda size=size: synthetic.generate_network(size, args.seed, templates))
+                  for size in args.sizes]
+        for name, build in cases:
+            reactions, compounds = build()
+            all_results[name] = run_case(name, reactions, compounds, args.latencies, pool_size=args.pool_size,
+                                         workers=args.workers, pathfinder=args.pathfinder, workdir=workdir)
+            print("## %s done" % name, flush=True)
+
+    print("%-16s %9s %9s  %12s %12s  %12s %12s %8s" % ("case", "edges", "latency", "scine", "trips", "async",
+                                                         "trips", "speedup"))
+    for name, res in all_results.items():
+        for latency, stats in res["latencies"].items():
+            print("%-16s %9d %8.1fms  %11.3fs %12d  %11.3fs %12d %7.1fx" % (
+                name, res["reactions"], 1000 * float(latency), stats["scine"]["wall_time"],
+                stats["scine"]["round_trips"], stats["async"]["wall_time"], stats["async"]["round_trips"],
+                stats["scine"]["wall_time"] / stats["async"]["wall_time"]))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(all_results, fout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
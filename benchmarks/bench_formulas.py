@@ -0,0 +1,111 @@
+'''
+Benchmark of the molecular formulas of all nodes and TSs of a network, on the bundled network and on synthetic
+networks of increasing size: the former computation (a Counter over the labels of every fragment of every entry),
+the formulas memoized per structure from compounds.json, and the formula column of the compounds store. The time of
+build_compact_graph() is reported for both kinds of compounds files as well.
+
+Usage (from the repository root):
+    python benchmarks/bench_formulas.py [--sizes 10000 100000] [--repeat 3] [--output results.json]
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import synthetic
+from vizchemoton import formulas
+from vizchemoton.process import (BARRIERLESS, read_compound_reactions_files, write_compound_reactions_files,
+                                 compound_labels, entry_formulas, build_compact_graph)
+
+
+def reference_formula(labels):
+    # formula_from_xyz_block before memoization
+    formula = ""
+    for atom, ct in sorted(Counter(labels).items()):
+        formula += atom if ct == 1 else "%s%d" % (atom, ct)
+    return formula
+
+
+def best_time(function, repeat):
+    """
+    Minimum wall time over several runs, starting every run with empty formula caches.
+    """
+    times = []
+    for _ in range(repeat):
+        formulas.element_counts.cache_clear()
+        formulas.formula_from_counts.cache_clear()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_case(name, reactions, compounds, repeat, workdir):
+    reaction_file = os.path.join(workdir, "%s_reactions.csv" % name)
+    synthetic.write_network(reactions, compounds, reaction_file, os.path.join(workdir, "%s_compounds.json" % name))
+    reactions, json_compounds = read_compound_reactions_files(reaction_file,
+                                                              os.path.join(workdir, "%s_compounds.json" % name),
+                                                              verbose=False)
+    store_path = os.path.join(workdir, "%s_store" % name)
+    write_compound_reactions_files(reactions, json_compounds, reaction_file, store_path, compound_format="npy",
+                                   verbose=False)
+    _reactions, store = read_compound_reactions_files(reaction_file, store_path, compound_format="npy",
+                                                      verbose=False)
+    keys = list(dict.fromkeys(reactions[:, :2].ravel().tolist()))
+    keys += [ts for ts in reactions[:, 2].tolist() if ts != BARRIERLESS]
+
+    results = {"entries": len(keys), "fragments": sum(len(compound_labels(json_compounds, key)) for key in keys)}
+    results["per_entry"] = best_time(lambda: [";".join([reference_formula(labels) for labels in
+                                                        compound_labels(json_compounds, key)]) for key in keys],
+                                     repeat)
+    results["memoized"] = best_time(lambda: entry_formulas(json_compounds, keys), repeat)
+    # element counts computed by the last run, once per distinct sequence of labels
+    results["distinct_structures"] = formulas.element_counts.cache_info().misses
+    results["store_column"] = best_time(lambda: entry_formulas(store, keys), repeat)
+    results["compact_graph_json"] = best_time(lambda: build_compact_graph(reactions, json_compounds), repeat)
+    results["compact_graph_store"] = best_time(lambda: build_compact_graph(reactions, store), repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10000, 100000],
+                        help="number of nodes of the synthetic networks")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the fastest one is reported")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic networks")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args()
+
+    templates = synthetic.load_templates()
+    all_results = dict()
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(synthetic.RESOURCES, "compounds.json"), "r") as fcomp:
+            bundled_compounds = json.load(fcomp)
+        with open(os.path.join(synthetic.RESOURCES, "reactions.csv"), "r") as freac:
+            bundled_reactions = [line.strip().split(",") for line in freac]
+        cases = [("resources", lambda: (bundled_reactions, bundled_compounds))]
+        cases += [("synthetic_%d" % size, lambda size=size: synthetic.generate_network(size, args.seed, templates))
+                  for size in args.sizes]
+        for name, build in cases:
+            reactions, compounds = build()
+            all_results[name] = run_case(name, reactions, compounds, args.repeat, workdir)
+
+    columns = ["per_entry", "memoized", "store_column", "compact_graph_json", "compact_graph_store"]
+    print("%-16s %8s %9s %8s  " % ("case", "entries", "fragments", "distinct") +
+          " ".join("%19s" % col for col in columns))
+    for name, res in all_results.items():
+        print("%-16s %8d %9d %8d  " % (name, res["entries"], res["fragments"], res["distinct_structures"]) +
+              " ".join("%18.3fs" % res[col] for col in columns))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(all_results, fout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
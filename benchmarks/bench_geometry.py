@@ -0,0 +1,87 @@
+'''
+Benchmark of the batched geometry engine against the former per-molecule conversion (np.array -> per-atom list
+comprehension -> %-formatted string for every node, TS and adduct fragment).
+
+Usage (from the repository root):
+    python benchmarks/bench_geometry.py [--replicas N] [--repeat R]
+
+The bundled compounds are replicated N times to emulate larger networks.
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vizchemoton.geometry import BOHR_TO_ANGSTROM, geometry_blocks
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vizchemoton", "resources")
+
+
+def per_molecule_blocks(compound_list, dist_adduct=3.0):
+    """
+    Reference implementation: one structure at a time, as done by process_graph before the batched engine.
+    """
+    blocks = []
+    for comp in compound_list:
+        xyz_list = comp["xyz"] if isinstance(comp["crn_id"], list) else [comp["xyz"]]
+        xyz0_arr = np.array([item[1] for item in xyz_list[0]]) * BOHR_TO_ANGSTROM
+        cntr = xyz0_arr.mean(axis=0)
+        xyz_full = [[item[0], list(xyz0_arr[ii])] for ii, item in enumerate(xyz_list[0])]
+        for ii, xyz in enumerate(xyz_list[1:]):
+            displ_vec = cntr + (ii + 1) * dist_adduct
+            xyz_arr = np.array([item[1] for item in xyz]) * BOHR_TO_ANGSTROM + displ_vec
+            xyz_full += [[item[0], list(xyz_arr[jj])] for jj, item in enumerate(xyz)]
+        blocks.append("\n".join(["%s %.6f %.6f %.6f" % (item[0], *item[1]) for item in xyz_full]))
+    return blocks
+
+
+def batched_blocks(compound_list, dist_adduct=3.0):
+    fragment_lists = []
+    for comp in compound_list:
+        xyz_list = comp["xyz"] if isinstance(comp["crn_id"], list) else [comp["xyz"]]
+        fragment_lists.append([([item[0] for item in xyz], [item[1] for item in xyz]) for xyz in xyz_list])
+    return geometry_blocks(fragment_lists, dist_adduct)
+
+
+def best_time(function, args, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", type=int, default=10, help="number of copies of the bundled compounds")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions, the best time is reported")
+    args = parser.parse_args()
+
+    with open(os.path.join(RESOURCES, "compounds.json")) as fcomp:
+        compounds = list(json.load(fcomp).values())
+    compound_list = compounds * args.replicas
+    n_atoms = sum(len(xyz) for comp in compound_list
+                  for xyz in (comp["xyz"] if isinstance(comp["crn_id"], list) else [comp["xyz"]]))
+
+    t_ref, ref = best_time(per_molecule_blocks, (compound_list,), args.repeat)
+    t_new, new = best_time(batched_blocks, (compound_list,), args.repeat)
+
+    # the formatted values may only differ in the last digit through the summation order of adduct centers
+    max_diff = max(np.abs(np.array([line.split()[1:] for line in b1.split("\n")], dtype=float) -
+                          np.array([line.split()[1:] for line in b2.split("\n")], dtype=float)).max()
+                   for b1, b2 in zip(ref, new))
+
+    print("structures: %d, atoms: %d" % (len(compound_list), n_atoms))
+    print("per-molecule: %8.3f s" % t_ref)
+    print("batched:      %8.3f s  (x%.1f)" % (t_new, t_ref / t_new))
+    print("max. coordinate difference: %.1e A" % max_diff)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+'''
+Benchmark of the microkinetic simulation on the bundled network and on synthetic ones of increasing size. The
+networks of synthetic.py join random aggregates, so that their reactions do not conserve mass and their kinetics
+diverge; the networks here are grown from aggregates of 1 to 3 units instead, with isomerizations between aggregates
+of the same size and associations of a single unit with another aggregate (as adducts) into a larger one. Energies
+are drawn so that rate constants span from the barrierless limit down to timescales much longer than the simulation.
+
+The vectorized model (kinetics.KineticModel, BDF with the analytic sparse Jacobian) is compared with a loop over
+the reactions evaluating the rate equations one by one, integrated with BDF and a finite-difference Jacobian, on the
+networks up to --baseline-max reactions.
+
+Usage (from the repository root):
+    python benchmarks/bench_kinetics.py [--sizes 1000 10000 30000] [--baseline-max 3000] [--output results.json]
+'''
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+import numpy as np
+from scipy.integrate import solve_ivp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import synthetic
+from bench_pipeline import bundled_network
+from vizchemoton.process import build_compact_graph
+from vizchemoton.kinetics import KineticModel, simulate, eyring_rate_constants
+
+T_END = 3600.0
+# single units, as the few reagents of an exploration that most associations start from
+N_UNITS = 10
+# largest distance, in order of creation, between the aggregates of the extra isomerizations
+LOCAL_WINDOW = 20
+
+
+def kinetic_network(n_species, seed=0, templates=None):
+    """
+    Mass-conserving synthetic network, grown as the networks of synthetic.py: every new aggregate (of 1 to 3 units)
+    is formed from an earlier one, by isomerization of one of its size or by association of a single unit with one
+    of the size below, through an adduct. A few single units (N_UNITS) take part in all associations, and 10% of extra
+    isomerizations between nearby aggregates close cycles, so that adducts are about a third of the nodes and a
+    quarter of the reactions are barrierless, as in the bundled network.
+
+    Output:
+    - reactions (list), compounds (dict): as generate_network() of synthetic.py.
+    """
+    rng = random.Random(seed)
+    molecules, transition_states = templates or synthetic.load_templates()
+    compounds, by_size = dict(), {1: [], 2: [], 3: []}
+    counter = [1]
+
+    def new_index():
+        counter[0] += 1
+        return counter[0] - 1
+
+    def add_entry(prefix, energy, template, mongodb_id):
+        idx = new_index()
+        compounds[idx] = dict(crn_id=prefix + str(idx), mongodb_id=mongodb_id,
+                              **synthetic._structure(template, rng, energy))
+        return idx
+
+    def new_aggregate(size):
+        # relative energies in kJ/mol
+        prefix = "f" if size > 1 and rng.random() < synthetic.FLASK_FRACTION else "c"
+        idx = add_entry(prefix, rng.uniform(-40.0, 40.0) * size, rng.choice(molecules), synthetic._object_id(rng))
+        by_size[size].append(idx)
+        return idx
+
+    def adduct(members):
+        entry = {"crn_id": [compounds[mm]["crn_id"] for mm in members],
+                 "_mongodb_id": [compounds[mm]["mongodb_id"] for mm in members]}
+        entry["mongodb_id"] = "//".join(entry["_mongodb_id"])
+        for field in ["xyz", "charge", "multiplicity", "energy"] + list(synthetic.METHOD_FIELDS):
+            entry[field] = [compounds[mm][field] for mm in members]
+        idx = new_index()
+        compounds[idx] = entry
+        return idx
+
+    n_units = min(max(n_species // 20, 2), N_UNITS)
+    for _ in range(n_units):
+        new_aggregate(1)
+    new_aggregate(2)
+    pairs = [(adduct([by_size[1][0], by_size[1][1]]), by_size[2][0])]
+    for _ in range(n_species - n_units - 1):
+        size = rng.choice([2, 3]) if by_size[2] else 2
+        # association of a single unit with an aggregate of the size below, or isomerization
+        if rng.random() < 0.5:
+            members = [rng.choice(by_size[1]), rng.choice(by_size[size - 1])]
+            start = adduct(members)
+        else:
+            start = rng.choice(by_size[size]) if by_size[size] else adduct([rng.choice(by_size[1]),
+                                                                            rng.choice(by_size[size - 1])])
+        pairs.append((start, new_aggregate(size)))
+    for _ in range(n_species // 10):
+        # between aggregates found close in the exploration, as the extra reactions of the bundled network
+        size = rng.choice([2, 3])
+        if len(by_size[size]) > 1:
+            ii = rng.randrange(1, len(by_size[size]))
+            pairs.append((by_size[size][ii], by_size[size][max(ii - rng.randint(1, LOCAL_WINDOW), 0)]))
+
+    def node_energy(idx):
+        energy = compounds[idx]["energy"]
+        return sum(energy) if isinstance(energy, list) else energy
+
+    reactions = []
+    for n1, n2 in pairs:
+        if rng.random() < synthetic.BARRIERLESS_FRACTION:
+            reactions.append([n1, n2, None])
+            continue
+        e_ts = max(node_energy(n1), node_energy(n2)) + rng.uniform(40.0, 110.0)
+        reactions.append([n1, n2, add_entry("ts", e_ts, rng.choice(transition_states),
+                                            synthetic._object_id(rng) + ";")])
+    return reactions, compounds
+
+
+def loop_derivative(G, species_index, node_members):
+    # rate equations evaluated reaction by reaction, as a direct transcription of the network would do
+    steps = []
+    for (n1, n2), (b1, b2) in zip(G.edges.tolist(), G.barrier.tolist()):
+        for start, end, barrier in [(n1, n2, b1), (n2, n1, b2)]:
+            steps.append((float(eyring_rate_constants(barrier)), node_members[start], node_members[end]))
+
+    def derivative(_t, c):
+        dcdt = np.zeros(len(species_index))
+        for k, reactants, products in steps:
+            rate = k
+            for sp in reactants:
+                rate *= c[sp]
+            for sp in reactants:
+                dcdt[sp] -= rate
+            for sp in products:
+                dcdt[sp] += rate
+        return dcdt
+    return derivative
+
+
+def run_case(reactions, compounds, baseline):
+    G = build_compact_graph(reactions, compounds)
+    result = {"nodes": G.number_of_nodes(), "reactions": G.number_of_edges()}
+    start = time.perf_counter()
+    model = KineticModel(G)
+    result["model_time"] = time.perf_counter() - start
+    initial = {model.species[0]: 1.0, model.species[1]: 0.5}
+    start = time.perf_counter()
+    times, concentrations = simulate(model, initial, T_END)
+    result["vectorized"] = {"wall_time": time.perf_counter() - start}
+    result["species"] = model.n_species
+    if baseline:
+        node_members = [[sp for sp in row if sp < model.n_species] for row in model.members.tolist()]
+        derivative = loop_derivative(G, {name: ii for ii, name in enumerate(model.species)}, node_members)
+        start = time.perf_counter()
+        try:
+            solution = solve_ivp(derivative, (0.0, T_END), model.initial_concentrations(initial), method="BDF",
+                                 t_eval=times, rtol=1e-6, atol=1e-20)
+            success = bool(solution.success)
+        except ValueError:
+            # finite differences of the Jacobian overflowing
+            success = False
+        result["loop"] = {"wall_time": time.perf_counter() - start, "success": success}
+        if success:
+            result["loop"]["max_difference"] = float(np.abs(solution.y - concentrations).max())
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 30000],
+                        help="number of aggregates of the synthetic networks")
+    parser.add_argument("--baseline-max", type=int, default=3000,
+                        help="largest number of reactions simulated with the loop baseline")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic networks")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args()
+
+    templates = synthetic.load_templates()
+    all_results = dict()
+    cases = [("resources", bundled_network)]
+    cases += [("synthetic_%d" % size, lambda size=size: kinetic_network(size, args.seed, templates))
+              for size in args.sizes]
+    for name, build in cases:
+        reactions, compounds = build()
+        all_results[name] = run_case(reactions, compounds, len(reactions) <= args.baseline_max)
+        print("## %s done" % name, flush=True)
+
+    print("%-18s %8s %10s %9s %12s %12s" % ("case", "species", "reactions", "model", "vectorized", "loop"))
+    for name, res in all_results.items():
+        loop = "%11.2fs" % res["loop"]["wall_time"] if "loop" in res else "%12s" % "-"
+        print("%-18s %8d %10d %8.3fs %11.2fs %s" % (name, res["species"], res["reactions"], res["model_time"],
+                                                    res["vectorized"]["wall_time"], loop))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(all_results, fout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
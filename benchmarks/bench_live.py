@@ -0,0 +1,117 @@
+'''
+Benchmark of the updates of the live dashboard: synthetic networks are written without their last reactions, loaded
+by a LiveNetwork, and completed. The update of the live server (poll, delta rows and the data sent to one session)
+is compared with the static dashboard of the complete network written again by build_dashboard(). Needs bokeh and
+amk-tools.
+
+Usage (from the repository root):
+    python benchmarks/bench_live.py [--sizes 1000 10000] [--new 20] [--output results.json]
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import importlib.util
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import synthetic
+from bench_startup import ROOT
+
+
+class _Document:
+    # stands for the document of a browser session, applying the updates at once
+    def clear(self):
+        pass
+
+    def add_root(self, root):
+        pass
+
+    def add_next_tick_callback(self, callback):
+        callback()
+
+    def on_session_destroyed(self, callback):
+        pass
+
+
+def update_bytes(update):
+    # size of the rows and positions sent to a session, as json
+    content = [update["nodes"], list(update["edges"].values()), update["positions"]]
+    return len(json.dumps(content, default=str))
+
+
+def run_case(config, reactions, compounds, n_new):
+    from vizchemoton.__main__ import load_network_graph
+    from vizchemoton.live import LiveNetwork
+    from vizchemoton.layout import force_directed_layout
+    from vizchemoton.render import build_dashboard
+
+    reactions_file, compounds_file = config["files"]["reactions"]["path"], config["files"]["compounds"]["path"]
+    synthetic.write_network(reactions[:-n_new], compounds, reactions_file, compounds_file)
+    network = LiveNetwork(None, config)
+    network.load()
+    network.add_session(_Document())
+
+    synthetic.write_network(reactions, compounds, reactions_file, compounds_file)
+    start = time.perf_counter()
+    update = network.poll()
+    result = {"live": {"wall_time": time.perf_counter() - start, "sent_mb": update_bytes(update) / 1024.0 ** 2,
+                       "nodes": len(update["nodes"]), "edges": len(update["edges"])}}
+
+    start = time.perf_counter()
+    G = load_network_graph(config)
+    build_dashboard(G, "bench", config["output"]["file"], layout_function=force_directed_layout, verbose=False)
+    result["static"] = {"wall_time": time.perf_counter() - start,
+                        "sent_mb": os.path.getsize(config["output"]["file"]) / 1024.0 ** 2}
+    result["graph_nodes"] = G.number_of_nodes()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000],
+                        help="number of nodes of the synthetic networks")
+    parser.add_argument("--new", type=int, default=20, help="number of reactions added by the update")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic networks")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args()
+
+    if importlib.util.find_spec("RXVisualizer") is None or importlib.util.find_spec("bokeh") is None:
+        print("## bokeh or amk-tools not installed, the dashboards cannot be rendered")
+        return
+
+    with open(os.path.join(ROOT, "config.yaml"), "r") as fconfig:
+        config = yaml.safe_load(fconfig)
+    config["db"]["active"] = False
+    config["output"]["verbose"] = False
+    config["graph"]["layout"] = "force_directed"
+    config["graph"]["layout_cache"] = None
+    config["files"]["compounds"]["format"] = "json"
+
+    templates = synthetic.load_templates()
+    all_results = dict()
+    with tempfile.TemporaryDirectory() as workdir:
+        config["files"]["reactions"]["path"] = os.path.join(workdir, "reactions.csv")
+        config["files"]["compounds"]["path"] = os.path.join(workdir, "compounds.json")
+        config["output"]["file"] = os.path.join(workdir, "network.html")
+        for size in args.sizes:
+            reactions, compounds = synthetic.generate_network(size, args.seed, templates)
+            all_results["synthetic_%d" % size] = run_case(config, reactions, compounds, args.new)
+
+    print("%-18s %8s %14s  %19s %19s" % ("case", "nodes", "delta", "static", "live"))
+    for name, res in all_results.items():
+        print("%-18s %8d %6d/%-6d  " % (name, res["graph_nodes"], res["live"]["nodes"], res["live"]["edges"]) +
+              " ".join("%8.3fs %7.2fMB" % (res[mode]["wall_time"], res[mode]["sent_mb"])
+                       for mode in ["static", "live"]))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(all_results, fout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
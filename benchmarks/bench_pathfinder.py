@@ -0,0 +1,96 @@
+'''
+Benchmark of the pathfinder graph reading on the bundled export and on synthetic ones of increasing size: loading
+the whole json into a networkx DiGraph (as the pathfinder of Chemoton does) and listing its reaction nodes and
+aggregate types, against streaming the file into a PathfinderIndex. Wall time and peak traced memory are reported.
+
+Usage (from the repository root):
+    python benchmarks/bench_pathfinder.py [--sizes 10000 100000] [--output results.json]
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import networkx as nx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import synthetic
+from vizchemoton.pathfinder import read_pathfinder_index
+
+
+def networkx_index(pathfinder_file):
+    # the graph as built by Pathfinder.load_graph, then indexed as get_reactions_and_compounds did
+    with open(pathfinder_file, "r") as fpath:
+        graph_dict = json.load(fpath)
+    graph = nx.DiGraph()
+    for node, data in graph_dict.items():
+        graph.add_node(node, **{key: value for key, value in data.items() if not isinstance(value, dict)})
+    for node, data in graph_dict.items():
+        graph.add_edges_from((node, other, value) for other, value in data.items() if isinstance(value, dict))
+    reaction_nodes = [(node, data.get("elementary_step_id")) for node, data in graph.nodes(data=True)
+                      if ";0;" in node]
+    node_types = {node: data["type"] for node, data in graph.nodes(data=True) if "type" in data}
+    return reaction_nodes, node_types
+
+
+def streamed_index(pathfinder_file):
+    index = read_pathfinder_index(pathfinder_file)
+    return index.reaction_nodes(), index.node_types
+
+
+def measure(function, pathfinder_file):
+    start = time.perf_counter()
+    result = function(pathfinder_file)
+    wall_time = time.perf_counter() - start
+    tracemalloc.start()
+    function(pathfinder_file)
+    peak = tracemalloc.get_traced_memory()[1] / 1024.0 ** 2
+    tracemalloc.stop()
+    return result, {"wall_time": wall_time, "peak_mb": peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10000, 100000],
+                        help="number of nodes of the synthetic networks")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic networks")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args()
+
+    templates = synthetic.load_templates()
+    all_results = dict()
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [("resources", os.path.join(synthetic.RESOURCES, "crn_pathfinder.json"))]
+        for size in args.sizes:
+            reactions, compounds = synthetic.generate_network(size, args.seed, templates)
+            pathfinder_file = os.path.join(workdir, "synthetic_%d_pathfinder.json" % size)
+            with open(pathfinder_file, "w") as fpath:
+                json.dump(synthetic.database_content(reactions, compounds)["pathfinder"], fpath)
+            cases.append(("synthetic_%d" % size, pathfinder_file))
+        for name, pathfinder_file in cases:
+            reference, nx_stats = measure(networkx_index, pathfinder_file)
+            index, stream_stats = measure(streamed_index, pathfinder_file)
+            reaction_nodes, node_types = reference
+            if index[0] != reaction_nodes or any(index[1][node] != node_types[node] for node in index[1]):
+                raise RuntimeError("The streamed index differs from the networkx graph for %s" % name)
+            all_results[name] = {"file_mb": os.path.getsize(pathfinder_file) / 1024.0 ** 2,
+                                 "reaction_nodes": len(reaction_nodes), "networkx": nx_stats,
+                                 "streamed": stream_stats}
+
+    print("%-18s %9s %10s  %19s %19s" % ("case", "file", "reactions", "networkx", "streamed"))
+    for name, res in all_results.items():
+        print("%-18s %7.1fMB %10d  " % (name, res["file_mb"], res["reaction_nodes"]) +
+              " ".join("%8.3fs %7.1fMB" % (res[mode]["wall_time"], res[mode]["peak_mb"])
+                       for mode in ["networkx", "streamed"]))
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(all_results, fout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
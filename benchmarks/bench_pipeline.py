@@ -0,0 +1,170 @@
+'''
+Benchmark of every stage of the pipeline on the bundled network and on synthetic networks of increasing size:
+extraction from a (fake, in-memory) database, writing and reading the reactions and compounds files, process_graph,
+the array-backed graph, the force-directed layout and, if amk-tools is installed, the HTML dashboard.
+
+Usage (from the repository root):
+    python benchmarks/bench_pipeline.py [--sizes 1000 10000 100000] [--stages ...] [--workers W] [--memory]
+                                        [--output results.json]
+
+With --memory, every stage is run a second time under tracemalloc to report its peak allocated memory, so that the
+tracing does not distort the timings.
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import importlib.util
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import synthetic
+import fake_scine
+
+STAGES = ["extract", "write_files", "read_files", "process_graph", "process_graph_lazy", "compact_graph", "layout",
+          "render"]
+DICT_METHOD = {"method_family": "dft", "method": "lc-pbe", "basis_set": "def2-svp", "program": "orca"}
+
+
+def bundled_network():
+    """
+    The network in vizchemoton/resources, with integer indices as produced by the extraction.
+    """
+    with open(os.path.join(synthetic.RESOURCES, "compounds.json"), "r") as fcomp:
+        compounds = {int(key): value for key, value in json.load(fcomp).items()}
+    with open(os.path.join(synthetic.RESOURCES, "reactions.csv"), "r") as freac:
+        reactions = [[int(r), int(p), None if ts == "None" else int(ts)]
+                     for r, p, ts in (line.strip().split(",") for line in freac)]
+    return reactions, compounds
+
+
+def measure(function, memory=False):
+    """
+    Runs a stage and returns its result, wall time and, optionally, peak traced memory in MB from a second run.
+    """
+    start = time.perf_counter()
+    result = function()
+    wall_time = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1] / 1024.0 ** 2
+        tracemalloc.stop()
+    return result, wall_time, peak
+
+
+def run_case(name, reactions, compounds, stages, workers=1, memory=False, workdir="."):
+    """
+    Runs the selected stages on a network.
+
+    Output:
+    - results (dict): mapping stage -> {'wall_time': s, 'peak_mb': MB or None}, plus the size of the network.
+    """
+    # the fake database has to be in place before vizchemoton (and SCINE) is imported
+    content = synthetic.database_content(reactions, compounds)
+    fake_scine.install(content)
+    from vizchemoton import vizchemoton_module as vm
+    from vizchemoton.layout import force_directed_layout
+
+    reaction_file = os.path.join(workdir, "%s_reactions.csv" % name)
+    compound_file = os.path.join(workdir, "%s_compounds.json" % name)
+    pathfinder_file = os.path.join(workdir, "%s_pathfinder.json" % name)
+    with open(pathfinder_file, "w") as fpath:
+        json.dump(content["pathfinder"], fpath)
+    synthetic.write_network(reactions, compounds, reaction_file, compound_file)
+
+    results = {"nodes": len({nd for row in reactions for nd in row[:2]}), "reactions": len(reactions),
+               "compound_entries": len(compounds), "stages": dict()}
+    graph = {}
+
+    def record(stage, function):
+        result, wall_time, peak = measure(function, memory)
+        results["stages"][stage] = {"wall_time": wall_time, "peak_mb": peak}
+        return result
+
+    if "extract" in stages:
+        record("extract", lambda: vm.get_reactions_and_compounds(
+            "bench", "localhost", 27017, DICT_METHOD, read_pathfinder=pathfinder_file, workers=workers,
+            verbose=False))
+        results["stages"]["extract"]["db_calls"] = sum(fake_scine.CALLS.values()) // (2 if memory else 1)
+    if "write_files" in stages:
+        record("write_files", lambda: vm.write_compound_reactions_files(reactions, compounds, reaction_file,
+                                                                        compound_file, verbose=False))
+    file_reactions, file_compounds = record("read_files", lambda: vm.read_compound_reactions_files(
+        reaction_file, compound_file, verbose=False)) if "read_files" in stages else \
+        vm.read_compound_reactions_files(reaction_file, compound_file, verbose=False)
+    if "process_graph" in stages:
+        graph["G"] = record("process_graph", lambda: vm.process_graph(file_reactions, file_compounds))
+    if "process_graph_lazy" in stages:
+        record("process_graph_lazy", lambda: vm.process_graph(file_reactions, file_compounds, lazy_geometry=True))
+    if "compact_graph" in stages:
+        record("compact_graph", lambda: vm.build_compact_graph(file_reactions, file_compounds))
+    if "layout" in stages or "render" in stages:
+        if "G" not in graph:
+            graph["G"] = vm.process_graph(file_reactions, file_compounds)
+    if "layout" in stages:
+        graph["positions"] = record("layout", lambda: force_directed_layout(graph["G"], seed=0))
+    if "render" in stages:
+        if importlib.util.find_spec("RXVisualizer") is None:
+            print("## %s: amk-tools not installed, skipping the render stage" % name)
+        else:
+            positions = graph.get("positions") or force_directed_layout(graph["G"], seed=0)
+            html_file = os.path.join(workdir, "%s.html" % name)
+            record("render", lambda: vm.build_dashboard(graph["G"].copy(), name, html_file,
+                                                        layout_function=lambda G: positions, verbose=False))
+            results["html_mb"] = os.path.getsize(html_file) / 1024.0 ** 2
+    return results
+
+
+def print_table(all_results):
+    stages = [stage for stage in STAGES if any(stage in res["stages"] for res in all_results.values())]
+    print("%-12s %8s %8s  " % ("case", "nodes", "edges") + " ".join("%19s" % stage for stage in stages))
+    for name, res in all_results.items():
+        cells = []
+        for stage in stages:
+            stats = res["stages"].get(stage)
+            if stats is None:
+                cells.append("%19s" % "-")
+            elif stats["peak_mb"] is None:
+                cells.append("%17.3fs " % stats["wall_time"])
+            else:
+                cells.append("%8.3fs %7.1fMB" % (stats["wall_time"], stats["peak_mb"]))
+        print("%-12s %8d %8d  " % (name, res["nodes"], res["reactions"]) + " ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000, 100000],
+                        help="number of nodes of the synthetic networks")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="stages to be run")
+    parser.add_argument("--workers", type=int, default=1, help="processes for the extraction stage")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic networks")
+    parser.add_argument("--memory", action="store_true", help="also report the peak memory of every stage")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args()
+
+    templates = synthetic.load_templates()
+    all_results = dict()
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = [("resources", bundled_network)]
+        cases += [("synthetic_%d" % size, lambda size=size: synthetic.generate_network(size, args.seed, templates))
+                  for size in args.sizes]
+        for name, build in cases:
+            reactions, compounds = build()
+            all_results[name] = run_case(name, reactions, compounds, args.stages, workers=args.workers,
+                                         memory=args.memory, workdir=workdir)
+            print("## %s done" % name, flush=True)
+
+    print_table(all_results)
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(all_results, fout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
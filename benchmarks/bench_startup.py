@@ -0,0 +1,120 @@
+'''
+Startup time of the command line on the file-only path, i.e. without the Mongo-DB: importing the package, printing
+the help and answering a path query over the bundled reactions and compounds files. Every case runs in a fresh
+interpreter, and the import tree reported by python -X importtime is used to check which stage dependencies were
+loaded: neither SCINE nor bokeh/RXVisualizer are needed on this path.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py [--repeat 5] [--top 10] [--output results.json]
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+import yaml
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+RESOURCES = os.path.join(ROOT, "vizchemoton", "resources")
+# top-level modules of the optional stages, which the file-only path should not import
+STAGE_MODULES = {"scine_utilities": "extract", "scine_database": "extract", "scine_chemoton": "extract",
+                 "bokeh": "render", "RXVisualizer": "render"}
+
+
+def file_only_config(workdir):
+    """
+    Writes a copy of config.yaml reading the bundled files, with the database disabled.
+
+    Output:
+    - config_file (str): path to the new config file.
+    """
+    with open(os.path.join(ROOT, "config.yaml"), "r") as fconfig:
+        config = yaml.safe_load(fconfig)
+    config["db"]["active"] = False
+    config["files"]["reactions"]["path"] = os.path.join(RESOURCES, "reactions.csv")
+    config["files"]["compounds"]["path"] = os.path.join(RESOURCES, "compounds.json")
+    config["files"]["compounds"]["format"] = "json"
+    config["output"]["verbose"] = False
+    config["output"]["file"] = os.path.join(workdir, "network.html")
+    config["graph"]["query_cache"] = None
+    config["profiling"]["active"] = False
+    config_file = os.path.join(workdir, "config.yaml")
+    with open(config_file, "w") as fconfig:
+        yaml.safe_dump(config, fconfig)
+    return config_file
+
+
+def parse_importtime(stderr):
+    """
+    Parses the output of python -X importtime.
+
+    Output:
+    - modules (dict): mapping module name -> cumulative import time in seconds.
+    """
+    modules = dict()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _self, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+
+def run_case(command, repeat):
+    """
+    Runs a command in fresh interpreters, the last time under -X importtime.
+
+    Output:
+    - result (dict): wall times of the runs, their minimum and median, and the import times of the last run.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")]))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + command, check=True, env=env, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    traced = subprocess.run([sys.executable, "-X", "importtime"] + command, check=True, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    return {"wall_times": times, "min": min(times), "median": statistics.median(times),
+            "imports": parse_importtime(traced.stderr)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per case")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports shown per case")
+    parser.add_argument("--output", default=None, help="json file where the results are written")
+    args = parser.parse_args()
+
+    results = dict()
+    with tempfile.TemporaryDirectory() as workdir:
+        config_file = file_only_config(workdir)
+        cases = [("import", ["-c", "import vizchemoton.__main__"]),
+                 ("help", ["-m", "vizchemoton", "--help"]),
+                 ("query", ["-m", "vizchemoton", "-c", config_file, "query", "-s", "f4", "-t", "c75+c89"])]
+        for name, command in cases:
+            results[name] = run_case(command, args.repeat)
+
+    print("%-8s %10s %10s  %s" % ("case", "min", "median", "stage dependencies loaded"))
+    for name, res in results.items():
+        loaded = sorted({stage for module, stage in STAGE_MODULES.items() if module in res["imports"]})
+        res["stages_loaded"] = loaded
+        print("%-8s %9.3fs %9.3fs  %s" % (name, res["min"], res["median"], ", ".join(loaded) or "none"))
+    for name, res in results.items():
+        top_level = {module: cumulative for module, cumulative in res["imports"].items() if "." not in module}
+        print("## %s, slowest imports:" % name)
+        for module, cumulative in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+            print("##   %-30s %8.3f s" % (module, cumulative))
+
+    if args.output:
+        with open(args.output, "w") as fout:
+            json.dump(results, fout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
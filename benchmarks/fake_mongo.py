@@ -0,0 +1,139 @@
+'''
+In-memory stand-in for an asynchronous MongoDB driver (pymongo's AsyncMongoClient and bson.ObjectId), serving the
+content produced by synthetic.database_content() as the raw documents written by scine_database. It allows
+benchmarking get_reactions_and_compounds_async() without a live Mongo-DB: every query is counted and delayed by a
+simulated round-trip latency, and the largest number of queries in flight is recorded.
+
+Only meant for the benchmarks: install() replaces pymongo and bson in sys.modules and must run before the async
+backend opens its client.
+'''
+
+import sys
+import types
+import asyncio
+from collections import Counter
+
+DOCUMENTS = dict()
+QUERIES = Counter()
+STATS = {"in_flight": 0, "max_in_flight": 0}
+LATENCY = 0.0
+
+
+class ObjectId:
+    def __init__(self, value):
+        self._value = str(value)
+
+    def __str__(self):
+        return self._value
+
+    def __eq__(self, other):
+        return isinstance(other, ObjectId) and self._value == other._value
+
+    def __hash__(self):
+        return hash(self._value)
+
+
+class Cursor:
+    def __init__(self, documents):
+        self._documents = documents
+
+    async def to_list(self, length=None):
+        STATS["in_flight"] += 1
+        STATS["max_in_flight"] = max(STATS["max_in_flight"], STATS["in_flight"])
+        try:
+            await asyncio.sleep(LATENCY)
+        finally:
+            STATS["in_flight"] -= 1
+        return self._documents
+
+
+class Collection:
+    def __init__(self, name):
+        self.name = name
+
+    def find(self, selection, projection=None):
+        # only the selections issued by the async backend: '_id' or the energies of a set of structures
+        QUERIES[self.name] += 1
+        if "_id" in selection:
+            ids = selection["_id"]["$in"]
+        else:
+            ids = selection["$and"][0]["structure"]["$in"]
+        documents = DOCUMENTS[self.name]
+        return Cursor([documents[str(oid)] for oid in ids if str(oid) in documents])
+
+
+class AsyncMongoClient:
+    def __init__(self, host, port, maxPoolSize=100):
+        self.max_pool_size = maxPoolSize
+
+    def __getitem__(self, db_name):
+        return Database()
+
+    async def close(self):
+        pass
+
+
+class Database:
+    def __getitem__(self, name):
+        return Collection(name)
+
+
+def scine_documents(content):
+    """
+    Raw documents of the collections read by the async backend.
+
+    Input:
+    - content (dict): output of synthetic.database_content().
+
+    Output:
+    - documents (dict): mapping collection name -> {id: document}.
+    """
+    oid = ObjectId
+    structures = {str_id: {"_id": oid(str_id), "elements": [element for element, _pos in record["xyz"]],
+                           "positions": [coord for _element, pos in record["xyz"] for coord in pos],
+                           "charge": record["charge"], "multiplicity": record["multiplicity"]}
+                  for str_id, record in content["structures"].items()}
+    # one energy per structure, keyed by the structure as queried by the backend
+    properties = {str_id: {"_id": oid("p" + str_id), "structure": oid(str_id), "property_name":
+                                 "electronic_energy", "data": record["energy"]}
+                  for str_id, record in content["structures"].items()}
+    aggregates = {agg_id: {"_id": oid(agg_id), "structures": [oid(centroid)]}
+                  for agg_id, centroid in content["aggregates"].items()}
+    reactions = {rxn_id: {"_id": oid(rxn_id), "lhs": [{"id": oid(agg), "type": "compound"} for agg in lhs],
+                          "rhs": [{"id": oid(agg), "type": "compound"} for agg in rhs]}
+                 for rxn_id, (lhs, rhs) in content["reactions"].items()}
+    steps = dict()
+    for node, data in content["pathfinder"].items():
+        if ";0;" not in node:
+            continue
+        lhs, rhs = content["reactions"][node[:-3]]
+        step = content["steps"][data["elementary_step_id"]]
+        steps[data["elementary_step_id"]] = {
+            "_id": oid(data["elementary_step_id"]), "type": "barrierless" if step["barrierless"] else "regular",
+            "lhs": [oid(content["aggregates"][agg]) for agg in lhs],
+            "rhs": [oid(content["aggregates"][agg]) for agg in rhs],
+            "transition_state": None if step["ts"] is None else oid(step["ts"])}
+    return {"structures": structures, "properties": properties, "compounds": aggregates, "flasks": aggregates,
+            "reactions": reactions, "elementary_steps": steps}
+
+
+def install(content, latency=0.0):
+    """
+    Registers the fake pymongo and bson modules in sys.modules, serving the given database content.
+
+    Input:
+    - content (dict): output of synthetic.database_content().
+    - latency (float, optional): simulated round-trip time of every query, in seconds. Default is 0.
+    """
+    global LATENCY
+    LATENCY = latency
+    DOCUMENTS.clear()
+    DOCUMENTS.update(scine_documents(content))
+    QUERIES.clear()
+    STATS.update(in_flight=0, max_in_flight=0)
+
+    pymongo = types.ModuleType("pymongo")
+    pymongo.AsyncMongoClient = AsyncMongoClient
+    bson = types.ModuleType("bson")
+    bson.ObjectId = ObjectId
+    sys.modules.update({"pymongo": pymongo, "bson": bson})
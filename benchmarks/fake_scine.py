@@ -0,0 +1,275 @@
+'''
+In-memory stand-in for the parts of scine_database, scine_utilities and the Chemoton pathfinder used by the
+extraction, serving the content produced by synthetic.database_content(). It allows benchmarking
+get_reactions_and_compounds() without a live Mongo-DB: every call that would reach the database is counted, and
+optionally delayed by a simulated latency.
+
+Only meant for the benchmarks: install() replaces the SCINE modules in sys.modules and must run before vizchemoton
+is imported.
+'''
+
+import sys
+import json
+import enum
+import time
+import types
+from collections import Counter
+
+import networkx as nx
+
+KJPERMOL_PER_HARTREE = 2625.499639479
+
+DATABASE = dict()
+CALLS = Counter()
+# simulated round-trip time of every call reaching the database, in seconds
+LATENCY = 0.0
+
+
+def _call(name):
+    CALLS[name] += 1
+    if LATENCY:
+        time.sleep(LATENCY)
+
+
+class ID:
+    def __init__(self, value):
+        self._value = value if isinstance(value, str) else value.string()
+
+    def string(self):
+        return self._value
+
+    def __eq__(self, other):
+        return self._value == other._value
+
+    def __hash__(self):
+        return hash(self._value)
+
+
+class Side(enum.Enum):
+    LHS = 0
+    RHS = 1
+    BOTH = 2
+
+
+class ElementaryStepType(enum.Enum):
+    REGULAR = 0
+    BARRIERLESS = 1
+
+
+class CompoundOrFlask(enum.Enum):
+    COMPOUND = 0
+    FLASK = 1
+
+
+class Model:
+    def __init__(self, method_family, method, basis_set):
+        self.method_family, self.method, self.basis_set = method_family, method, basis_set
+        for field in ["program", "version", "spin_mode", "solvation", "solvent", "embedding", "periodic_boundaries",
+                      "external_field", "temperature", "pressure", "electronic_temperature"]:
+            setattr(self, field, "any")
+
+
+class Credentials:
+    def __init__(self, ip, port, name):
+        self.ip, self.port, self.name = ip, port, name
+
+
+class Atom:
+    def __init__(self, element, position):
+        self.element, self.position = element, position
+
+
+class Collection:
+    def __init__(self, name):
+        self.name = name
+
+    def query_structures(self, selection):
+        _call("structures.query")
+        ids = [oid["$oid"] for oid in json.loads(selection)["_id"]["$in"]]
+        return [Structure(ID(str_id), self) for str_id in ids if str_id in DATABASE["structures"]]
+
+    def query_properties(self, selection):
+        _call("properties.query")
+        ids = [oid["$oid"] for oid in json.loads(selection)["$and"][0]["structure"]["$in"]]
+        return [NumberProperty(ID("p" + str_id), self) for str_id in ids if str_id in DATABASE["structures"]]
+
+
+class Manager:
+    def set_credentials(self, credentials):
+        self.credentials = credentials
+
+    def connect(self):
+        _call("connect")
+
+    def get_collection(self, name):
+        return Collection(name)
+
+
+class Structure:
+    def __init__(self, struct_id, collection=None):
+        self._id = struct_id
+
+    def id(self):
+        return self._id
+
+    def _record(self, field):
+        _call("structures.get")
+        return DATABASE["structures"][self._id.string()][field]
+
+    def get_atoms(self):
+        return [Atom(element, tuple(pos)) for element, pos in self._record("xyz")]
+
+    def get_charge(self):
+        return self._record("charge")
+
+    @property
+    def multiplicity(self):
+        return self._record("multiplicity")
+
+
+class NumberProperty:
+    def __init__(self, prop_id, collection=None):
+        self._id = prop_id
+
+    def id(self):
+        return self._id
+
+    def get_structure(self):
+        _call("properties.get")
+        return ID(self._id.string()[1:])
+
+    def get_data(self):
+        _call("properties.get")
+        return DATABASE["structures"][self._id.string()[1:]]["energy"]
+
+    def get_property_name(self):
+        return "electronic_energy"
+
+
+class Aggregate:
+    def __init__(self, agg_id, collection=None):
+        self._id = agg_id.string()
+
+    def get_centroid(self):
+        _call("aggregates.get")
+        return ID(DATABASE["aggregates"][self._id])
+
+
+Compound = Aggregate
+Flask = Aggregate
+
+
+class Reaction:
+    def __init__(self, rxn_id, collection=None):
+        self._id = rxn_id.string()
+
+    def get_reactants(self, side):
+        _call("reactions.get")
+        lhs, rhs = DATABASE["reactions"][self._id]
+        return [ID(agg) for agg in lhs], [ID(agg) for agg in rhs]
+
+
+class ElementaryStep:
+    def __init__(self, es_id, collection=None):
+        self._id = es_id.string()
+
+    def get_type(self):
+        _call("elementary_steps.get")
+        barrierless = DATABASE["steps"][self._id]["barrierless"]
+        return ElementaryStepType.BARRIERLESS if barrierless else ElementaryStepType.REGULAR
+
+    def get_transition_state(self):
+        _call("elementary_steps.get")
+        return ID(DATABASE["steps"][self._id]["ts"])
+
+
+def get_energy_change(step, energy_type, model, structures, properties):
+    _call("get_energy_change")
+    return 0.0
+
+
+def get_barriers_for_elementary_step_by_type(step, energy_type, model, structures, properties):
+    _call("get_barriers_for_elementary_step_by_type")
+    return (0.0, 0.0)
+
+
+def get_energy_for_structure(structure, energy_type, model, structures, properties):
+    _call("get_energy_for_structure")
+    return DATABASE["structures"][structure.id().string()]["energy"]
+
+
+def rate_constant_from_barrier(barrier, temperature):
+    return 1.0
+
+
+class Pathfinder:
+    def __init__(self, manager):
+        self.graph_handler = types.SimpleNamespace(graph=nx.DiGraph())
+        self.options = types.SimpleNamespace()
+
+    def load_graph(self, path):
+        with open(path, "r") as fpath:
+            graph_dict = json.load(fpath)
+        graph = nx.DiGraph()
+        for node, data in graph_dict.items():
+            graph.add_node(node, **{key: value for key, value in data.items() if not isinstance(value, dict)})
+        for node, data in graph_dict.items():
+            graph.add_edges_from((node, other, value) for other, value in data.items() if isinstance(value, dict))
+        self.graph_handler.graph = graph
+
+    def build_graph(self):
+        # aggregates, then both directions of every reaction with its elementary step, as in the json export
+        _call("pathfinder.build_graph")
+        graph = nx.DiGraph()
+        graph.add_nodes_from((agg, {"type": agg_type}) for agg, agg_type in DATABASE["types"].items())
+        for es_id, step in DATABASE["steps"].items():
+            lhs, rhs = DATABASE["reactions"][step["reaction"]]
+            for direction, (side_a, side_b) in enumerate([(lhs, rhs), (rhs, lhs)]):
+                node = "%s;%d;" % (step["reaction"], direction)
+                graph.add_node(node, type="rxn_node", elementary_step_id=es_id)
+                graph.add_edges_from((node, agg, {"weight": 0.0, "required_compounds": []}) for agg in side_b)
+                graph.add_edges_from((agg, node, {"weight": 0.0,
+                                                  "required_compounds": [other for other in side_a if other != agg]})
+                                     for agg in side_a)
+        self.graph_handler.graph = graph
+
+    def export_graph(self, path):
+        graph = self.graph_handler.graph
+        with open(path, "w") as fpath:
+            json.dump({node: {**data, **dict(graph.adj[node])} for node, data in graph.nodes(data=True)}, fpath)
+
+
+def install(content, latency=0.0):
+    """
+    Registers the fake SCINE modules in sys.modules, serving the given database content.
+
+    Input:
+    - content (dict): output of synthetic.database_content().
+    - latency (float, optional): simulated round-trip time of every database call, in seconds. Default is 0.
+    """
+    global LATENCY
+    LATENCY = latency
+    DATABASE.clear()
+    DATABASE.update(content)
+    CALLS.clear()
+
+    utils = types.ModuleType("scine_utilities")
+    utils.KJPERMOL_PER_HARTREE = KJPERMOL_PER_HARTREE
+    database = types.ModuleType("scine_database")
+    for name, cls in dict(ID=ID, Side=Side, ElementaryStepType=ElementaryStepType, CompoundOrFlask=CompoundOrFlask,
+                          Model=Model, Credentials=Credentials, Manager=Manager, Structure=Structure,
+                          NumberProperty=NumberProperty, Compound=Compound, Flask=Flask, Reaction=Reaction,
+                          ElementaryStep=ElementaryStep).items():
+        setattr(database, name, cls)
+    queries = types.ModuleType("scine_database.energy_query_functions")
+    for function in [get_energy_change, get_barriers_for_elementary_step_by_type, get_energy_for_structure,
+                     rate_constant_from_barrier]:
+        setattr(queries, function.__name__, function)
+    database.energy_query_functions = queries
+    chemoton = types.ModuleType("scine_chemoton")
+    gears = types.ModuleType("scine_chemoton.gears")
+    pathfinder = types.ModuleType("scine_chemoton.gears.pathfinder")
+    pathfinder.Pathfinder = Pathfinder
+    sys.modules.update({"scine_utilities": utils, "scine_database": database,
+                        "scine_database.energy_query_functions": queries, "scine_chemoton": chemoton,
+                        "scine_chemoton.gears": gears, "scine_chemoton.gears.pathfinder": pathfinder})
@@ -0,0 +1,217 @@
+'''
+Generator of synthetic reaction networks in the format of the reactions.csv and compounds.json files, with the
+proportions of the bundled network: about a third of the nodes are adducts of two aggregates, there are 1.1
+reactions per node and a quarter of them are barrierless. Geometries, charges and multiplicities are drawn from the
+bundled compounds and transition states, so that the cost per structure is realistic.
+
+The same network can be exported as the content of a Chemoton database (pathfinder graph, aggregates, structures,
+elementary steps) for the fake collection layer in fake_scine.py.
+
+Usage (from the repository root):
+    python benchmarks/synthetic.py N_NODES OUTPUT_DIR [--seed S]
+'''
+
+import os
+import sys
+import json
+import random
+import argparse
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "vizchemoton", "resources")
+
+# proportions of the bundled network
+ADDUCT_FRACTION = 0.33
+FLASK_FRACTION = 0.42
+REACTIONS_PER_NODE = 1.1
+BARRIERLESS_FRACTION = 0.24
+# adduct members that are not nodes of the network themselves
+EXTRA_MEMBER_FRACTION = 0.5
+
+METHOD_FIELDS = ("method", "basis_set", "program", "solvent", "solvation")
+FIELD_ORDER = ["crn_id", "mongodb_id", "xyz", "charge", "multiplicity", "energy"] + list(METHOD_FIELDS)
+
+
+def load_templates(resources=RESOURCES):
+    """
+    Single molecules and transition states of the bundled network, used as templates of the synthetic structures.
+
+    Output:
+    - molecules (list), transition_states (list): compound entries of both kinds.
+    """
+    with open(os.path.join(resources, "compounds.json"), "r") as fcomp:
+        compounds = json.load(fcomp)
+    molecules = [comp for comp in compounds.values()
+                 if not isinstance(comp["crn_id"], list) and not comp["crn_id"].startswith("ts")]
+    transition_states = [comp for comp in compounds.values()
+                         if not isinstance(comp["crn_id"], list) and comp["crn_id"].startswith("ts")]
+    return molecules, transition_states
+
+
+def _object_id(rng):
+    return "%024x" % rng.getrandbits(96)
+
+
+def _structure(template, rng, energy=None):
+    # small displacements so that structures are not identical copies
+    xyz = [[atom, [val + rng.uniform(-0.05, 0.05) for val in pos]] for atom, pos in template["xyz"]]
+    entry = {"xyz": xyz, "charge": template["charge"], "multiplicity": template["multiplicity"],
+             "energy": template["energy"] + rng.uniform(-50.0, 50.0) if energy is None else energy}
+    for field in METHOD_FIELDS:
+        entry[field] = template[field]
+    return entry
+
+
+def generate_network(n_nodes, seed=0, templates=None):
+    """
+    Builds a connected synthetic network: a random spanning tree over the nodes plus random extra reactions.
+
+    Input:
+    - n_nodes (int): number of nodes of the network, adducts included.
+    - seed (int, optional): seed of the random generator. Default is 0.
+    - templates (tuple, optional): output of load_templates(). Default is None, loading them.
+
+    Output:
+    - reactions (list): [n1, n2, ts] rows as written in the reactions file, ts being None for barrierless steps.
+    - compounds (dict): mapping index -> entry, as written in the compounds file.
+    """
+    rng = random.Random(seed)
+    molecules, transition_states = templates or load_templates()
+    compounds = dict()
+    next_index = [1]
+
+    def new_index():
+        next_index[0] += 1
+        return next_index[0] - 1
+
+    def new_aggregate():
+        idx = new_index()
+        prefix = "f" if rng.random() < FLASK_FRACTION else "c"
+        entry = _structure(rng.choice(molecules), rng)
+        compounds[idx] = dict(crn_id=prefix + str(idx), mongodb_id=_object_id(rng), **entry)
+        return idx
+
+    n_adducts = int(round(ADDUCT_FRACTION * n_nodes))
+    nodes = [new_aggregate() for _ in range(n_nodes - n_adducts)]
+    for _ in range(n_adducts):
+        members = [new_aggregate() if rng.random() < EXTRA_MEMBER_FRACTION else rng.choice(nodes[:n_nodes - n_adducts])
+                   for _ in range(2)]
+        if members[0] == members[1]:
+            members[1] = new_aggregate()
+        idx = new_index()
+        entry = {"crn_id": [compounds[mm]["crn_id"] for mm in members],
+                 "_mongodb_id": [compounds[mm]["mongodb_id"] for mm in members]}
+        entry["mongodb_id"] = "//".join(entry["_mongodb_id"])
+        for field in ["xyz", "charge", "multiplicity", "energy"] + list(METHOD_FIELDS):
+            entry[field] = [compounds[mm][field] for mm in members]
+        # same key order as the extraction
+        compounds[idx] = {key: entry[key] for key in ["crn_id", "_mongodb_id", "mongodb_id"] + FIELD_ORDER[2:]}
+        nodes.append(idx)
+    rng.shuffle(nodes)
+
+    pairs = [(nodes[ii], nodes[rng.randrange(ii)]) for ii in range(1, len(nodes))]
+    n_extra = max(int(round(REACTIONS_PER_NODE * n_nodes)) - len(pairs), 0)
+    pairs += [tuple(rng.sample(nodes, 2)) for _ in range(n_extra)]
+
+    def node_energy(idx):
+        energy = compounds[idx]["energy"]
+        return sum(energy) if isinstance(energy, list) else energy
+
+    reactions = []
+    for n1, n2 in pairs:
+        if rng.random() < BARRIERLESS_FRACTION:
+            reactions.append([n1, n2, None])
+            continue
+        idx = new_index()
+        e_ts = max(node_energy(n1), node_energy(n2)) + rng.uniform(20.0, 150.0)
+        entry = _structure(rng.choice(transition_states), rng, energy=e_ts)
+        compounds[idx] = dict(crn_id="ts" + str(idx), mongodb_id=_object_id(rng) + ";", **entry)
+        reactions.append([n1, n2, idx])
+    return reactions, compounds
+
+
+def write_network(reactions, compounds, reaction_file, compound_file):
+    """
+    Writes a network in the format of write_compound_reactions_files().
+    """
+    with open(reaction_file, "w") as freac:
+        for r, p, ts in reactions:
+            freac.write("{r},{p},{ts}\n".format(r=r, p=p, ts=ts))
+    with open(compound_file, "w") as fcomp:
+        fcomp.write(json.dumps(compounds))
+
+
+def database_content(reactions, compounds, seed=0):
+    """
+    Content of a Chemoton database from which the extraction rebuilds the network: aggregates with their centroid
+    structures, reactions with their elementary steps and the pathfinder graph in its json export format.
+
+    Input:
+    - reactions (list), compounds (dict): output of generate_network().
+    - seed (int, optional): seed of the random generator for the database ids. Default is 0.
+
+    Output:
+    - content (dict): with keys 'structures' (id -> xyz, charge, multiplicity, energy in Hartree), 'aggregates'
+      (id -> centroid id), 'types' (aggregate id -> 'COMPOUND' or 'FLASK'), 'reactions' (id -> lhs, rhs), 'steps'
+      (id -> barrierless flag, TS id, reaction id) and 'pathfinder' (json-serializable graph).
+    """
+    rng = random.Random(seed)
+    kjpermol_per_hartree = 2625.499639479
+    structures, aggregates, types, rxns, steps, pathfinder = dict(), dict(), dict(), dict(), dict(), dict()
+
+    def add_structure(struct_id, entry):
+        structures[struct_id] = {"xyz": entry["xyz"], "charge": entry["charge"],
+                                 "multiplicity": entry["multiplicity"],
+                                 "energy": entry["energy"] / kjpermol_per_hartree}
+
+    def aggregate_ids(idx):
+        comp = compounds[idx]
+        if not isinstance(comp["crn_id"], list):
+            return [comp["mongodb_id"]]
+        return comp["_mongodb_id"]
+
+    for comp in compounds.values():
+        if isinstance(comp["crn_id"], list):
+            continue
+        if comp["crn_id"].startswith("ts"):
+            add_structure(comp["mongodb_id"][:-1], comp)
+            continue
+        centroid = _object_id(rng)
+        aggregates[comp["mongodb_id"]] = centroid
+        add_structure(centroid, comp)
+        types[comp["mongodb_id"]] = "FLASK" if comp["crn_id"].startswith("f") else "COMPOUND"
+        pathfinder[comp["mongodb_id"]] = {"type": types[comp["mongodb_id"]]}
+
+    for r, p, ts in reactions:
+        rxn_id, es_id = _object_id(rng), _object_id(rng)
+        lhs, rhs = aggregate_ids(r), aggregate_ids(p)
+        rxns[rxn_id] = (lhs, rhs)
+        steps[es_id] = {"barrierless": ts is None, "ts": None if ts is None else compounds[ts]["mongodb_id"][:-1],
+                        "reaction": rxn_id}
+        for direction, (side_a, side_b) in enumerate([(lhs, rhs), (rhs, lhs)]):
+            node = "%s;%d;" % (rxn_id, direction)
+            pathfinder[node] = {"type": "rxn_node", "elementary_step_id": es_id}
+            for agg in side_b:
+                pathfinder[node][agg] = {"weight": 0.0, "required_compounds": []}
+            for agg in side_a:
+                pathfinder[agg][node] = {"weight": 0.0,
+                                         "required_compounds": [other for other in side_a if other != agg]}
+    return {"structures": structures, "aggregates": aggregates, "types": types, "reactions": rxns, "steps": steps,
+            "pathfinder": pathfinder}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("n_nodes", type=int, help="number of nodes of the network")
+    parser.add_argument("output", help="directory where reactions.csv and compounds.json are written")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random generator")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    reactions, compounds = generate_network(args.n_nodes, seed=args.seed)
+    write_network(reactions, compounds, os.path.join(args.output, "reactions.csv"),
+                  os.path.join(args.output, "compounds.json"))
+    print("nodes: %d, reactions: %d, compound entries: %d" % (args.n_nodes, len(reactions), len(compounds)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
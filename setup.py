@@ -11,6 +11,8 @@ setup(
     url='https://github.com/petrusen/vizchemoton',
     license="BSD (3-clause)",
     include_package_data=True,
+    # driver of the async extraction backend (db.backend: 'async'); motor works as well
+    extras_require={'async': ['pymongo>=4.9']},
     keywords='chemistry visualization chemoton',
     project_urls={
         'Source': 'https://github.com/petrusen/vizchemoton',
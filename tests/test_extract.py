@@ -0,0 +1,65 @@
+'''
+Extraction from the fake SCINE and Mongo-DB layers of the benchmarks (benchmarks/fake_scine.py and fake_mongo.py),
+serving a synthetic exploration: the files written by the different ways of running the extraction must be identical.
+'''
+
+import os
+import sys
+import json
+import asyncio
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import synthetic
+import fake_scine
+import fake_mongo
+from bench_pipeline import DICT_METHOD
+
+
+@pytest.fixture(scope="module")
+def pathfinder_file(tmp_path_factory):
+    # the fake modules are registered before vizchemoton.extract imports SCINE
+    reactions, compounds = synthetic.generate_network(300, 0, synthetic.load_templates())
+    content = synthetic.database_content(reactions, compounds)
+    fake_scine.install(content)
+    fake_mongo.install(content)
+    path = str(tmp_path_factory.mktemp("db") / "crn_pathfinder.json")
+    with open(path, "w") as fpf:
+        json.dump(content["pathfinder"], fpf)
+    return path
+
+
+def write_files(reactions, compounds, directory, name):
+    from vizchemoton.process import write_compound_reactions_files
+    reaction_file = str(directory / (name + "_reactions.csv"))
+    compound_file = str(directory / (name + "_compounds.json"))
+    write_compound_reactions_files(reactions, compounds, reaction_file, compound_file, verbose=False)
+    with open(reaction_file, "rb") as freac, open(compound_file, "rb") as fcomp:
+        return freac.read(), fcomp.read()
+
+
+def test_workers_give_identical_files(pathfinder_file, tmp_path):
+    from vizchemoton.extract import get_reactions_and_compounds
+    files = dict()
+    for workers in (1, 2):
+        reactions, compounds = get_reactions_and_compounds("fake", "localhost", 0, DICT_METHOD,
+                                                           read_pathfinder=pathfinder_file, workers=workers,
+                                                           verbose=False)
+        files[workers] = write_files(reactions, compounds, tmp_path, "workers%d" % workers)
+    assert files[1][0]
+    assert files[1] == files[2]
+
+
+def test_async_backend_gives_identical_files(pathfinder_file, tmp_path):
+    from vizchemoton.extract import get_reactions_and_compounds
+    from vizchemoton.extract_async import get_reactions_and_compounds_async
+    reactions, compounds = get_reactions_and_compounds("fake", "localhost", 0, DICT_METHOD,
+                                                       read_pathfinder=pathfinder_file, verbose=False)
+    sync_files = write_files(reactions, compounds, tmp_path, "sync")
+    reactions, compounds = asyncio.run(get_reactions_and_compounds_async("fake", "localhost", 0, DICT_METHOD,
+                                                                         read_pathfinder=pathfinder_file,
+                                                                         pool_size=4, batch_size=50,
+                                                                         verbose=False))
+    assert write_files(reactions, compounds, tmp_path, "async") == sync_files
@@ -4,59 +4,455 @@ Diego Garay-Ruiz, November 2023. Collection of helper functions to link amk-tool
 HTML dashboards to visualize GRRM-generated reaction networks.
 '''
 
-import networkx as nx
-from .vizchemoton_module import  vizchemoton_header, get_reactions_and_compounds, write_compound_reactions_files, read_compound_reactions_files, process_graph, build_dashboard, load_config
+import os
+import asyncio
+import argparse
+from .vizchemoton_module import vizchemoton_header, load_config
+from .cache import StructureCache
+from . import profiling
+from .sidecars import serve_dashboard
+from .selection import select_subgraph
 
-def main():
+# The stage modules are imported by the paths that use them, so that reading the files does not load SCINE (extract),
+# bokeh and RXVisualizer (render, live) or scipy (layout, query, kinetics).
+
+def parse_arguments(argv=None):
+    """
+    Command line options, which override the corresponding entries of the config file.
+    """
+    parser = argparse.ArgumentParser(prog="vizchemoton",
+                                     description="Visualization of reaction networks generated with Chemoton")
+    parser.add_argument("-c", "--config", default="config.yaml", help="path to the config file")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of processes for the reaction extraction (overrides db.workers)")
+    parser.add_argument("--profile", nargs="?", const="profile.json", default=None, metavar="REPORT",
+                        help="write a json report with the wall time, calls and peak memory of every stage "
+                             "(overrides profiling.active and profiling.report)")
+    subparsers = parser.add_subparsers(dest="command")
+    query = subparsers.add_parser("query", help="lowest-barrier or energy-span paths between compounds, read from "
+                                                "the reactions and compounds files")
+    query.add_argument("-s", "--source", nargs="+", default=[], help="crn_id of the starting compounds")
+    query.add_argument("-t", "--target", nargs="+", default=[], help="crn_id of the final compounds")
+    query.add_argument("-k", type=int, default=1, help="number of paths (barrier queries with one source and target)")
+    query.add_argument("--kind", default="barrier",
+                       help="sum of barriers (barrier) or highest TS relative to the source (span)")
+    query.add_argument("-q", "--queries", default=None,
+                       help="file with one query per line: kind sources targets [k], node names separated by commas")
+    batch = subparsers.add_parser("batch", help="dashboards of several networks, given as config files or as "
+                                                "directories of reactions and compounds files, with an index page")
+    batch.add_argument("inputs", nargs="+", help="config files and directories of <name>reactions.csv and "
+                                                 "<name>compounds.json (or <name>compounds store) pairs")
+    batch.add_argument("-o", "--output-dir", default=None, help="directory of the dashboards (overrides "
+                                                                 "batch.output_dir)")
+    batch.add_argument("-j", "--jobs", type=int, default=None, help="number of processes (overrides batch.jobs)")
+    kinetics = subparsers.add_parser("kinetics", help="microkinetic simulation of the network read from the "
+                                                      "reactions and compounds files")
+    kinetics.add_argument("-o", "--profiles", default=None,
+                          help="csv file of the concentration profiles (overrides kinetics.profiles)")
+    kinetics.add_argument("-n", "--top", type=int, default=10,
+                          help="number of species with the highest final concentration that are printed")
+    live = subparsers.add_parser("live", help="dashboard served by a local Bokeh server, updated in place as the "
+                                              "reactions and compounds files (or the Mongo-DB) change")
+    live.add_argument("-p", "--port", type=int, default=None, help="port of the server (overrides live.port)")
+    live.add_argument("-i", "--interval", type=float, default=None,
+                      help="seconds between checks for new reactions (overrides live.interval)")
+    overview = subparsers.add_parser("overview", help="overview dashboard of the network coarsened into clusters, "
+                                                      "or full dashboard of one of them (drill-down)")
+    overview.add_argument("-m", "--method", default=None,
+                          help="community, formula or adduct (overrides coarsen.method)")
+    overview.add_argument("-n", "--max-nodes", type=int, default=None,
+                          help="largest number of clusters (overrides coarsen.max_nodes)")
+    overview.add_argument("--cluster", default=None,
+                          help="name of a cluster (cl_<index>) or crn_id of one of its nodes, whose full subgraph is "
+                               "rendered instead of the overview")
+    overview.add_argument("-o", "--output", default=None,
+                          help="output file (overrides coarsen.file, or <file>_<cluster>.html for a cluster)")
+    export = subparsers.add_parser("export", help="XYZ files of all the structures in compressed archives, with a "
+                                                  "json manifest of the reactions, e.g. for ioChem-BD")
+    export.add_argument("-o", "--output-dir", default=None,
+                        help="directory of the archives and manifest (overrides export.output_dir)")
+    export.add_argument("-f", "--format", default=None, help="tar.gz or zip (overrides export.format)")
+    export.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of processes writing the archives (overrides export.jobs)")
+    return parser.parse_args(argv)
+
+def compact_graph(reactions, compounds, config):
+    """
+    Compact graph of the network with the energy type selected by graph.energy, carrying the other energy types of
+    db.energy_types as node fields. The first energy type is the 'energy' field of the compounds, and can be
+    selected by either name.
+
+    Output:
+    - G (CompactGraph): see process.build_compact_graph().
+    """
+    from .process import build_compact_graph
+    energy_types = config["db"].get("energy_types") or []
+    energy_field = config["graph"].get("energy", "energy")
+    if energy_types and energy_field == energy_types[0]:
+        energy_field = "energy"
+    return build_compact_graph(reactions, compounds, config["graph"]["dist_adduct"], energy_field=energy_field,
+                               energy_columns=energy_types[1:])
+
+def run_queries(args, config):
+    """
+    Answers path queries over the network stored in the reactions and compounds files.
+    """
+    from .process import read_compound_reactions_files
+    from .query import QUERY_KINDS, PathQueryEngine, parse_query_line, format_results
+    if args.kind not in QUERY_KINDS:
+        raise ValueError("Unknown query kind %s, expected one of %s" % (args.kind, ", ".join(QUERY_KINDS)))
+    verbose = config["output"]["verbose"]
+    files = config["files"]
+    with profiling.stage("read_files"):
+        reactions, compounds = read_compound_reactions_files(files["reactions"]["path"], files["compounds"]["path"],
+                                                             compound_format=files["compounds"].get("format", "json"),
+                                                             verbose=verbose)
+    with profiling.stage("process_graph"):
+        G = compact_graph(reactions, compounds, config)
+    with profiling.stage("query.index"):
+        engine = PathQueryEngine(G)
+    query_cache = config["graph"].get("query_cache")
+    if query_cache and engine.load_cache(query_cache) and verbose:
+        print("## Reusing the results cached in {f}".format(f=query_cache))
+
+    queries = []
+    if args.source and args.target:
+        queries.append((args.kind, args.source, args.target, args.k))
+    if args.queries:
+        with open(args.queries, "r") as fqueries:
+            queries += [parse_query_line(line) for line in fqueries if line.strip() and not line.startswith("#")]
+    for kind, sources, targets, k in queries:
+        with profiling.stage("query.%s" % kind):
+            results = engine.query(kind, sources, targets, k)
+        print(format_results(kind, sources, targets, results))
+    profiling.count("query.cache_hits", engine.hits)
+
+    if query_cache:
+        engine.save_cache(query_cache)
+
+def run_batch_command(args, config):
+    """
+    Dashboards of several networks through a pool of processes, see batch.run_batch().
+
+    Output:
+    - failed (int): number of failed networks.
+    """
+    from .batch import run_batch
+    batch_config = config.get("batch") or {}
+    output_dir = args.output_dir or batch_config.get("output_dir", "./dashboards")
+    jobs = args.jobs if args.jobs is not None else batch_config.get("jobs", 1)
+    results = run_batch(args.inputs, config, output_dir, jobs=jobs, verbose=config["output"]["verbose"])
+    return sum(res["status"] == "failed" for res in results)
+
+def simulate_kinetics(G, config):
+    """
+    Microkinetic simulation of a compact graph with the 'kinetics' section of the config file, writing the
+    concentration profiles if kinetics.profiles is set.
+
+    Output:
+    - model (KineticModel), times (np.ndarray), concentrations (np.ndarray): see kinetics.run_kinetics().
+    """
+    from .kinetics import run_kinetics, write_profiles
+    kinetics_config = config.get("kinetics") or {}
+    with profiling.stage("kinetics"):
+        model, times, concentrations = run_kinetics(G, kinetics_config, verbose=config["output"]["verbose"])
+    if kinetics_config.get("profiles"):
+        write_profiles(model, times, concentrations, kinetics_config["profiles"])
+    return model, times, concentrations
+
+def run_kinetics_command(args, config):
+    """
+    Simulates the network stored in the reactions and compounds files and prints the species with the highest final
+    concentrations.
+    """
+    from .process import read_compound_reactions_files
+    files = config["files"]
+    config.setdefault("kinetics", {})
+    if args.profiles:
+        config["kinetics"]["profiles"] = args.profiles
+    with profiling.stage("read_files"):
+        reactions, compounds = read_compound_reactions_files(files["reactions"]["path"], files["compounds"]["path"],
+                                                             compound_format=files["compounds"].get("format", "json"),
+                                                             verbose=config["output"]["verbose"])
+    with profiling.stage("process_graph"):
+        G = compact_graph(reactions, compounds, config)
+    model, times, concentrations = simulate_kinetics(G, config)
+    final = concentrations[:, -1]
+    print("Concentrations (mol/L) after {t:g} s at {T:g} K".format(t=times[-1], T=model.temperature))
+    for ii in sorted(range(model.n_species), key=lambda jj: -final[jj])[:args.top]:
+        print("{name:>12s} {c:12.4e}".format(name=model.species[ii], c=final[ii]))
+
+def run_export(args, config):
+    """
+    Exports the network stored in the reactions and compounds files as XYZ archives and a manifest, see
+    export.export_network(). A compounds store is read by every process directly, without loading the geometries.
+    """
+    from .process import read_compound_reactions_files
+    from .export import export_network
+    export_config = config.get("export") or {}
+    files = config["files"]
+    with profiling.stage("read_files"):
+        reactions, compounds = read_compound_reactions_files(files["reactions"]["path"], files["compounds"]["path"],
+                                                             compound_format=files["compounds"].get("format", "json"),
+                                                             verbose=config["output"]["verbose"])
+    with profiling.stage("export"):
+        export_network(reactions, compounds, args.output_dir or export_config.get("output_dir", "./export"),
+                       archive_format=args.format or export_config.get("format", "tar.gz"),
+                       archive_size=export_config.get("archive_size", 5000),
+                       jobs=args.jobs if args.jobs is not None else export_config.get("jobs", 1),
+                       verbose=config["output"]["verbose"])
+
+def main(argv=None):
+    args = parse_arguments(argv)
     # Load configuration
-    config = load_config()
+    config = load_config(args.config)
+
+    # stage-level instrumentation, from the config file or the --profile flag
+    profiling_config = config.get("profiling") or {}
+    report_file = args.profile
+    if report_file is None and profiling_config.get("active", False):
+        report_file = profiling_config.get("report", "profile.json")
+    if report_file:
+        profiling.enable()
+    with profiling.cprofile(profiling_config.get("cprofile") if report_file else None):
+        if args.command == "query":
+            run_queries(args, config)
+        elif args.command == "batch":
+            failed = run_batch_command(args, config)
+        elif args.command == "kinetics":
+            run_kinetics_command(args, config)
+        elif args.command == "live":
+            from .live import serve_live
+            serve_live(args, config)
+        elif args.command == "overview":
+            run_overview(args, config)
+        elif args.command == "export":
+            run_export(args, config)
+        else:
+            run_dashboard(args, config)
+    if report_file:
+        profiling.write_report(report_file, verbose=config["output"]["verbose"])
+    if args.command == "batch" and failed:
+        raise SystemExit(1)
+    if args.command is None and config["output"].get("serve", False):
+        serve_dashboard(config["output"]["file"], port=config["output"].get("port", 8000),
+                        verbose=config["output"]["verbose"])
 
+def update_network_files(args, config):
+    """
+    Extraction from the Mongo-DB, writing the reactions and compounds files when their mode is 'write' or 'update'.
+    In 'update' mode, only the reactions that changed with respect to the former pathfinder export are extracted.
+
+    Output:
+    - reactions (list), compounds (dict): extracted network.
+    """
+    from .process import write_compound_reactions_files, read_compound_reactions_files
+    from .extract import get_reactions_and_compounds
+    from .pathfinder import read_pathfinder_index
     # Parameters from config
-    db_active = config["db"]["active"]
     db_name = config["db"]["name"]
     ip = config["db"]["ip"]
     port = config["db"]["port"]
     dict_method = config["method"]
+    workers = args.workers if args.workers is not None else config["db"].get("workers", 1)
+    backend = config["db"].get("backend", "scine")
+    pool_size = config["db"].get("pool_size", 10)
+    energy_types = config["db"].get("energy_types")
 
     pathfinder_file = config["files"]["pathfinder"]["path"]
     pathfinder_mode = config["files"]["pathfinder"]["mode"]
+    pathfinder_previous = config["files"]["pathfinder"].get("previous")
 
     reactions_file = config["files"]["reactions"]["path"]
     reactions_mode = config["files"]["reactions"]["mode"]
 
     compounds_file = config["files"]["compounds"]["path"]
     compounds_mode = config["files"]["compounds"]["mode"]
+    compounds_format = config["files"]["compounds"].get("format", "json")
+    verbose = config["output"]["verbose"]
 
+    # on-disk cache of structure records shared across runs
+    cache_config = config.get("cache", {})
+    cache = None
+    if cache_config.get("active", False):
+        cache = StructureCache(cache_config["path"], max_entries=cache_config.get("max_entries", 200000))
+
+    # incremental update: diff against the pathfinder export used for the existing reactions and compounds
+    previous = None
+    if reactions_mode == 'update' and compounds_mode == 'update':
+        if pathfinder_mode == 'write': # the former export is overwritten by the new one
+            pathfinder_previous = pathfinder_file
+        if pathfinder_previous and all(os.path.isfile(f) for f in [pathfinder_previous, reactions_file,
+                                                                      compounds_file]):
+            previous = (read_pathfinder_index(pathfinder_previous),) + \
+                       read_compound_reactions_files(reactions_file, compounds_file,
+                                                     compound_format=compounds_format, verbose=verbose)
+
+    # read the pathfinder object (to speed-up the process) or write it
+    if pathfinder_mode == 'read':
+        pathfinder_kwargs = dict(write_pathfinder=False, read_pathfinder=pathfinder_file)
+    elif pathfinder_mode == 'write':
+        pathfinder_kwargs = dict(write_pathfinder=pathfinder_file, read_pathfinder=False)
+    with profiling.stage("extract"):
+        if backend == 'async': # batched queries over a pool of connections of an asynchronous driver
+            from .extract_async import get_reactions_and_compounds_async
+            reactions, compounds = asyncio.run(get_reactions_and_compounds_async(
+                db_name, ip, port, dict_method, pool_size=pool_size, previous=previous, cache=cache,
+                energy_types=energy_types, verbose=verbose, **pathfinder_kwargs))
+        else:
+            reactions, compounds = get_reactions_and_compounds(db_name, ip, port, dict_method, workers=workers,
+                                                               previous=previous, cache=cache,
+                                                               energy_types=energy_types, verbose=verbose,
+                                                               **pathfinder_kwargs)
+
+    if cache is not None:
+        cache.close()
+
+    # write the reactions and compounds
+    if reactions_mode in ('write', 'update') and compounds_mode in ('write', 'update'):
+        with profiling.stage("write_files"):
+            write_compound_reactions_files(reactions, compounds, reactions_file, compounds_file,
+                                           compound_format=compounds_format, verbose=verbose)
+    return reactions, compounds
+
+def load_network_graph(config, lazy_geometry=False, restrict=None):
+    """
+    Graph of the dashboard from the reactions and compounds files: compact graph, kinetics (if active), selection
+    and conversion to networkx.
+
+    Input:
+    - config (dict): parameters of the config file.
+    - lazy_geometry (bool, optional): if True, the geometries are left to resolve_geometries(). Default is False.
+    - restrict (function, optional): applied to the compact graph before the selection, e.g. to keep one cluster of
+      the overview. Default is None.
+
+    Output:
+    - G (nx.Graph): graph to be rendered.
+    """
+    from .process import read_compound_reactions_files
+    files = config["files"]
+    verbose = config["output"]["verbose"]
+    map_field = config["graph"]["map_field"]
+    selection = config["graph"].get("selection") or {}
+    paths = selection.get("paths") or {}
+    kinetics_active = (config.get("kinetics") or {}).get("active", False) or map_field == "concentration"
+
+    with profiling.stage("read_files"):
+        reactions, compounds = read_compound_reactions_files(files["reactions"]["path"], files["compounds"]["path"],
+                                                             compound_format=files["compounds"].get("format", "json"),
+                                                             verbose=verbose)
+    # the network is kept as arrays until rendering, so that geometries are only built for the selected part
+    select = bool(selection.get("centers") or selection.get("max_barrier") is not None or paths.get("source"))
+    with profiling.stage("process_graph"):
+        G = compact_graph(reactions, compounds, config)
+    if kinetics_active: # the whole network is simulated, before the selection
+        kinetic_model, _times, concentrations = simulate_kinetics(G, config)
+    if restrict is not None:
+        G = restrict(G)
+    if select:
+        with profiling.stage("selection"):
+            G = select_subgraph(G, centers=[str(nd) for nd in selection.get("centers") or []],
+                                radius=selection.get("radius", 1), max_barrier=selection.get("max_barrier"),
+                                source=paths.get("source"), target=paths.get("target"), k_paths=paths.get("k", 1),
+                                verbose=verbose)
+    profiling.count("graph.nodes", G.number_of_nodes())
+    profiling.count("graph.edges", G.number_of_edges())
+    with profiling.stage("process_graph.networkx"):
+        G = G.to_networkx(lazy_geometry=lazy_geometry)
+    if kinetics_active:
+        from .kinetics import set_concentrations
+        set_concentrations(G, kinetic_model, concentrations)
+    return G
+
+def run_dashboard(args, config):
+    """
+    Full pipeline: extraction from the Mongo-DB (if active), reactions and compounds files and HTML dashboard.
+    """
     output_file = config["output"]["file"]
     title_html = config["output"]["title"]
     verbose = config["output"]["verbose"]
+    geometry_output = config["output"].get("geometry", "inline")
+    shard_size = config["output"].get("shard_size", 500)
 
-    dist_adduct = config["graph"]["dist_adduct"]
     size = tuple(config["graph"]["size"])
-    layout_function = getattr(nx, f"{config['graph']['layout']}_layout")
+    layout_name = config["graph"]["layout"]
+    layout_cache = config["graph"].get("layout_cache")
     map_field = config["graph"]["map_field"]
 
     # Start of Vizchemoton
     vizchemoton_header()
-    if db_active: # the Mongo-DB is reachable
-        
-        if pathfinder_mode == 'read': # read the pathfinder object (to speed-up the process)
-             reactions, compounds = get_reactions_and_compounds(db_name, ip, port, dict_method,
-             write_pathfinder=False, read_pathfinder=pathfinder_file, verbose=verbose)
+    if config["db"]["active"]: # the Mongo-DB is reachable
+        update_network_files(args, config)
 
-        elif pathfinder_mode == 'write':  # write the pathfinder object
-             reactions, compounds = get_reactions_and_compounds(db_name, ip, port, dict_method,
-             write_pathfinder=pathfinder_file, read_pathfinder=False, verbose=verbose)
+    #else: # the Mongo-DB is not reachable, or not necessary as reactions and compounds are stored in separate files
+    G = load_network_graph(config)
+    with profiling.stage("render"):
+        from .layout import get_layout_function
+        from .render import build_dashboard
+        layout_function = get_layout_function(layout_name, layout_cache)
+        build_dashboard(G, title_html, output_file, size=size, layout_function=layout_function, map_field=map_field,
+                        geometry=geometry_output, shard_size=shard_size, verbose=verbose)
 
-        # write the reactions and compounds
-        if reactions_mode == 'write' and compounds_mode == 'write':
-            write_compound_reactions_files(reactions, compounds, reactions_file, compounds_file, verbose=verbose)
+def run_overview(args, config):
+    """
+    Overview dashboard of the network coarsened into clusters, with the clusters stored next to it, or dashboard of
+    the full subgraph of one cluster (drill-down), see coarsen.py.
+    """
+    from .process import read_compound_reactions_files
+    from .coarsen import cluster_nodes, overview_networkx, save_clusters, load_clusters, cluster_subgraph
+    from .layout import get_layout_function
+    from .render import build_dashboard
+    coarsen_config = config.get("coarsen") or {}
+    method = args.method or coarsen_config.get("method", "community")
+    max_nodes = args.max_nodes if args.max_nodes is not None else coarsen_config.get("max_nodes", 300)
+    overview_file = coarsen_config.get("file", "overview.html")
+    cluster_file = os.path.splitext(overview_file)[0] + "_clusters.json"
+    files = config["files"]
+    title_html = config["output"]["title"]
+    verbose = config["output"]["verbose"]
+    geometry_output = config["output"].get("geometry", "inline")
+    shard_size = config["output"].get("shard_size", 500)
+    size = tuple(config["graph"]["size"])
 
-    #else: # the Mongo-DB is not reachable, or not necessary as reactions and compounds are stored in separate files
-    reactions, compounds = read_compound_reactions_files(reactions_file, compounds_file, verbose=verbose)
-    G = process_graph(reactions, compounds, dist_adduct)
-    build_dashboard(G, title_html, output_file, size=size, layout_function=layout_function, map_field=map_field)
+    def clusters_of(G, reuse):
+        # the drill-down reuses the clusters of the overview, as long as they match the network
+        labels = load_clusters(cluster_file, G, method) if reuse else None
+        if labels is None:
+            with profiling.stage("coarsen.clusters"):
+                labels = cluster_nodes(G, method, max_nodes=max_nodes,
+                                       resolution=coarsen_config.get("resolution", 1.0),
+                                       seed=coarsen_config.get("seed", 0), verbose=verbose)
+        return labels
 
+    if args.cluster:
+        output_file = args.output or "%s_%s.html" % (os.path.splitext(overview_file)[0], args.cluster)
+        G = load_network_graph(config, restrict=lambda G: cluster_subgraph(G, clusters_of(G, True), args.cluster))
+        layout_function = get_layout_function(config["graph"]["layout"], config["graph"].get("layout_cache"))
+        map_field = config["graph"]["map_field"]
+        title = "{t}: {c}".format(t=title_html, c=args.cluster)
+    else:
+        output_file = args.output or overview_file
+        with profiling.stage("read_files"):
+            reactions, compounds = read_compound_reactions_files(files["reactions"]["path"],
+                                                                 files["compounds"]["path"],
+                                                                 compound_format=files["compounds"].get("format",
+                                                                                                        "json"),
+                                                                 verbose=verbose)
+        with profiling.stage("process_graph"):
+            G0 = compact_graph(reactions, compounds, config)
+        labels = clusters_of(G0, False)
+        save_clusters(cluster_file, G0, labels, method)
+        with profiling.stage("coarsen.graph"):
+            G = overview_networkx(G0, labels)
+        profiling.count("graph.nodes", G.number_of_nodes())
+        profiling.count("graph.edges", G.number_of_edges())
+        # the names of the clusters are not those of the nodes, so the layout cache is not used
+        layout_function = get_layout_function(config["graph"]["layout"])
+        map_field = coarsen_config.get("map_field", "cluster_size")
+        title = "{t} (overview)".format(t=title_html)
+    with profiling.stage("render"):
+        build_dashboard(G, title, output_file, size=size, layout_function=layout_function, map_field=map_field,
+                        geometry=geometry_output, shard_size=shard_size, verbose=verbose)
 
 if __name__ == '__main__':
     main()
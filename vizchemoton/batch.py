@@ -0,0 +1,249 @@
+'''
+Batch mode: dashboards of many networks in one run, e.g. every exploration of a nightly job. The jobs are given as
+config files, or as directories holding pairs of reactions and compounds files, and run through a pool of processes
+that import the pipeline once, so that every job only pays for its own network. A failed job is reported without
+stopping the others, and an index page links all the dashboards.
+'''
+
+import io
+import os
+import copy
+import glob
+import html
+import time
+import contextlib
+import traceback
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .vizchemoton_module import load_config
+from . import profiling
+
+REACTIONS_SUFFIX = "reactions.csv"
+
+INDEX_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>%(title)s</title>
+<style>
+body { font-family: sans-serif; margin: 2em; }
+table { border-collapse: collapse; }
+th, td { border: 1px solid #ccc; padding: 0.3em 0.8em; text-align: left; }
+td.failed { color: #b00; }
+pre { margin: 0; white-space: pre-wrap; }
+</style>
+</head>
+<body>
+<h1>%(title)s</h1>
+<p>%(summary)s</p>
+<table>
+<tr><th>Network</th><th>Status</th><th>Wall time (s)</th><th>Source</th><th>Log</th><th>Error</th></tr>
+%(rows)s
+</table>
+</body>
+</html>
+'''
+
+
+def warm_up():
+    """
+    Imports the modules of the pipeline, so that the jobs of a worker process do not import them again. Modules that
+    are not installed are skipped here: the jobs that need them fail and are reported.
+    """
+    for module in ["process", "layout", "render", "query"]:
+        try:
+            __import__(__package__ + "." + module)
+        except ImportError:
+            pass
+
+
+def network_pairs(directory):
+    """
+    Finds the reactions and compounds files of a directory and its subdirectories: every '<name>reactions.csv' is
+    paired with '<name>compounds.json' or with a '<name>compounds' store next to it.
+
+    Input:
+    - directory (str): directory to be scanned.
+
+    Output:
+    - pairs (list): (name, reactions file, compounds file, compounds format) tuples, sorted by name. The name is the
+      path of the reactions file relative to the directory without the suffix, or the name of its directory.
+    """
+    pairs = []
+    for reactions_file in sorted(glob.glob(os.path.join(directory, "**", "*" + REACTIONS_SUFFIX), recursive=True)):
+        prefix = reactions_file[:-len(REACTIONS_SUFFIX)]
+        if os.path.isfile(prefix + "compounds.json"):
+            compounds_file, compound_format = prefix + "compounds.json", "json"
+        elif os.path.isdir(prefix + "compounds"):
+            compounds_file, compound_format = prefix + "compounds", "npy"
+        else:
+            continue
+        name = os.path.relpath(prefix, directory).replace(os.sep, "_").strip("_. ")
+        if not name:
+            name = os.path.basename(os.path.abspath(os.path.dirname(reactions_file)))
+        pairs.append((name, reactions_file, compounds_file, compound_format))
+    return pairs
+
+
+def collect_jobs(inputs, base_config, output_dir):
+    """
+    Builds the config of every job. Config files are used as they are, while the reactions and compounds pairs
+    found in directories are read with a copy of the base config, without connecting to the Mongo-DB. The dashboard
+    of each job is written to output_dir as '<name>.html', and so is its layout cache, if the config uses one.
+
+    Input:
+    - inputs (list): config files and directories.
+    - base_config (dict): config used for the pairs found in directories.
+    - output_dir (str): directory of the dashboards and of the index page.
+
+    Output:
+    - jobs (list): (name, source, config) tuples, with unique names.
+    """
+    jobs = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for name, reactions_file, compounds_file, compound_format in network_pairs(path):
+                config = copy.deepcopy(base_config)
+                config["db"]["active"] = False
+                config["files"]["reactions"].update(path=reactions_file, mode="read")
+                config["files"]["compounds"].update(path=compounds_file, mode="read", format=compound_format)
+                config["output"]["title"] = name
+                jobs.append((name, reactions_file, config))
+        elif os.path.isfile(path):
+            name = os.path.splitext(os.path.basename(path))[0]
+            jobs.append((name, path, load_config(path)))
+        else:
+            raise FileNotFoundError("No config file or directory named %s" % path)
+
+    seen = dict()
+    for ii, (name, source, config) in enumerate(jobs):
+        # networks with the same name, e.g. config files in different directories, are numbered
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = "%s_%d" % (name, seen[name])
+        config["output"]["file"] = os.path.join(output_dir, name + ".html")
+        config["output"]["serve"] = False
+        if config["graph"].get("layout_cache"):
+            config["graph"]["layout_cache"] = os.path.join(output_dir, name + ".layout.json")
+        jobs[ii] = (name, source, config)
+    return jobs
+
+
+def run_job(name, config, profile=False):
+    """
+    Runs the full pipeline of a job, catching its errors. Its output and traceback are written to '<name>.log' next
+    to the dashboard.
+
+    Input:
+    - name (str): name of the job.
+    - config (dict): config of the job.
+    - profile (bool, optional): if True, collect the profiling statistics of the job, to be merged by the parent
+      process. Default is False.
+
+    Output:
+    - result (dict): name, 'ok' or 'failed' status, wall time, output and log files, error (None if it succeeded)
+      and profiling statistics.
+    """
+    from .__main__ import run_dashboard
+    if profile:
+        profiling.enable()
+    start = time.perf_counter()
+    error = None
+    # the output of the job goes to its log file instead of interleaving with that of the other jobs
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        try:
+            run_dashboard(argparse.Namespace(workers=None), config)
+        except Exception as exc:
+            error = "%s: %s" % (type(exc).__name__, exc)
+            print(traceback.format_exc())
+    log_file = os.path.splitext(config["output"]["file"])[0] + ".log"
+    with open(log_file, "w") as flog:
+        flog.write(log.getvalue())
+    return {"name": name, "status": "ok" if error is None else "failed", "wall_time": time.perf_counter() - start,
+            "output": config["output"]["file"], "log": log_file, "error": error,
+            "stats": profiling.snapshot() if profile else {}}
+
+
+def write_index(results, index_file, title="VizChemoton dashboards"):
+    """
+    Writes the index page of a batch, linking the dashboards and listing the failed jobs with their errors.
+
+    Input:
+    - results (list): run_job() output of every job.
+    - index_file (str): path to the HTML file.
+    - title (str, optional): title of the page.
+    """
+    base = os.path.dirname(os.path.abspath(index_file))
+    rows = []
+    for res in results:
+        if res["status"] == "ok":
+            link = '<a href="%s">%s</a>' % (html.escape(os.path.relpath(res["output"], base)), html.escape(res["name"]))
+        else:
+            link = html.escape(res["name"])
+        log = '<a href="%s">log</a>' % html.escape(os.path.relpath(res["log"], base)) if res.get("log") else ""
+        rows.append('<tr><td>%s</td><td class="%s">%s</td><td>%.2f</td><td>%s</td><td>%s</td><td><pre>%s</pre></td>'
+                    '</tr>' % (link, res["status"], res["status"], res["wall_time"], html.escape(res["source"]), log,
+                               html.escape(res["error"] or "")))
+    n_failed = sum(res["status"] == "failed" for res in results)
+    summary = "%d networks, %d failed, generated on %s." % (len(results), n_failed, time.strftime("%Y-%m-%d %H:%M"))
+    with open(index_file, "w") as findex:
+        findex.write(INDEX_TEMPLATE % {"title": html.escape(title), "summary": summary, "rows": "\n".join(rows)})
+
+
+def run_batch(inputs, base_config, output_dir, jobs=1, verbose=True):
+    """
+    Runs a batch of jobs, in a pool of processes if jobs > 1, and writes the index page.
+
+    Input:
+    - inputs (list): config files and directories, see collect_jobs().
+    - base_config (dict): config used for the pairs found in directories.
+    - output_dir (str): directory of the dashboards and of the index page (index.html).
+    - jobs (int, optional): number of processes. Default is 1, running the jobs in this process.
+    - verbose (bool, optional): if True, print the progress and a summary. Default is True.
+
+    Output:
+    - results (list): run_job() output of every job, plus its source, in the order of the inputs.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    job_list = collect_jobs(inputs, base_config, output_dir)
+    if verbose: print("## Running {n} networks with {j} processes".format(n=len(job_list), j=jobs))
+    profile = profiling.is_enabled()
+    # imported before the pool is created, so that forked workers start warm
+    warm_up()
+    results = dict()
+    if jobs > 1 and len(job_list) > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=warm_up) as executor:
+            futures = {executor.submit(run_job, name, config, profile): name for name, _source, config in job_list}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as exc:  # the worker died, e.g. out of memory
+                    results[name] = {"name": name, "status": "failed", "wall_time": 0.0, "output": None,
+                                     "log": None, "error": "%s: %s" % (type(exc).__name__, exc), "stats": {}}
+                if verbose: print("## {name}: {status} ({t:.2f} s)".format(
+                    name=name, status=results[name]["status"], t=results[name]["wall_time"]))
+    else:
+        for name, _source, config in job_list:
+            # statistics are collected directly by the profiling of this process
+            results[name] = run_job(name, config)
+            if verbose: print("## {name}: {status} ({t:.2f} s)".format(
+                name=name, status=results[name]["status"], t=results[name]["wall_time"]))
+
+    ordered = []
+    for name, source, _config in job_list:
+        res = results[name]
+        res["source"] = source
+        stats = res.pop("stats")
+        if stats:
+            profiling.merge(stats)
+        ordered.append(res)
+    write_index(ordered, os.path.join(output_dir, "index.html"))
+    if verbose:
+        print("## Index of the dashboards written to {f}".format(f=os.path.join(output_dir, "index.html")))
+        for res in ordered:
+            if res["status"] == "failed":
+                print("## {name} failed: {error}".format(name=res["name"], error=res["error"]))
+    return ordered
@@ -0,0 +1,146 @@
+'''
+Persistent on-disk cache of the structure records extracted from the Mongo-DB, so that repeated extractions of the
+same exploration do not query the immutable geometries and energies again.
+'''
+
+import os
+import json
+import sqlite3
+import itertools
+
+
+def _energy_types(energy_type):
+    return [energy_type] if isinstance(energy_type, str) else list(energy_type)
+
+
+class StructureCache:
+    """
+    SQLite store of structure records (xyz, charge, multiplicity and energies) keyed by (structure id, model), with
+    the energies stored by energy type, so that structures whose energies are only partly computed are kept as well.
+    It is bounded to a maximum number of structures with least-recently-used eviction of whole structures.
+
+    Input:
+    - path (str): directory where the cache file is stored, created if missing.
+    - max_entries (int, optional): maximum number of structures kept in the cache. Default is 200000.
+    """
+
+    filename = "structures.sqlite"
+
+    def __init__(self, path, max_entries=200000):
+        os.makedirs(path, exist_ok=True)
+        self.path = os.path.join(path, self.filename)
+        self.max_entries = max_entries
+        self.hits, self.partial, self.misses, self.evictions = 0, 0, 0, 0
+        self._conn = sqlite3.connect(self.path)
+        # one row per energy type in former cache files, whose records are fetched again
+        self._conn.execute("DROP TABLE IF EXISTS records")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS structures (
+                                  structure_id TEXT, model TEXT,
+                                  xyz TEXT, charge INTEGER, multiplicity INTEGER,
+                                  last_access INTEGER,
+                                  PRIMARY KEY (structure_id, model))""")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS energies (
+                                  structure_id TEXT, model TEXT, energy_type TEXT, energy REAL,
+                                  PRIMARY KEY (structure_id, model, energy_type))""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS structures_access ON structures (last_access)")
+        self._conn.commit()
+        last = self._conn.execute("SELECT MAX(last_access) FROM structures").fetchone()[0]
+        self._clock = itertools.count((last or 0) + 1)
+
+    def get_many(self, structure_ids, model_key, energy_type):
+        """
+        Looks up a set of structures, refreshing the access time of the hits. Structures cached without the energies
+        of some of the energy types are returned as well, with None for them, so that only those are queried.
+
+        Input:
+        - structure_ids (list): ids of the structures as strings.
+        - model_key (tuple): tuple of strings identifying the model.
+        - energy_type (str, list): name of the energy property, or list of names, the first one filling 'energy'.
+
+        Output:
+        - records (dict): mapping structure id -> record, only for the ids found in the cache. Records of several
+          energy types hold all of them in 'energies'.
+        - missing (dict): mapping structure id -> list of the energy types not cached, for the records that lack some.
+        """
+        model = json.dumps(model_key)
+        energy_types = _energy_types(energy_type)
+        records, missing = dict(), dict()
+        ids = list(structure_ids)
+        # keep below the default limit of SQL variables
+        for start in range(0, len(ids), 900):
+            batch = ids[start:start + 900]
+            rows = self._conn.execute(
+                "SELECT structure_id, xyz, charge, multiplicity FROM structures "
+                "WHERE model = ? AND structure_id IN (%s)" % ",".join("?" * len(batch)), [model] + batch).fetchall()
+            energies = {str_id: dict() for str_id, _xyz, _charge, _multiplicity in rows}
+            energy_rows = self._conn.execute(
+                "SELECT structure_id, energy_type, energy FROM energies "
+                "WHERE model = ? AND energy_type IN (%s) AND structure_id IN (%s)" % (
+                    ",".join("?" * len(energy_types)), ",".join("?" * len(batch))),
+                [model] + energy_types + batch).fetchall()
+            for str_id, row_type, energy in energy_rows:
+                if str_id in energies:
+                    energies[str_id][row_type] = energy
+            for str_id, xyz, charge, multiplicity in rows:
+                record = {"xyz": [(element, tuple(pos)) for element, pos in json.loads(xyz)],
+                          "charge": charge, "multiplicity": multiplicity,
+                          "energy": energies[str_id].get(energy_types[0])}
+                if not isinstance(energy_type, str):
+                    record["energies"] = {name: energies[str_id].get(name) for name in energy_types}
+                records[str_id] = record
+                if len(energies[str_id]) < len(energy_types):
+                    missing[str_id] = [name for name in energy_types if name not in energies[str_id]]
+        self._conn.executemany("UPDATE structures SET last_access = ? WHERE structure_id = ? AND model = ?",
+                               [(next(self._clock), str_id, model) for str_id in records])
+        self._conn.commit()
+        self.hits += len(records) - len(missing)
+        self.partial += len(missing)
+        self.misses += len(ids) - len(records)
+        return records, missing
+
+    def put_many(self, records, model_key, energy_type):
+        """
+        Stores a set of structure records, evicting the least recently used structures beyond max_entries. Energies
+        that are missing are skipped, as the property may still be computed later on.
+
+        Input:
+        - records (dict): mapping structure id -> record, as produced by get_structure_records().
+        - model_key (tuple): tuple of strings identifying the model.
+        - energy_type (str, list): name of the energy property, or list of names whose energies are in 'energies'.
+        """
+        model = json.dumps(model_key)
+        rows, energy_rows = [], []
+        for str_id, rec in records.items():
+            rows.append((str_id, model, json.dumps(rec["xyz"]), rec["charge"], rec["multiplicity"], next(self._clock)))
+            energies = {energy_type: rec["energy"]} if isinstance(energy_type, str) else rec["energies"]
+            for row_type in _energy_types(energy_type):
+                if energies.get(row_type) is not None:
+                    energy_rows.append((str_id, model, row_type, energies[row_type]))
+        self._conn.executemany("INSERT OR REPLACE INTO structures VALUES (?,?,?,?,?,?)", rows)
+        self._conn.executemany("INSERT OR REPLACE INTO energies VALUES (?,?,?,?)", energy_rows)
+        n_entries = self._conn.execute("SELECT COUNT(*) FROM structures").fetchone()[0]
+        if n_entries > self.max_entries:
+            evicted = self._conn.execute("SELECT structure_id, model FROM structures ORDER BY last_access LIMIT ?",
+                                         (n_entries - self.max_entries,)).fetchall()
+            self._conn.executemany("DELETE FROM energies WHERE structure_id = ? AND model = ?", evicted)
+            self._conn.executemany("DELETE FROM structures WHERE structure_id = ? AND model = ?", evicted)
+            self.evictions += len(evicted)
+        self._conn.commit()
+
+    def statistics(self):
+        """
+        Output:
+        - stats (dict): hits, partial hits (structures lacking some energy type), misses and evictions since the cache
+          was opened, and current number of structures.
+        """
+        n_entries = self._conn.execute("SELECT COUNT(*) FROM structures").fetchone()[0]
+        return {"hits": self.hits, "partial": self.partial, "misses": self.misses, "evictions": self.evictions,
+                "entries": n_entries}
+
+    def print_statistics(self):
+        stats = self.statistics()
+        print("## Structure cache {p}: {hits} hits, {partial} partial, {misses} misses, {evictions} evictions, "
+              "{entries} entries".format(p=self.path, **stats))
+
+    def close(self):
+        self._conn.close()
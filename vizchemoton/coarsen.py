@@ -0,0 +1,275 @@
+'''
+Hierarchical coarsening of a processed reaction network for an overview dashboard. The nodes of the graph from
+build_compact_graph() are grouped into clusters (communities, molecular formula or adduct membership), and clusters
+are merged again by community detection on the graph of clusters until there are at most max_nodes of them. Every
+cluster becomes a super-node, drawn with the geometry of its lowest-energy node and holding the energy statistics of
+its members, and the reactions between two clusters become one super-edge with their lowest barriers. The full
+subgraph of one cluster is rendered on demand (drill-down), from the clusters stored next to the overview.
+'''
+
+import os
+import json
+import itertools
+from collections import Counter
+
+import numpy as np
+import networkx as nx
+
+from .process import BARRIERLESS, CompactGraph
+
+COARSEN_METHODS = ("community", "formula", "adduct")
+# number of member names listed in the hover of a super-node
+MAX_LISTED_MEMBERS = 8
+
+
+def cluster_name(cluster):
+    """
+    Name of a super-node from its cluster index, clusters being numbered by decreasing size.
+    """
+    return "cl_%d" % cluster
+
+
+def _relabel(labels):
+    # clusters numbered by decreasing size, ties by their first node
+    _unique, first, inverse, size = np.unique(labels, return_index=True, return_inverse=True, return_counts=True)
+    order = np.lexsort((first, -size))
+    mapping = np.empty(len(order), dtype=np.int64)
+    mapping[order] = np.arange(len(order))
+    return mapping[inverse.ravel()]
+
+
+def _communities(n_nodes, pairs, resolution=1.0, seed=0):
+    """
+    Louvain communities of a graph given as an edge list over 0..n_nodes-1, with edges repeated between the same pair
+    of nodes summed as weights.
+
+    Output:
+    - labels (np.ndarray): int64 community of every node.
+    """
+    C = nx.Graph()
+    C.add_nodes_from(range(n_nodes))
+    pairs = np.sort(pairs[pairs[:, 0] != pairs[:, 1]], axis=1)
+    if len(pairs):
+        codes, weights = np.unique(pairs, axis=0, return_counts=True)
+        C.add_weighted_edges_from(zip(codes[:, 0].tolist(), codes[:, 1].tolist(), weights.tolist()))
+    labels = np.empty(n_nodes, dtype=np.int64)
+    for ii, community in enumerate(nx.community.louvain_communities(C, weight="weight", resolution=resolution,
+                                                                    seed=seed)):
+        labels[list(community)] = ii
+    return labels
+
+
+def adduct_clusters(G):
+    """
+    Clusters of adduct membership: every node is grouped by the one of its fragments (itself for compounds and
+    flasks) found in the fewest nodes, so that the adducts of a molecule are gathered with it while the reagents
+    they share do not join them all in one cluster.
+
+    Input:
+    - G (CompactGraph): graph from build_compact_graph().
+
+    Output:
+    - labels (np.ndarray): int64 cluster of every node, before relabel.
+    """
+    fragments = [name.split("+") for name in G.names]
+    count = Counter(itertools.chain.from_iterable(fragments))
+    keys = dict()
+    return np.array([keys.setdefault(min(frags, key=lambda frag: count[frag]), len(keys)) for frags in fragments],
+                    dtype=np.int64)
+
+
+def cluster_nodes(G, method="community", max_nodes=None, resolution=1.0, seed=0, verbose=True):
+    """
+    Clusters of the nodes of a network. The clusters of the method are merged hierarchically, by Louvain community
+    detection on the graph of clusters weighted by the number of reactions between them, until there are at most
+    max_nodes. Clusters of separate components of the network cannot be merged by their reactions: if more than
+    max_nodes are left, the smallest ones are joined into the last cluster.
+
+    Input:
+    - G (CompactGraph): graph from build_compact_graph().
+    - method (str, optional): 'community' (Louvain communities of the reactions), 'formula' (nodes with the same
+      molecular formula) or 'adduct' (adducts gathered with their least shared fragment, see adduct_clusters()).
+      Default is 'community'.
+    - max_nodes (int, optional): largest number of clusters. Default is None, no bound.
+    - resolution (float, optional): resolution of the Louvain method, higher values giving smaller communities.
+      Default is 1.0.
+    - seed (int, optional): seed of the Louvain method, so that clusters are reproducible. Default is 0.
+    - verbose (bool, optional): if True, print the number of clusters. Default is True.
+
+    Output:
+    - labels (np.ndarray): int64 cluster of every node, numbered from 0 by decreasing size but for the joined one.
+    """
+    if method not in COARSEN_METHODS:
+        raise ValueError("Unknown coarsening method %s, expected one of %s" % (method, ", ".join(COARSEN_METHODS)))
+    n_nodes = G.number_of_nodes()
+    if n_nodes == 0:
+        return np.zeros(0, dtype=np.int64)
+    if method == "formula":
+        labels = G.formula.astype(np.int64)
+    elif method == "adduct":
+        labels = adduct_clusters(G)
+    else:
+        labels = _communities(n_nodes, G.edges, resolution=resolution, seed=seed)
+    labels = _relabel(labels)
+
+    # hierarchical merging, every level on the graph of the clusters of the previous one
+    while max_nodes is not None and labels.max() + 1 > max_nodes:
+        n_clusters = int(labels.max()) + 1
+        merged = _communities(n_clusters, labels[G.edges], resolution=resolution, seed=seed)
+        if merged.max() + 1 == n_clusters:
+            if verbose: print("## Joining the {n} smallest of {k} unconnected clusters".format(
+                n=n_clusters - max_nodes + 1, k=n_clusters))
+            labels = np.minimum(labels, max_nodes - 1)
+            break
+        labels = _relabel(merged[labels])
+    if verbose: print("## Coarsened {n} nodes into {k} clusters by {m}".format(n=n_nodes, k=int(labels.max()) + 1,
+                                                                           m=method))
+    return labels
+
+
+def coarsen_graph(G, labels):
+    """
+    Graph of the clusters of a network. Every cluster is a super-node with the compound, labels and energy of its
+    lowest-energy node, and the mean and highest energies of its members in CompactGraph.energies ('energy_mean' and
+    'energy_max'). The reactions between two clusters are merged into a super-edge whose barriers from each side are
+    the lowest among them, with the TS of the reaction of lowest barrier; reactions within a cluster are dropped.
+
+    Input:
+    - G (CompactGraph): graph from build_compact_graph().
+    - labels (np.ndarray): cluster of every node, from cluster_nodes().
+
+    Output:
+    - H (CompactGraph): graph whose nodes are named by cluster_name().
+    """
+    n_clusters = int(labels.max()) + 1 if len(labels) else 0
+    # lowest-energy node of every cluster as its representative
+    order = np.lexsort((G.energy, labels))
+    representative = order[np.searchsorted(labels[order], np.arange(n_clusters))]
+    size = np.bincount(labels, minlength=n_clusters)
+    energy_mean = np.bincount(labels, weights=G.energy, minlength=n_clusters) / np.maximum(size, 1)
+    energy_max = np.full(n_clusters, -np.inf)
+    np.maximum.at(energy_max, labels, G.energy)
+
+    # reactions between clusters, oriented from the cluster with the lowest index
+    ends = labels[G.edges].reshape(-1, 2)
+    inter = np.flatnonzero(ends[:, 0] != ends[:, 1])
+    ends, barrier = ends[inter], G.barrier[inter]
+    swap = ends[:, 0] > ends[:, 1]
+    ends = np.where(swap[:, None], ends[:, ::-1], ends)
+    barrier = np.where(swap[:, None], barrier[:, ::-1], barrier)
+    codes, inverse = np.unique(ends[:, 0] * max(n_clusters, 1) + ends[:, 1], return_inverse=True)
+    inverse = inverse.ravel()
+    n_edges = len(codes)
+    lowest = np.full((n_edges, 2), np.inf)
+    for side in range(2):
+        np.minimum.at(lowest[:, side], inverse, barrier[:, side])
+    by_barrier = np.lexsort((barrier.min(axis=1), inverse))
+    chosen = inter[by_barrier[np.searchsorted(inverse[by_barrier], np.arange(n_edges))]]
+    edge_ts = G.edge_ts[chosen]
+    edge_names = [G.edge_names[jj] if ts != BARRIERLESS else "TSb_%04d" % kk
+                  for kk, (jj, ts) in enumerate(zip(chosen.tolist(), edge_ts.tolist()))]
+    edges = np.stack([codes // max(n_clusters, 1), codes % max(n_clusters, 1)], axis=1).astype(np.int64)
+
+    return CompactGraph(G.node_key[representative], [cluster_name(ii) for ii in range(n_clusters)],
+                        G.energy[representative], G.charge[representative], G.multiplicity[representative],
+                        G.formula[representative], edges.reshape(-1, 2), edge_ts, edge_names, G.ts_energy[chosen],
+                        lowest, G.edge_charge[chosen], G.edge_multiplicity[chosen], G.edge_formula[chosen],
+                        G.labels, G.compounds, G.dist_adduct,
+                        {"energy_mean": energy_mean, "energy_max": energy_max})
+
+
+def cluster_members(G, labels):
+    """
+    Names of the nodes of every cluster.
+
+    Output:
+    - members (dict): mapping cluster name -> list of node names, in the order of G.
+    """
+    members = {cluster_name(ii): [] for ii in range(int(labels.max()) + 1 if len(labels) else 0)}
+    for name, cluster in zip(G.names, labels.tolist()):
+        members[cluster_name(cluster)].append(name)
+    return members
+
+
+def overview_networkx(G, labels, lazy_geometry=False):
+    """
+    nx.Graph of the overview, from coarsen_graph(), whose super-nodes also hold the number of nodes of their
+    cluster ('cluster_size') and the first of their names ('members'), shown in the hover of the dashboard.
+
+    Input:
+    - G (CompactGraph): graph from build_compact_graph().
+    - labels (np.ndarray): cluster of every node, from cluster_nodes().
+    - lazy_geometry (bool, optional): see CompactGraph.to_networkx(). Default is False.
+
+    Output:
+    - H (nx.Graph): graph to be rendered by build_dashboard().
+    """
+    H = coarsen_graph(G, labels).to_networkx(lazy_geometry=lazy_geometry)
+    for name, names in cluster_members(G, labels).items():
+        listed = ", ".join(names[:MAX_LISTED_MEMBERS])
+        if len(names) > MAX_LISTED_MEMBERS:
+            listed += " ... (+%d)" % (len(names) - MAX_LISTED_MEMBERS)
+        H.nodes[name].update(cluster_size=len(names), members=listed)
+    return H
+
+
+def save_clusters(cluster_file, G, labels, method):
+    """
+    Writes the clusters of an overview to a json sidecar file, to be read back for the drill-down.
+
+    Input:
+    - cluster_file (str): path to the json file.
+    - G (CompactGraph): clustered graph.
+    - labels (np.ndarray): cluster of every node, from cluster_nodes().
+    - method (str): coarsening method of the clusters.
+    """
+    with open(cluster_file, "w") as fclusters:
+        json.dump({"method": method, "clusters": cluster_members(G, labels)}, fclusters)
+
+
+def load_clusters(cluster_file, G, method):
+    """
+    Clusters stored by save_clusters(), if they were computed with the same method for the same nodes.
+
+    Input:
+    - cluster_file (str): path to the json file.
+    - G (CompactGraph): graph to be clustered.
+    - method (str): coarsening method.
+
+    Output:
+    - labels (np.ndarray, None): cluster of every node, None if the file does not exist or does not match G.
+    """
+    if not os.path.isfile(cluster_file):
+        return None
+    with open(cluster_file, "r") as fclusters:
+        stored = json.load(fclusters)
+    if stored.get("method") != method:
+        return None
+    labels = np.full(G.number_of_nodes(), -1, dtype=np.int64)
+    for ii, names in enumerate(stored["clusters"].values()):
+        for name in names:
+            if name not in G.index:
+                return None
+            labels[G.index[name]] = ii
+    return labels if (labels >= 0).all() else None
+
+
+def cluster_subgraph(G, labels, cluster):
+    """
+    Full subgraph of one cluster, for the drill-down from the overview.
+
+    Input:
+    - G (CompactGraph): graph from build_compact_graph().
+    - labels (np.ndarray): cluster of every node, from cluster_nodes().
+    - cluster (str): name of the cluster (cl_<index>), or name (crn_id) of one of its nodes.
+
+    Output:
+    - H (CompactGraph): subgraph with the nodes of the cluster and the reactions between them.
+    """
+    if cluster in G.index:
+        index = int(labels[G.index[cluster]])
+    elif cluster.startswith("cl_") and cluster[3:].isdigit() and int(cluster[3:]) <= labels.max():
+        index = int(cluster[3:])
+    else:
+        raise KeyError("Unknown cluster or node %s" % cluster)
+    return G.subgraph([G.names[ii] for ii in np.flatnonzero(labels == index).tolist()])
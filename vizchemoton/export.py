@@ -0,0 +1,202 @@
+'''
+Bulk export of a network in standard formats, e.g. to upload it to ioChem-BD: one XYZ file per compound, flask,
+fragment of an adduct and TS, packed in compressed archives, and a json manifest with the reactions and the charge,
+multiplicity, energies and database IDs of every structure. The archives are written in parallel by a pool of
+processes, each one reading its structures directly from the compounds store (memory-mapped) and formatting them by
+batches, so that the geometries of the whole network are never held in memory at once.
+'''
+
+import io
+import os
+import json
+import time
+import tarfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .store import CompoundStore, read_compound_store
+from .process import BARRIERLESS, reaction_array, compound_fields, compound_fragments
+from .geometry import geometry_blocks
+
+ARCHIVE_FORMATS = ("tar.gz", "zip")
+MANIFEST_VERSION = 1
+# fields of the compounds that are not copied as they are to the records of the manifest
+_SKIPPED_FIELDS = ("crn_id", "_mongodb_id", "mongodb_id", "xyz")
+
+
+def structure_kind(crn_id):
+    """
+    Kind of a structure from its crn_id: 'ts', 'flask' or 'compound'.
+    """
+    if crn_id.startswith("ts"):
+        return "ts"
+    return "flask" if crn_id.startswith("f") else "compound"
+
+
+def _entry_fields(compounds, key):
+    # fields of an entry, without reading its geometry from the store
+    if isinstance(compounds, CompoundStore):
+        return compounds.entry_fields(key)
+    return list(compounds[key])
+
+
+def structure_records(compounds, keys=None):
+    """
+    Records of the structures of a set of compound entries: entries with a single structure give one, adducts one per
+    fragment. A structure shared by several entries, e.g. a compound found in many adducts, is only listed once.
+
+    Input:
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields
+    - keys (list, optional): node/ts indices. Default is None, all the entries.
+
+    Output:
+    - structures (list): (key, fragment position, record) tuples, record being a dictionary with the crn_id, the kind
+      (see structure_kind()) and the fields of the structure, its mongodb_id being that of the structure alone.
+    - entries (dict): mapping node/ts index -> {'crn_id', 'structures'}, the crn_id of the structures of the entry.
+    """
+    structures, entries, seen = [], dict(), set()
+    for key in (list(compounds) if keys is None else keys):
+        fields = [field for field in _entry_fields(compounds, key) if field != "xyz"]
+        comp = compound_fields(compounds, key, fields)
+        is_adduct = isinstance(comp["crn_id"], list)
+        crn_ids = comp["crn_id"] if is_adduct else [comp["crn_id"]]
+        entries[int(key)] = {"crn_id": comp["crn_id"], "structures": crn_ids}
+        for ii, crn_id in enumerate(crn_ids):
+            if crn_id in seen:
+                continue
+            seen.add(crn_id)
+            record = {"crn_id": crn_id, "kind": structure_kind(crn_id)}
+            record.update({field: comp[field][ii] if is_adduct else comp[field] for field in fields
+                           if field not in _SKIPPED_FIELDS})
+            # adducts join the IDs of their fragments, and those of TSs are marked with a ';'
+            if is_adduct:
+                record["mongodb_id"] = comp["_mongodb_id"][ii] if "_mongodb_id" in comp else None
+            else:
+                record["mongodb_id"] = comp["mongodb_id"].rstrip(";") if comp.get("mongodb_id") else None
+            structures.append((int(key), ii, record))
+    return structures, entries
+
+
+def xyz_comment(record):
+    """
+    Comment line of the XYZ file of a structure: its crn_id, charge, multiplicity and energy (kJ/mol).
+    """
+    return "%s charge=%s multiplicity=%s energy=%s" % (record["crn_id"], record.get("charge"),
+                                                       record.get("multiplicity"), record.get("energy"))
+
+
+def _open_archive(path, archive_format):
+    if archive_format == "zip":
+        return zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+    # gzip level 6, as zip, is about twice as fast as the default 9 for text of a few % more
+    return tarfile.open(path, "w:gz", compresslevel=6, format=tarfile.GNU_FORMAT)
+
+
+def _add_file(archive, name, text, mtime):
+    data = text.encode()
+    if isinstance(archive, zipfile.ZipFile):
+        archive.writestr(zipfile.ZipInfo(name, time.localtime(mtime)[:6]), data,
+                         compress_type=zipfile.ZIP_DEFLATED)
+        return
+    info = tarfile.TarInfo(name)
+    info.size, info.mtime = len(data), mtime
+    archive.addfile(info, io.BytesIO(data))
+
+
+def write_structure_archive(path, compounds, items, archive_format="tar.gz", batch_size=500):
+    """
+    Writes the XYZ files (angstrom) of a set of structures to one compressed archive. The structures are formatted
+    and written by batches, so that only the geometries of one batch are in memory.
+
+    Input:
+    - path (str): path to the archive.
+    - compounds (dict, CompoundStore, str): compounds holding the structures, or the path to a compounds store, which
+      is then opened memory-mapped (as done by the worker processes of export_network()).
+    - items (list): (key, fragment position, file name, comment line) of every structure.
+    - archive_format (str, optional): 'tar.gz' or 'zip'. Default is 'tar.gz'.
+    - batch_size (int, optional): number of structures formatted at once. Default is 500.
+
+    Output:
+    - path (str), n_files (int): the archive and the number of files written to it.
+    """
+    if isinstance(compounds, str):
+        compounds = read_compound_store(compounds)
+    mtime = int(time.time())
+    with _open_archive(path, archive_format) as archive:
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            fragments = [[compound_fragments(compounds, key)[frag]] for key, frag, _name, _comment in batch]
+            blocks = geometry_blocks(fragments)
+            for (_key, _frag, name, comment), fragment, block in zip(batch, fragments, blocks):
+                _add_file(archive, name, "%d\n%s\n%s\n" % (len(fragment[0][0]), comment, block), mtime)
+    return path, len(items)
+
+
+def export_network(reactions, compounds, output_dir, archive_format="tar.gz", archive_size=5000, jobs=1,
+                   verbose=True):
+    """
+    Exports a network to XYZ files in compressed archives and a manifest (manifest.json) in output_dir. The
+    structures are split in archives (structures_<part>.<format>) of archive_size files, written in parallel by jobs
+    processes. With a compounds store, every process reads its structures from the store files; with a compounds
+    dictionary, the entries of every archive are sent to its process.
+
+    The manifest holds the units, the list of archives, the records of all the structures (crn_id, kind, archive and
+    file, and the fields of the compounds such as charge, multiplicity, energies, mongodb_id and method), the
+    structures of every node/ts index and the reactions, as the names of their reactant, product and TS (None for
+    barrierless reactions), adducts being named by their crn_id joined with '+'.
+
+    Input:
+    - reactions (list, np.ndarray): [n1,n2,ts] rows in any of the forms accepted by reaction_array().
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields, or the
+      equivalent columnar store
+    - output_dir (str): directory of the archives and of the manifest, created if missing.
+    - archive_format (str, optional): 'tar.gz' or 'zip'. Default is 'tar.gz'.
+    - archive_size (int, optional): number of XYZ files per archive. Default is 5000.
+    - jobs (int, optional): number of processes writing the archives. Default is 1, writing them in this process.
+    - verbose (bool, optional): if True, print the progress. Default is True.
+
+    Output:
+    - manifest_file (str): path to the manifest.
+    """
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError("Unknown archive format %s, expected one of %s" % (archive_format,
+                                                                           ", ".join(ARCHIVE_FORMATS)))
+    os.makedirs(output_dir, exist_ok=True)
+    structures, entries = structure_records(compounds)
+
+    parts = []
+    for part, start in enumerate(range(0, len(structures), archive_size)):
+        archive = "structures_%04d.%s" % (part, archive_format)
+        items = []
+        for key, frag, record in structures[start:start + archive_size]:
+            record.update(archive=archive, file=record["crn_id"] + ".xyz")
+            items.append((key, frag, record["file"], xyz_comment(record)))
+        if isinstance(compounds, CompoundStore):
+            source = compounds.path
+        else:
+            source = {key: compounds[key] for key in dict.fromkeys(key for key, _frag, _name, _comment in items)}
+        parts.append((os.path.join(output_dir, archive), source, items, archive_format))
+    if verbose: print("## Exporting {n} structures to {p} archives in {d}".format(n=len(structures), p=len(parts),
+                                                                               d=output_dir))
+    if jobs > 1 and len(parts) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            list(executor.map(write_structure_archive, *zip(*parts)))
+    else:
+        for path, source, items, archive_format in parts:
+            write_structure_archive(path, source, items, archive_format)
+
+    names = {key: "+".join(entry["crn_id"]) if isinstance(entry["crn_id"], list) else entry["crn_id"]
+             for key, entry in entries.items()}
+    reaction_list = [{"reactant": names[n1], "product": names[n2], "ts": None if ts == BARRIERLESS else names[ts]}
+                     for n1, n2, ts in reaction_array(reactions).tolist()]
+    manifest = {"version": MANIFEST_VERSION, "units": {"coordinates": "angstrom", "energy": "kJ/mol"},
+                "archives": [os.path.basename(path) for path, _source, _items, _format in parts],
+                "structures": [record for _key, _frag, record in structures],
+                "entries": {str(key): entry for key, entry in entries.items()},
+                "reactions": reaction_list}
+    manifest_file = os.path.join(output_dir, "manifest.json")
+    with open(manifest_file, "w") as fmanifest:
+        # json.dumps() encodes with the C encoder, unlike json.dump()
+        fmanifest.write(json.dumps(manifest))
+    if verbose: print("## Manifest of {r} reactions written to {f}".format(r=len(reaction_list), f=manifest_file))
+    return manifest_file
@@ -0,0 +1,678 @@
+'''
+Extraction stage: reactions, compounds and transition states read from the Mongo-DB of a Chemoton exploration. This
+and its asynchronous counterpart in extract_async.py are the only modules that import SCINE, so that the stages
+working on the reactions and compounds files do not need it.
+'''
+
+# Standard Library Imports
+import json
+from collections import ChainMap
+from concurrent.futures import ProcessPoolExecutor
+
+from . import profiling
+from .process import parse_reaction_rows, compound_ids
+from .pathfinder import PathfinderIndex, read_pathfinder_index, changed_reaction_nodes
+
+# Project-Specific SCINE imports
+import scine_utilities as utils
+import scine_database as db
+from scine_chemoton.gears.pathfinder import Pathfinder as pf
+from scine_database.energy_query_functions import (get_energy_change,
+    get_barriers_for_elementary_step_by_type
+)
+
+# energy properties extracted by default, the first one filling the 'energy' field of the compounds
+ENERGY_TYPES = ["electronic_energy"]
+
+def get_energy_and_barriers(energy_type, es_id, elementary_steps, model1, structures, properties, es_from_graph):
+    """
+    Wrapper function Gets the elementary step ID with the lowest energy of the corresponding transition state of a
+    reaction.
+
+    Input:
+      - energy_type (str): name of the energy property such as 'electronic_energy' or 'gibbs_free_energy'
+      - es_id (str): id of the elementary_step
+      - elementary_steps (db.Collection): the elementary step collection
+      - model1 (dict): dictionary with the method_family, method, basis_set and program keys.
+      - structures (db.Collection): the structures collection
+      - properties (db.Collection): the properties step collection
+      - es_from_graph (db.ElementaryStep): db object for the given es_id 
+
+    Returns:
+      - energy (float): energy state in the reaction.
+      - barriers (tuple): forward and backward energy barriers 
+      - not_None (bool): returns True if no None was found in the barriers tuple 
+    """
+    with profiling.stage("scine.get_energy_change"):
+        energy = get_energy_change(db.ElementaryStep(es_id, elementary_steps), energy_type, model1, structures,
+                                   properties)
+    with profiling.stage("scine.get_barriers_for_elementary_step_by_type"):
+        barriers = get_barriers_for_elementary_step_by_type(es_from_graph, energy_type, model1, structures,
+                                                            properties)
+    
+    if None in barriers: 
+        not_None = False
+    else:
+        not_None = True
+
+    return energy, barriers, not_None
+
+
+def connect_database(db_name, ip, port, dict_method, verbose=True):
+    """
+    Opens a connection to the Mongo-DB and builds the model of the exploration.
+
+    Input:
+      - db_name (str): name of the database
+      - ip (str): internet protocol to the database
+      - port (int): port number to the database
+      - dict_method (dict): dictionary with the method_family, method, basis_set and program keys.
+      - verbose (bool, optional): if True, enable verbose output. Default is True.
+
+    Returns:
+      - manager (db.Manager): connected database manager
+      - model1 (db.Model): model of the exploration
+    """
+    manager = db.Manager()
+    credentials = db.Credentials(ip, int(port), db_name)
+    manager.set_credentials(credentials)
+    if verbose: print("## Connecting to the Mongo-DB")
+    with profiling.stage("db.connect"):
+        manager.connect()
+    return manager, build_model(dict_method)
+
+
+def build_model(dict_method):
+    """
+    Builds the model of the exploration from the method settings of the config file.
+
+    Input:
+      - dict_method (dict): dictionary with the method_family, method, basis_set and program keys.
+
+    Returns:
+      - model1 (db.Model): model of the exploration
+    """
+    model1 = db.Model(dict_method["method_family"], dict_method["method"], dict_method["basis_set"])
+    model1.program = dict_method["program"]
+    return model1
+
+
+def load_pathfinder_index(manager, model1, read_pathfinder=False, write_pathfinder=False, verbose=True):
+    """
+    Indexes the pathfinder graph of the exploration, either streaming a former export, which needs no database
+    connection, or building the graph from the database with Chemoton.
+
+    Input:
+      - manager (db.Manager, None): connected database manager, only used to build the graph
+      - model1 (db.Model): model of the exploration
+      - read_pathfinder (bool, str, optional): either False if no file to read, or string with the path to the file
+      - write_pathfinder (bool, str, optional): either False if no file to write, or string with the path to the new file
+      - verbose (bool, optional): if True, enable verbose output. Default is True.
+
+    Returns:
+      - index (PathfinderIndex): the ';0;' reaction nodes with their elementary steps and the aggregate types
+    """
+    if isinstance(read_pathfinder, str):
+        if verbose: print("## Reading pathfinder object with name "+read_pathfinder)
+        with profiling.stage("extract.pathfinder"):
+            return read_pathfinder_index(read_pathfinder)
+
+    # # # Build Pathfinder and index its NetworkX Digraph
+    pathfinder = pf(manager)
+    if verbose: print("## Writing pathfinder object with name "+write_pathfinder)
+    pathfinder.options.model = model1
+    pathfinder.options.graph_handler = "barrier"
+    #pathfinder.options.use_structure_model = True
+    #pathfinder.options.structure_model = model1
+    with profiling.stage("extract.pathfinder"):
+        pathfinder.build_graph()
+        pathfinder.export_graph(write_pathfinder)
+        return PathfinderIndex.from_graph(pathfinder.graph_handler.graph)
+
+
+def select_reaction_nodes(index, previous=None, verbose=True):
+    """
+    Lists the ';0;' reaction nodes of the pathfinder graph to be resolved, with their elementary steps.
+
+    Input:
+      - index (PathfinderIndex): index of the pathfinder graph
+      - previous (tuple, optional): (pathfinder_index, reactions, compounds) of a former extraction, the index being
+        a PathfinderIndex or the node attributes returned by read_pathfinder_nodes(). If given, only the new or
+        changed reaction nodes are listed. Default is None.
+      - verbose (bool, optional): if True, enable verbose output. Default is True.
+
+    Returns:
+      - lhs_rxn_list (list): (rxn_id, es_id) pairs, es_id being None for nodes without elementary step
+      - prev_cmp_dict (dict): mapping node id -> index of the previous compounds, empty without previous extraction
+    """
+    lhs_rxn_list = index.reaction_nodes()
+    prev_cmp_dict = dict()
+    if previous is not None:
+        # incremental mode: only new or changed reaction nodes are resolved, keeping the previous indices
+        previous_index, _previous_reactions, previous_compounds = previous
+        if not isinstance(previous_index, PathfinderIndex):
+            previous_index = PathfinderIndex.from_nodes(previous_index.items())
+        changed = changed_reaction_nodes(previous_index.steps, index.steps)
+        lhs_rxn_list = [(rxn_id, es_id) for rxn_id, es_id in lhs_rxn_list if rxn_id in changed]
+        prev_cmp_dict = compound_ids(previous_compounds)
+        if verbose: print("## Updating {n} new or changed reactions".format(n=len(lhs_rxn_list)))
+    return lhs_rxn_list, prev_cmp_dict
+
+
+def new_entry_ids(cmp_dict, prev_cmp_dict):
+    """
+    Splits the nodes missing from a previous extraction into the aggregates and TS structures to be fetched.
+
+    Input:
+      - cmp_dict (dict): mapping node id -> index, from assign_reaction_indices()
+      - prev_cmp_dict (dict): mapping node id -> index of the previous compounds
+
+    Returns:
+      - new_cmp_dict (dict): the entries of cmp_dict that are not in prev_cmp_dict
+      - aggregate_ids (list): ids of the aggregates of the new compounds and adducts, duplicates allowed
+      - ts_ids (list): structure ids of the new transition states
+    """
+    new_cmp_dict = {compound_id: idx for compound_id, idx in cmp_dict.items() if compound_id not in prev_cmp_dict}
+    aggregate_ids = [_ids for compound_id in new_cmp_dict if ";" not in compound_id
+                     for _ids in compound_id.split("//")]
+    ts_ids = [compound_id[0:-1] for compound_id in new_cmp_dict if ";" in compound_id]
+    return new_cmp_dict, aggregate_ids, ts_ids
+
+
+def merge_previous_extraction(previous, rxn_records, cmp_dict, html_reactions, html_compounds, index=None,
+                              rxn_nodes=None):
+    """
+    Merges the reactions and compounds resolved in incremental mode into those of the previous extraction: rows of
+    the updated reactions are replaced, identified by their (reactant, product) pair, and new entries are appended.
+    With the current pathfinder index, the rows of the reaction nodes that are no longer in the graph, or that were
+    resolved again without a valid record, are dropped as well, from the sides of these nodes in the previous index.
+
+    Input:
+      - previous (tuple): (pathfinder_index, reactions, compounds) of the former extraction
+      - rxn_records (list): resolve_reaction() output for the updated reaction nodes
+      - cmp_dict (dict): mapping node id -> index, from assign_reaction_indices()
+      - html_reactions (list), html_compounds (dict): reactions and compounds of the updated nodes
+      - index (PathfinderIndex, optional): index of the current pathfinder graph. Default is None, only the rows of
+        the updated reactions are replaced.
+      - rxn_nodes (list, optional): (rxn_id, es_id) pairs of the updated reaction nodes, in the order of
+        rxn_records. Default is None.
+
+    Returns:
+      - html_reactions (list), html_compounds (dict, Mapping): the merged reactions and compounds. Over a compounds
+        store, a mapping reading the previous entries from it on access, so that they are only rebuilt when written.
+    """
+    previous_index, previous_reactions, previous_compounds = previous
+    updated_pairs = set()
+    for record in rxn_records:
+        if record is not None:
+            lhs, rhs, _ts = record
+            updated_pairs.add((cmp_dict["//".join(sorted(lhs))], cmp_dict["//".join(sorted(rhs))]))
+    if index is not None:
+        if not isinstance(previous_index, PathfinderIndex):
+            previous_index = PathfinderIndex.from_nodes(previous_index.items())
+        stale_nodes = [node for node in previous_index.steps if node not in index.steps]
+        stale_nodes += [rxn_id for (rxn_id, _es_id), record in zip(rxn_nodes or [], rxn_records) if record is None]
+        for node in stale_nodes:
+            lhs, rhs = previous_index.sides.get(node, (None, None))
+            if lhs in cmp_dict and rhs in cmp_dict:
+                updated_pairs.add((cmp_dict[lhs], cmp_dict[rhs]))
+    kept_reactions = [row for row in parse_reaction_rows(previous_reactions) if tuple(row[0:2]) not in updated_pairs]
+    if isinstance(previous_compounds, dict):
+        merged_compounds = {int(key): value for key, value in previous_compounds.items()}
+        merged_compounds.update(html_compounds)
+    else:
+        # new entries first to be looked up, iterated after the previous ones as in the merged dictionary
+        merged_compounds = ChainMap({int(key): value for key, value in html_compounds.items()}, previous_compounds)
+    return kept_reactions + html_reactions, merged_compounds
+
+
+def resolve_reaction(rxn_id, es_id, reactions, elementary_steps, model1, structures, properties,
+                     energy_type="electronic_energy"):
+    """
+    Resolves the reactants, products and transition state of a single reaction node of the pathfinder graph.
+
+    Input:
+      - rxn_id (str): id of the ';0;' reaction node in the pathfinder graph
+      - es_id (str, None): id of the elementary step assigned to the node, None if the node has none
+      - reactions (db.Collection): the reactions collection
+      - elementary_steps (db.Collection): the elementary step collection
+      - model1 (db.Model): model of the exploration
+      - structures (db.Collection): the structures collection
+      - properties (db.Collection): the properties collection
+      - energy_type (str, optional): energy property whose barriers must be defined for the step to be kept.
+        Default is 'electronic_energy'.
+
+    Returns:
+      - record (tuple, None): None for reactions with more than two species on a side, otherwise a tuple
+        (lhs, rhs, ts) with the lists of aggregate ids of both sides and ts being the TS node id ('id;'), None for
+        barrierless steps, or False if no valid elementary step is available.
+    """
+    rxn = db.Reaction(db.ID(rxn_id[:-3]), reactions)
+    with profiling.stage("db.reactions"):
+        lhs, rhs = rxn.get_reactants(db.Side.BOTH)
+    if len(lhs) >= 3 or len(rhs) >= 3:
+        return None
+
+    ts = False
+    if es_id is not None:
+        es_id = db.ID(es_id)
+        es_from_graph = db.ElementaryStep(es_id, elementary_steps)
+        _energy, barriers, not_None = get_energy_and_barriers(energy_type, es_id, elementary_steps,
+                                                              model1, structures, properties, es_from_graph)
+
+        with profiling.stage("db.elementary_steps"):
+            if es_from_graph.get_type() == db.ElementaryStepType.BARRIERLESS and not_None and _energy != None:  # check as jacs
+                ts = None
+            elif not_None:
+                ts = es_from_graph.get_transition_state().string() + ";"
+
+    return [o.string() for o in lhs], [o.string() for o in rhs], ts
+
+
+def _resolve_reaction_chunk(args):
+    """
+    Worker function for the parallel extraction: opens its own connection and resolves a chunk of reaction nodes.
+
+    Input:
+      - args (tuple): db_name, ip, port, dict_method, a list of (rxn_id, es_id) pairs, the energy type and whether
+        to profile
+
+    Returns:
+      - records (list): resolve_reaction() output for every reaction of the chunk, in the same order
+      - stats (dict): profiling statistics of the chunk, empty if profiling is disabled
+    """
+    db_name, ip, port, dict_method, chunk, energy_type, profile = args
+    if profile:
+        profiling.enable()
+    manager, model1 = connect_database(db_name, ip, port, dict_method, verbose=False)
+    reactions = manager.get_collection("reactions")
+    elementary_steps = manager.get_collection("elementary_steps")
+    structures = manager.get_collection("structures")
+    properties = manager.get_collection("properties")
+    records = [resolve_reaction(rxn_id, es_id, reactions, elementary_steps, model1, structures, properties,
+                                energy_type)
+               for rxn_id, es_id in chunk]
+    return records, profiling.snapshot() if profile else {}
+
+
+def assign_reaction_indices(rxn_records, cmp_dict=None):
+    """
+    Assigns the integer node indices to the aggregates, adducts and TSs of the resolved reactions. Indices are given
+    in order of appearance, so the result only depends on the order of the records and not on how they were fetched.
+
+    Input:
+      - rxn_records (list): resolve_reaction() output for every reaction node
+      - cmp_dict (dict, optional): mapping node id -> index to be extended. Default is None, starting from scratch.
+
+    Returns:
+      - cmp_dict (dict): mapping node id (aggregate id, 'id1//id2' for adducts or 'id;' for TSs) -> index
+      - html_reactions (list): a list of tuples with the indexes of the reactant, product, and TS.
+    """
+    cmp_dict = dict() if cmp_dict is None else cmp_dict
+    cmp_idx = max(cmp_dict.values(), default=0) + 1
+    html_reactions = list()
+
+    def side_index(side):
+        nonlocal cmp_idx
+        for node_i in side:
+            if node_i not in cmp_dict:
+                cmp_dict[node_i] = cmp_idx
+                cmp_idx = cmp_idx + 1
+        # flasks (i.e., adducts) are depicted with //
+        node = "//".join(sorted(side))
+        if node not in cmp_dict:
+            cmp_dict[node] = cmp_idx
+            cmp_idx = cmp_idx + 1
+        return node
+
+    for record in rxn_records:
+        if record is None:
+            continue
+        lhs, rhs, ts = record
+        node_x = side_index(lhs)
+        node_y = side_index(rhs)
+        if ts is None:
+            html_reactions.append([cmp_dict[node_x], cmp_dict[node_y], None])
+        elif ts is not False:
+            if ts not in cmp_dict:
+                cmp_dict[ts] = cmp_idx
+                cmp_idx = cmp_idx + 1
+            html_reactions.append([cmp_dict[node_x], cmp_dict[node_y], cmp_dict[ts]])
+
+    return cmp_dict, html_reactions
+
+
+MODEL_FIELDS = ["spin_mode", "basis_set", "method", "method_family", "program", "version", "solvation", "solvent",
+                "embedding", "periodic_boundaries", "external_field", "temperature", "pressure",
+                "electronic_temperature"]
+
+
+def model_key(model):
+    """
+    Hashable identifier of a model, e.g. to key cached records.
+
+    Input:
+      - model (db.Model): model of the exploration
+
+    Returns:
+      - key (tuple): values of all the model fields as strings
+    """
+    return tuple(str(getattr(model, field)) for field in MODEL_FIELDS)
+
+
+def model_selection(model):
+    """
+    Builds the MongoDB selection that matches the properties computed with a given model. Fields set to 'any' are
+    not constrained, and stored fields set to 'any' match every value, as in the model comparison of SCINE.
+
+    Input:
+      - model (db.Model): model of the exploration
+
+    Returns:
+      - selection (list): list of single-field selections to be joined with '$and'
+    """
+    selection = []
+    for field in MODEL_FIELDS:
+        value = str(getattr(model, field))
+        if value.lower() != "any":
+            selection.append({"model." + field: {"$in": [value, "any"]}})
+    return selection
+
+
+def get_centroid_ids(aggregate_ids, aggregate_types, compounds, flasks):
+    """
+    Resolves the centroid structure of every aggregate (compound or flask), querying each aggregate only once even
+    if it appears several times, e.g. both as a standalone node and as a member of adducts.
+
+    Input:
+      - aggregate_ids (iterable): ids of the aggregates as strings, duplicates allowed
+      - aggregate_types (dict): mapping aggregate id -> type name, as stored in the pathfinder graph
+      - compounds (db.Collection): the compounds collection
+      - flasks (db.Collection): the flasks collection
+
+    Returns:
+      - centroids (dict): mapping aggregate id -> centroid structure id as string
+    """
+    centroids = dict()
+    for agg_id in aggregate_ids:
+        if agg_id in centroids:
+            continue
+        if aggregate_types[agg_id] == db.CompoundOrFlask.COMPOUND.name:
+            aggregate, collection = db.Compound(db.ID(agg_id), compounds), "db.compounds"
+        else:
+            aggregate, collection = db.Flask(db.ID(agg_id), flasks), "db.flasks"
+        with profiling.stage(collection):
+            centroids[agg_id] = aggregate.get_centroid().string()
+    return centroids
+
+
+def fill_energies(record, str_id, names, energies, main_type):
+    """
+    Sets the energies of some energy types in a structure record, e.g. those missing from its cached version.
+
+    Input:
+      - record (dict): structure record, see get_structure_records()
+      - str_id (str): id of the structure
+      - names (list): energy types to be set
+      - energies (dict): mapping energy type -> structure id -> energy (Hartree)
+      - main_type (str): energy type filling 'energy'
+    """
+    for name in names:
+        value = energies[name].get(str_id)
+        if name == main_type:
+            record["energy"] = value
+        if "energies" in record:
+            record["energies"][name] = value
+
+
+def get_structure_records(structure_ids, energy_type, model, structures, properties, batch_size=500, cache=None):
+    """
+    Bulk extraction of geometries, charges, multiplicities and energies for a set of structures. Unique IDs are
+    resolved in batches through '$in' queries on the structures and properties collections, so that every structure
+    is fetched exactly once, with all its energy types in the same query.
+
+    Input:
+      - structure_ids (iterable): ids of the structures as strings, duplicates allowed
+      - energy_type (str, list): name of the energy property such as 'electronic_energy' or 'gibbs_free_energy', or
+        list of names, the first one filling 'energy'
+      - model (db.Model): model used to select the energy properties
+      - structures (db.Collection): the structures collection
+      - properties (db.Collection): the properties collection
+      - batch_size (int, optional): number of ids per query. Default is 500.
+      - cache (StructureCache, optional): on-disk cache serving the records that were already fetched, only the
+        missing energies being queried for the structures cached without some energy type. Default is None.
+
+    Returns:
+      - records (dict): mapping structure id -> dict with 'xyz', 'charge', 'multiplicity' and 'energy' (Hartree, None
+        if no energy is available for the model), and 'energies' (mapping energy type -> energy) if energy_type is a
+        list
+    """
+    energy_types = [energy_type] if isinstance(energy_type, str) else list(energy_type)
+    unique_ids = list(dict.fromkeys(structure_ids))
+    records, missing_types = dict(), dict()
+    if cache is not None:
+        records, missing_types = cache.get_many(unique_ids, model_key(model), energy_type)
+        profiling.count("cache.hits", len(records) - len(missing_types))
+    query_ids = [str_id for str_id in unique_ids if str_id not in records]
+    # structures cached without some energy type only query the energies
+    energy_ids = query_ids + list(missing_types)
+
+    # energies: when several properties match, the last one is kept as in get_energy_for_structure
+    energies = {name: dict() for name in energy_types}
+    for start in range(0, len(energy_ids), batch_size):
+        oids = [{"$oid": str_id} for str_id in energy_ids[start:start + batch_size]]
+        selection = {"$and": [{"structure": {"$in": oids}}, {"property_name": {"$in": energy_types}}] +
+                             model_selection(model)}
+        with profiling.stage("db.properties"):
+            for prop in properties.query_properties(json.dumps(selection)):
+                number_prop = db.NumberProperty(prop.id(), properties)
+                name = number_prop.get_property_name() if len(energy_types) > 1 else energy_types[0]
+                energies[name][number_prop.get_structure().string()] = number_prop.get_data()
+
+    for start in range(0, len(query_ids), batch_size):
+        batch = query_ids[start:start + batch_size]
+        oids = [{"$oid": str_id} for str_id in batch]
+        with profiling.stage("db.structures"):
+            for structure_obj in structures.query_structures(json.dumps({"_id": {"$in": oids}})):
+                str_id = structure_obj.id().string()
+                records[str_id] = {
+                    "xyz": [(str(o.element), tuple(o.position)) for o in structure_obj.get_atoms()],
+                    "charge": structure_obj.get_charge(),
+                    "multiplicity": structure_obj.multiplicity,
+                    "energy": energies[energy_types[0]].get(str_id),
+                }
+                if not isinstance(energy_type, str):
+                    records[str_id]["energies"] = {name: energies[name].get(str_id) for name in energy_types}
+        profiling.count("db.structures.documents", len(batch))
+    for str_id, names in missing_types.items():
+        fill_energies(records[str_id], str_id, names, energies, energy_types[0])
+    if cache is not None:
+        cache.put_many({str_id: records[str_id] for str_id in query_ids + list(missing_types) if str_id in records},
+                       model_key(model), energy_type)
+
+    missing = [str_id for str_id in unique_ids if str_id not in records]
+    if missing:
+        raise KeyError("Structures not found in the database: " + ", ".join(missing))
+    return records
+
+
+def _kjpermol(energy):
+    return None if energy is None else energy * utils.KJPERMOL_PER_HARTREE
+
+
+def build_compound_entries(cmp_dict, aggregate_types, centroids, records, model1, full_cmp_dict=None,
+                           energy_types=None):
+    """
+    Assembles the compound dictionary written to the compounds file from the bulk-fetched structure records.
+
+    Input:
+      - cmp_dict (dict): mapping node id (aggregate id, 'id1//id2' for adducts or 'id;' for TSs) -> index
+      - aggregate_types (dict): mapping aggregate id -> type name, as stored in the pathfinder graph
+      - centroids (dict): mapping aggregate id -> centroid structure id, from get_centroid_ids()
+      - records (dict): mapping structure id -> structure record, from get_structure_records()
+      - model1 (db.Model): model of the exploration
+      - full_cmp_dict (dict, optional): mapping used to look up the indices of adduct members, when cmp_dict only
+        holds a subset of the nodes. Default is None, using cmp_dict.
+      - energy_types (list, optional): energy types of the records, from get_structure_records() with a list. The
+        first one is the 'energy' field, the others are stored in fields of their names (kJ/mol, None where
+        missing). Default is None, only 'energy'.
+
+    Returns:
+      - html_compounds (dict): a dictionary for each compound containing relevant information (charge, spin, xyz ...)
+    """
+    full_cmp_dict = cmp_dict if full_cmp_dict is None else full_cmp_dict
+    # the first energy type is already the 'energy' field
+    energy_types = list(energy_types or [])[1:]
+    html_compounds = dict()
+    for compound_id in cmp_dict:
+        entry = dict()
+        html_compounds[cmp_dict[compound_id]] = entry
+        if "//" in compound_id:  # checking the flasks
+            # if the user is interested in uploading the data in ioChem-BD, this conditional
+            # block should be disregarded by deactivating the following line:
+            # continue
+            ids = compound_id.split("//")
+            for key in ['crn_id', '_mongodb_id', 'mongodb_id', 'xyz', 'charge', 'multiplicity', 'energy'] + \
+                       energy_types + ['method', 'basis_set', 'program', 'solvent', 'solvation']:
+                entry[key] = list()
+            for _ids in ids:
+                if aggregate_types[_ids] == db.CompoundOrFlask.COMPOUND.name:
+                    entry['crn_id'].append("c" + str(full_cmp_dict[_ids]))
+                else:
+                    entry['crn_id'].append("f" + str(full_cmp_dict[_ids]))
+                record = records[centroids[_ids]]
+                entry['_mongodb_id'].append(_ids)
+                entry['xyz'].append(record["xyz"])
+                entry['charge'].append(record["charge"])
+                entry['multiplicity'].append(record["multiplicity"])
+                entry['energy'].append(record["energy"] * utils.KJPERMOL_PER_HARTREE)
+                for name in energy_types:
+                    entry[name].append(_kjpermol(record["energies"][name]))
+                entry['method'].append(model1.method)
+                entry['basis_set'].append(model1.basis_set)
+                entry['program'].append(model1.program + " " + model1.version)
+                entry['solvent'].append(model1.solvent)
+                entry['solvation'].append(model1.solvation)
+            entry['mongodb_id'] = "//".join(entry['_mongodb_id'])
+
+        else:
+            if ";" in compound_id:  # checking the transitions states
+                record = records[compound_id[0:-1]]
+                entry['crn_id'] = "ts" + str(cmp_dict[compound_id])
+            else:  # checking compounds
+                record = records[centroids[compound_id]]
+                if aggregate_types[compound_id] == db.CompoundOrFlask.COMPOUND.name:
+                    entry['crn_id'] = "c" + str(cmp_dict[compound_id])
+                else:
+                    entry['crn_id'] = "f" + str(cmp_dict[compound_id])
+            entry['mongodb_id'] = compound_id
+            entry['xyz'] = record["xyz"]
+            entry['charge'] = record["charge"]
+            entry['multiplicity'] = record["multiplicity"]
+            entry['energy'] = record["energy"] * utils.KJPERMOL_PER_HARTREE
+            for name in energy_types:
+                entry[name] = _kjpermol(record["energies"][name])
+            entry['method'] = model1.method  # model_obj.method
+            entry['basis_set'] = model1.basis_set  # model_obj.basis_set
+            entry['program'] = model1.program + " 5.0.3"  # model_obj.program+" "+model_obj.version
+            entry['solvent'] = model1.solvent  # model_obj.solvent
+            entry['solvation'] = model1.solvation  # model_obj.solvation
+
+    return html_compounds
+
+
+def get_reactions_and_compounds(db_name, ip, port, dict_method, read_pathfinder=False, write_pathfinder=False,
+                                batch_size=500, workers=1, previous=None, cache=None, energy_types=None,
+                                verbose=True):
+    """
+    Extract the chemical reactions, compounds and transition states from the Mongo-DB where the exploration
+    with Chemoton was run.
+
+    Input:
+      - db_name (str): name of the database
+      - ip (str): internet protocol to the database
+      - port (int): port number to the database
+      - read_pathfinder (bool, str, optional): either False if no file to read, or string with the path to the file
+      - write_pathfinder (bool, str, optional): either False if no file to write, or string with the path to the new file
+      - batch_size (int, optional): number of structure IDs resolved per collection query. Default is 500.
+      - workers (int, optional): number of processes resolving the reactions, each one with its own connection.
+        The output is identical to the serial run. Default is 1.
+      - previous (tuple, optional): (pathfinder_index, reactions, compounds) of a former extraction, as returned by
+        read_pathfinder_index() and read_compound_reactions_files(). If given, only the new or changed reaction nodes
+        are resolved: existing indices are kept and new entries are appended. Default is None.
+      - cache (StructureCache, optional): on-disk cache for the structure records. Default is None.
+      - energy_types (list, optional): energy properties extracted in the same pass, e.g. ['electronic_energy',
+        'gibbs_free_energy']. The first one fills the 'energy' field and decides which elementary steps are valid,
+        the others are stored in fields of their names. Default is None, ENERGY_TYPES.
+      - verbose (bool, optional): if True, enable verbose output. Default is True.
+
+    Returns:
+      - html_reactions (list): a list of tuples with the indexes of the reactant, product, and TS.
+      - html_compounds (dict): a dictionary for each compound containing relevant information (charge, spin, xyz ...)
+    """
+    energy_types = list(energy_types or ENERGY_TYPES)
+
+    manager, model1 = connect_database(db_name, ip, port, dict_method, verbose=verbose)
+
+    #########################################################################
+
+    calculations = manager.get_collection("calculations")
+    structures = manager.get_collection("structures")
+    reactions = manager.get_collection("reactions")
+    flasks = manager.get_collection("flasks")
+    compounds = manager.get_collection("compounds")
+    properties = manager.get_collection('properties')
+    elementary_steps = manager.get_collection('elementary_steps')
+
+    index = load_pathfinder_index(manager, model1, read_pathfinder=read_pathfinder,
+                                  write_pathfinder=write_pathfinder, verbose=verbose)
+
+    # # # List of compounds and reactions
+    lhs_rxn_list, prev_cmp_dict = select_reaction_nodes(index, previous=previous, verbose=verbose)
+
+    if verbose: print("## Iterating through reactions in the network")
+    profiling.count("extract.reaction_nodes", len(lhs_rxn_list))
+    with profiling.stage("extract.reactions"):
+        if workers > 1 and lhs_rxn_list:
+            # contiguous chunks, several per worker to balance the load; map() keeps the original order
+            n_chunks = min(len(lhs_rxn_list), 4 * workers)
+            chunks = [lhs_rxn_list[ii * len(lhs_rxn_list) // n_chunks:(ii + 1) * len(lhs_rxn_list) // n_chunks]
+                      for ii in range(n_chunks)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunk_results = executor.map(_resolve_reaction_chunk,
+                                             [(db_name, ip, port, dict_method, chunk, energy_types[0],
+                                               profiling.is_enabled())
+                                              for chunk in chunks])
+                rxn_records = []
+                for chunk_records, stats in chunk_results:
+                    rxn_records.extend(chunk_records)
+                    if stats:
+                        profiling.merge(stats)
+        else:
+            rxn_records = [resolve_reaction(rxn_id, es_id, reactions, elementary_steps, model1, structures,
+                                            properties, energy_types[0])
+                           for rxn_id, es_id in lhs_rxn_list]
+    cmp_dict, html_reactions = assign_reaction_indices(rxn_records, cmp_dict=dict(prev_cmp_dict))
+
+    if verbose: print("## Creating compounds and reaction objects")
+    # resolve every aggregate and structure exactly once, then assemble the entries from the fetched records
+    node_types = index.node_types
+    new_cmp_dict, aggregate_ids, ts_ids = new_entry_ids(cmp_dict, prev_cmp_dict)
+    with profiling.stage("extract.centroids"):
+        centroids = get_centroid_ids(aggregate_ids, node_types, compounds, flasks)
+    with profiling.stage("extract.structures"):
+        records = get_structure_records(list(centroids.values()) + ts_ids, energy_types, model1, structures,
+                                        properties, batch_size=batch_size, cache=cache)
+    if verbose and cache is not None: cache.print_statistics()
+    # flask members already present in the previous compounds are referenced with their existing index
+    with profiling.stage("extract.compounds"):
+        html_compounds = build_compound_entries(new_cmp_dict, node_types, centroids, records, model1,
+                                                full_cmp_dict=cmp_dict, energy_types=energy_types)
+
+    if previous is not None:
+        html_reactions, html_compounds = merge_previous_extraction(previous, rxn_records, cmp_dict, html_reactions,
+                                                                   html_compounds, index=index,
+                                                                   rxn_nodes=lhs_rxn_list)
+
+    return html_reactions, html_compounds
+
@@ -0,0 +1,309 @@
+'''
+Asynchronous extraction backend: the same reactions and compounds as get_reactions_and_compounds(), read directly
+from the reactions, elementary_steps, compounds, flasks, structures and properties collections of the Mongo-DB. All
+the documents of a kind are fetched with batched '$in' queries that run concurrently over a bounded connection pool,
+so that the extraction is limited by the number of round trips in flight rather than by their latency.
+
+It needs an asynchronous MongoDB driver: pymongo >= 4.9 (AsyncMongoClient) or motor. SCINE is still used to build
+the pathfinder graph, when it is not read from a former export, and for the model of the exploration.
+The driver is only imported when this backend is selected (db.backend: 'async').
+
+The raw documents are read following the layout written by scine_database:
+  - reactions: 'lhs' and 'rhs', lists of {'id': ObjectId, 'type': 'compound' or 'flask'}
+  - elementary_steps: 'type', 'lhs' and 'rhs' (structure ObjectIds) and 'transition_state'
+  - compounds and flasks: 'structures', the first one being the centroid
+  - structures: 'elements', 'positions' (flat list, bohr), 'charge' and 'multiplicity'
+  - properties: 'structure', 'property_name', 'data' and 'model'
+'''
+
+# Standard Library Imports
+import asyncio
+
+from . import profiling
+
+# Project-Specific SCINE imports
+import scine_database as db
+
+from .extract import (build_model, connect_database, load_pathfinder_index, select_reaction_nodes, new_entry_ids,
+                      assign_reaction_indices, build_compound_entries, merge_previous_extraction, model_key,
+                      model_selection, fill_energies, ENERGY_TYPES)
+
+
+def open_client(ip, port, pool_size):
+    """
+    Opens an asynchronous client to the Mongo-DB, with pymongo if it provides one and motor otherwise.
+
+    Input:
+      - ip (str): internet protocol to the database
+      - port (int): port number to the database
+      - pool_size (int): maximum number of connections of the pool
+
+    Returns:
+      - client (AsyncMongoClient or AsyncIOMotorClient): the client, to be closed with close_client()
+    """
+    try:
+        from pymongo import AsyncMongoClient as client_class
+    except ImportError:
+        try:
+            from motor.motor_asyncio import AsyncIOMotorClient as client_class
+        except ImportError:
+            raise ImportError("The async extraction backend needs pymongo >= 4.9 or motor, set db.backend to 'scine' "
+                              "to use the SCINE database layer instead") from None
+    return client_class(ip, int(port), maxPoolSize=pool_size)
+
+
+async def close_client(client):
+    # AsyncMongoClient.close() is a coroutine, AsyncIOMotorClient.close() is not
+    closing = client.close()
+    if asyncio.iscoroutine(closing):
+        await closing
+
+
+def _object_ids(str_ids):
+    from bson import ObjectId
+    return [ObjectId(str_id) for str_id in str_ids]
+
+
+async def fetch_documents(collection, selection_of, str_ids, semaphore, batch_size=500, projection=None):
+    """
+    Runs one '$in' query per batch of ids, all batches concurrently but at most as many at a time as the semaphore
+    allows.
+
+    Input:
+      - collection (AsyncCollection): the collection to be queried
+      - selection_of (function): builds the selection from a list of ObjectIds
+      - str_ids (list): ids as strings, without duplicates
+      - semaphore (asyncio.Semaphore): bound on the queries in flight, shared by all the collections
+      - batch_size (int, optional): number of ids per query. Default is 500.
+      - projection (dict, optional): fields to be returned. Default is None, returning all the fields.
+
+    Returns:
+      - documents (list): the matching documents, in the order of the batches
+    """
+    async def query(batch):
+        async with semaphore:
+            profiling.count("db.%s.queries" % collection.name)
+            cursor = collection.find(selection_of(_object_ids(batch)), projection)
+            return await cursor.to_list(None)
+
+    batches = [str_ids[start:start + batch_size] for start in range(0, len(str_ids), batch_size)]
+    results = await asyncio.gather(*[query(batch) for batch in batches])
+    return [doc for docs in results for doc in docs]
+
+
+async def fetch_by_id(collection, str_ids, semaphore, batch_size=500, projection=None):
+    """
+    Fetches documents by their ids with fetch_documents().
+
+    Returns:
+      - documents (dict): mapping id as string -> document
+    """
+    docs = await fetch_documents(collection, lambda oids: {"_id": {"$in": oids}}, str_ids, semaphore,
+                                 batch_size=batch_size, projection=projection)
+    return {str(doc["_id"]): doc for doc in docs}
+
+
+async def fetch_energies(properties, str_ids, energy_type, model, semaphore, batch_size=500):
+    """
+    Fetches the energies of a set of structures computed with a given model. When several properties match, the last
+    one is kept as in get_energy_for_structure().
+
+    Input:
+      - properties (AsyncCollection): the properties collection
+      - str_ids (list): ids of the structures as strings, without duplicates
+      - energy_type (str, list): name of the energy property such as 'electronic_energy' or 'gibbs_free_energy', or
+        list of names fetched in the same queries
+      - model (db.Model): model used to select the energy properties
+      - semaphore (asyncio.Semaphore): bound on the queries in flight
+      - batch_size (int, optional): number of ids per query. Default is 500.
+
+    Returns:
+      - energies (dict): mapping structure id -> energy in Hartree, for the structures with a matching property. For
+        a list of energy types, mapping energy type -> such a dictionary.
+    """
+    energy_types = [energy_type] if isinstance(energy_type, str) else list(energy_type)
+    model_fields = model_selection(model)
+    docs = await fetch_documents(properties, lambda oids: {"$and": [{"structure": {"$in": oids}},
+                                                                    {"property_name": {"$in": energy_types}}] +
+                                                                   model_fields},
+                                 str_ids, semaphore, batch_size=batch_size,
+                                 projection={"structure": 1, "data": 1, "property_name": 1})
+    energies = {name: dict() for name in energy_types}
+    for doc in docs:
+        energies[doc.get("property_name", energy_types[0])][str(doc["structure"])] = doc["data"]
+    return energies[energy_type] if isinstance(energy_type, str) else energies
+
+
+def _side_ids(side):
+    # reaction sides hold {'id': ObjectId, 'type': ...} entries, elementary step sides plain ObjectIds
+    return [str(item["id"]) if isinstance(item, dict) else str(item) for item in side]
+
+
+def is_barrierless(step_doc):
+    """
+    Whether an elementary step document is barrierless; the type is stored either by name or by enum value.
+    """
+    step_type = step_doc.get("type")
+    return step_type == 1 or str(step_type).lower() == "barrierless"
+
+
+def resolve_reaction_documents(rxn_doc, step_doc, energies):
+    """
+    Document counterpart of resolve_reaction(): the elementary step is kept if the energies of all its structures are
+    known for the model, i.e. when both its energy change and its barriers are defined.
+
+    Input:
+      - rxn_doc (dict): document of the reaction
+      - step_doc (dict, None): document of the elementary step assigned to the reaction node, None if it has none
+      - energies (dict): mapping structure id -> energy, from fetch_energies()
+
+    Returns:
+      - record (tuple, None): as returned by resolve_reaction()
+    """
+    lhs, rhs = _side_ids(rxn_doc["lhs"]), _side_ids(rxn_doc["rhs"])
+    if len(lhs) >= 3 or len(rhs) >= 3:
+        return None
+
+    ts = False
+    if step_doc is not None:
+        defined = all(str_id in energies for str_id in _side_ids(step_doc["lhs"]) + _side_ids(step_doc["rhs"]))
+        if defined and is_barrierless(step_doc):
+            ts = None
+        elif defined and step_doc.get("transition_state") is not None and \
+                str(step_doc["transition_state"]) in energies:
+            ts = str(step_doc["transition_state"]) + ";"
+    return lhs, rhs, ts
+
+
+def structure_record(doc, energy, energies=None):
+    """
+    Structure record as built by get_structure_records(), from a structure document. The energies of all the
+    extracted types, if given, are kept in 'energies'.
+    """
+    positions = doc["positions"]
+    xyz = [(str(element), tuple(positions[3 * ii:3 * ii + 3])) for ii, element in enumerate(doc["elements"])]
+    record = {"xyz": xyz, "charge": doc["charge"], "multiplicity": doc["multiplicity"], "energy": energy}
+    if energies is not None:
+        record["energies"] = energies
+    return record
+
+
+async def get_reactions_and_compounds_async(db_name, ip, port, dict_method, read_pathfinder=False,
+                                            write_pathfinder=False, batch_size=500, pool_size=10, previous=None,
+                                            cache=None, energy_types=None, verbose=True):
+    """
+    Asynchronous counterpart of get_reactions_and_compounds(), with the same output. It is run with
+    asyncio.run(get_reactions_and_compounds_async(...)).
+
+    Input:
+      - db_name (str): name of the database
+      - ip (str): internet protocol to the database
+      - port (int): port number to the database
+      - dict_method (dict): dictionary with the method_family, method, basis_set and program keys.
+      - read_pathfinder (bool, str, optional): either False if no file to read, or string with the path to the file
+      - write_pathfinder (bool, str, optional): either False if no file to write, or string with the path to the new file
+      - batch_size (int, optional): number of IDs per '$in' query. Default is 500.
+      - pool_size (int, optional): maximum number of connections, i.e. of queries in flight. Default is 10.
+      - previous (tuple, optional): (pathfinder_nodes, reactions, compounds) of a former extraction, see
+        get_reactions_and_compounds(). Default is None.
+      - cache (StructureCache, optional): on-disk cache for the structure records. Default is None.
+      - energy_types (list, optional): energy properties extracted in the same queries, see
+        get_reactions_and_compounds(). Default is None, ENERGY_TYPES.
+      - verbose (bool, optional): if True, enable verbose output. Default is True.
+
+    Returns:
+      - html_reactions (list): a list of tuples with the indexes of the reactant, product, and TS.
+      - html_compounds (dict): a dictionary for each compound containing relevant information (charge, spin, xyz ...)
+    """
+    energy_types = list(energy_types or ENERGY_TYPES)
+    # an exported pathfinder graph is streamed from its file, otherwise it is built through SCINE
+    if isinstance(read_pathfinder, str):
+        manager, model1 = None, build_model(dict_method)
+    else:
+        manager, model1 = connect_database(db_name, ip, port, dict_method, verbose=verbose)
+    index = load_pathfinder_index(manager, model1, read_pathfinder=read_pathfinder, write_pathfinder=write_pathfinder,
+                                  verbose=verbose)
+    lhs_rxn_list, prev_cmp_dict = select_reaction_nodes(index, previous=previous, verbose=verbose)
+
+    if verbose: print("## Connecting to the Mongo-DB with a pool of {n} connections".format(n=pool_size))
+    client = open_client(ip, port, pool_size)
+    database = client[db_name]
+    semaphore = asyncio.Semaphore(pool_size)
+    try:
+        if verbose: print("## Fetching reactions and elementary steps")
+        profiling.count("extract.reaction_nodes", len(lhs_rxn_list))
+        with profiling.stage("extract.reactions"):
+            rxn_ids = list(dict.fromkeys(rxn_id[:-3] for rxn_id, _es_id in lhs_rxn_list))
+            es_ids = list(dict.fromkeys(es_id for _rxn_id, es_id in lhs_rxn_list if es_id is not None))
+            rxn_docs, step_docs = await asyncio.gather(
+                fetch_by_id(database["reactions"], rxn_ids, semaphore, batch_size, {"lhs": 1, "rhs": 1}),
+                fetch_by_id(database["elementary_steps"], es_ids, semaphore, batch_size,
+                            {"type": 1, "lhs": 1, "rhs": 1, "transition_state": 1}))
+            step_structures = list(dict.fromkeys(
+                str_id for doc in step_docs.values()
+                for str_id in _side_ids(doc["lhs"]) + _side_ids(doc["rhs"]) +
+                ([str(doc["transition_state"])] if doc.get("transition_state") is not None else [])))
+            energies = await fetch_energies(database["properties"], step_structures, energy_types, model1,
+                                            semaphore, batch_size)
+            # the validity of the elementary steps is decided by the first energy type
+            rxn_records = [resolve_reaction_documents(rxn_docs[rxn_id[:-3]],
+                                                      None if es_id is None else step_docs[es_id],
+                                                      energies[energy_types[0]])
+                           for rxn_id, es_id in lhs_rxn_list]
+        cmp_dict, html_reactions = assign_reaction_indices(rxn_records, cmp_dict=dict(prev_cmp_dict))
+
+        if verbose: print("## Creating compounds and reaction objects")
+        node_types = index.node_types
+        new_cmp_dict, aggregate_ids, ts_ids = new_entry_ids(cmp_dict, prev_cmp_dict)
+        aggregate_ids = list(dict.fromkeys(aggregate_ids))
+        with profiling.stage("extract.centroids"):
+            is_compound = {agg_id: node_types[agg_id] == db.CompoundOrFlask.COMPOUND.name for agg_id in aggregate_ids}
+            compound_ids = [agg_id for agg_id in aggregate_ids if is_compound[agg_id]]
+            flask_ids = [agg_id for agg_id in aggregate_ids if not is_compound[agg_id]]
+            aggregate_docs = await asyncio.gather(
+                fetch_by_id(database["compounds"], compound_ids, semaphore, batch_size, {"structures": 1}),
+                fetch_by_id(database["flasks"], flask_ids, semaphore, batch_size, {"structures": 1}))
+            centroids = {agg_id: str(doc["structures"][0]) for docs in aggregate_docs for agg_id, doc in docs.items()}
+
+        with profiling.stage("extract.structures"):
+            unique_ids = list(dict.fromkeys(list(centroids.values()) + ts_ids))
+            records, missing_types = dict(), dict()
+            if cache is not None:
+                records, missing_types = cache.get_many(unique_ids, model_key(model1), energy_types)
+                profiling.count("cache.hits", len(records) - len(missing_types))
+            query_ids = [str_id for str_id in unique_ids if str_id not in records]
+            # energies of the TSs and of the structures of the elementary steps are already known, and structures
+            # cached without some energy type only query the energies
+            known = set(step_structures)
+            missing_energies = [str_id for str_id in query_ids + list(missing_types) if str_id not in known]
+            structure_docs, more_energies = await asyncio.gather(
+                fetch_by_id(database["structures"], query_ids, semaphore, batch_size,
+                            {"elements": 1, "positions": 1, "charge": 1, "multiplicity": 1}),
+                fetch_energies(database["properties"], missing_energies, energy_types, model1, semaphore,
+                               batch_size))
+            for name in energy_types:
+                energies[name].update(more_energies[name])
+            for str_id, doc in structure_docs.items():
+                records[str_id] = structure_record(doc, energies[energy_types[0]].get(str_id),
+                                                   {name: energies[name].get(str_id) for name in energy_types})
+            for str_id, names in missing_types.items():
+                fill_energies(records[str_id], str_id, names, energies, energy_types[0])
+            profiling.count("db.structures.documents", len(structure_docs))
+            if cache is not None:
+                cache.put_many({str_id: records[str_id] for str_id in query_ids + list(missing_types)
+                                if str_id in records}, model_key(model1), energy_types)
+            missing = [str_id for str_id in unique_ids if str_id not in records]
+            if missing:
+                raise KeyError("Structures not found in the database: " + ", ".join(missing))
+    finally:
+        await close_client(client)
+    if verbose and cache is not None: cache.print_statistics()
+
+    with profiling.stage("extract.compounds"):
+        html_compounds = build_compound_entries(new_cmp_dict, node_types, centroids, records, model1,
+                                                full_cmp_dict=cmp_dict, energy_types=energy_types)
+    if previous is not None:
+        html_reactions, html_compounds = merge_previous_extraction(previous, rxn_records, cmp_dict, html_reactions,
+                                                                   html_compounds, index=index,
+                                                                   rxn_nodes=lhs_rxn_list)
+    return html_reactions, html_compounds
@@ -0,0 +1,50 @@
+'''
+Molecular formulas of structures from their element labels. Identical fragments recur all over a network (e.g. an
+aggregate that is a member of many adducts), so the counts and formulas are memoized per distinct sequence of labels.
+'''
+
+import functools
+from collections import Counter
+
+# distinct label sequences kept in memory, most TSs being unique structures
+CACHE_SIZE = 65536
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def element_counts(labels):
+    """
+    Number of atoms of every element of a structure, computed once per distinct sequence of labels.
+
+    Input:
+    - labels (tuple): element labels of the atoms.
+
+    Output:
+    - counts (tuple): (element, count) pairs sorted by element.
+    """
+    return tuple(sorted(Counter(labels).items()))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def formula_from_counts(counts):
+    """
+    Molecular formula from the output of element_counts().
+    """
+    formula = ""
+    for atom,ct in counts:
+        if ct == 1:
+            formula += atom
+        else:
+            formula += "%s%d" % (atom,ct)
+    return formula
+
+
+def fragment_formula(labels):
+    """
+    Molecular formula of a fragment.
+
+    Input:
+    - labels (iterable): element labels of the atoms.
+
+    Output:
+    - formula (str): formula with the elements sorted alphabetically, e.g. 'C2H6O'.
+    """
+    return formula_from_counts(element_counts(tuple(labels)))
@@ -0,0 +1,114 @@
+'''
+Batched geometry engine: all the structures of a network are handled as one concatenated coordinate array with
+per-structure offsets, so that unit conversion, adduct assembly and XYZ formatting run as a few NumPy operations
+instead of once per molecule.
+'''
+
+import itertools
+
+import numpy as np
+
+# CODATA 2018 value of the Bohr radius in angstrom
+BOHR_TO_ANGSTROM = 0.529177210903
+
+
+def concatenate_fragments(fragment_lists):
+    """
+    Joins the fragments of several structures into flat arrays.
+
+    Input:
+    - fragment_lists (list): one list per structure of (labels, coords) fragment tuples, as returned by
+      compound_fragments(), with coordinates in bohr.
+
+    Output:
+    - labels (list): element labels of all the atoms.
+    - coords (np.ndarray): (n_atoms, 3) array with the coordinates of all the atoms.
+    - offsets (np.ndarray): (n_structures + 1) array, atoms of structure i are in offsets[i]:offsets[i+1].
+    - frag_rank (np.ndarray): (n_atoms) array with the position of the fragment of every atom in its structure.
+    """
+    labels, coords, ranks, sizes = [], [], [], []
+    # coordinates given as nested lists are gathered and converted in a single call, arrays are kept as they are
+    pending = []
+    for fragments in fragment_lists:
+        n_atoms = 0
+        for rank, (frag_labels, frag_coords) in enumerate(fragments):
+            labels.extend(frag_labels)
+            if isinstance(frag_coords, np.ndarray):
+                if pending:
+                    coords.append(np.array(pending, dtype=np.float64).reshape(-1, 3))
+                    pending = []
+                coords.append(frag_coords.reshape(-1, 3))
+            else:
+                pending.extend(frag_coords)
+            ranks.append((rank, len(frag_labels)))
+            n_atoms += len(frag_labels)
+        sizes.append(n_atoms)
+    if pending:
+        coords.append(np.array(pending, dtype=np.float64).reshape(-1, 3))
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    if not coords:
+        return labels, np.zeros((0, 3)), offsets, np.zeros(0, dtype=np.int64)
+    rank_values, rank_counts = np.array(ranks, dtype=np.int64).reshape(-1, 2).T
+    return labels, np.concatenate(coords).astype(np.float64), offsets, np.repeat(rank_values, rank_counts)
+
+
+def assemble_geometries(coords, offsets, frag_rank, dist_adduct=3.0):
+    """
+    Converts coordinates from bohr to angstrom and displaces the fragments of adducts so that they are shown
+    together: fragment k > 0 is shifted by the center of the first fragment plus k*dist_adduct along every axis.
+
+    Input:
+    - coords (np.ndarray): (n_atoms, 3) array in bohr.
+    - offsets (np.ndarray): (n_structures + 1) array of atom offsets.
+    - frag_rank (np.ndarray): (n_atoms) array with the fragment position of every atom.
+    - dist_adduct (float, optional): distance in angstrom between the fragments of adducts. Default is 3.0.
+
+    Output:
+    - xyz (np.ndarray): (n_atoms, 3) array in angstrom.
+    """
+    xyz = coords * BOHR_TO_ANGSTROM
+    if not np.any(frag_rank > 0):
+        return xyz
+    atom_owner = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    first = frag_rank == 0
+    n_first = np.bincount(atom_owner[first], minlength=len(offsets) - 1)
+    centers = np.stack([np.bincount(atom_owner[first], weights=xyz[first, kk], minlength=len(offsets) - 1)
+                        for kk in range(3)], axis=1) / np.maximum(n_first, 1)[:, None]
+    shifted = ~first
+    xyz[shifted] += centers[atom_owner[shifted]] + (frag_rank[shifted] * dist_adduct)[:, None]
+    return xyz
+
+
+def format_xyz_blocks(labels, xyz, offsets):
+    """
+    Formats the XYZ blocks of all structures with a single string formatting operation.
+
+    Input:
+    - labels (list): element labels of all the atoms.
+    - xyz (np.ndarray): (n_atoms, 3) array in angstrom.
+    - offsets (np.ndarray): (n_structures + 1) array of atom offsets.
+
+    Output:
+    - xyz_blocks (list): newline-joined blocks of the form a1,x1,y1,z2\na2,x2,y2,z2... for every structure.
+    """
+    n_atoms = len(labels)
+    values = tuple(itertools.chain.from_iterable(zip(labels, *xyz.T.tolist())))
+    lines = ("%s %.6f %.6f %.6f\n" * n_atoms % values).split("\n")
+    return ["\n".join(lines[start:end]) for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+def geometry_blocks(fragment_lists, dist_adduct=3.0):
+    """
+    Wrapper building the angstrom XYZ blocks of a set of structures, joining the fragments of adducts.
+
+    Input:
+    - fragment_lists (list): one list per structure of (labels, coords) fragment tuples in bohr.
+    - dist_adduct (float, optional): distance in angstrom between the fragments of adducts. Default is 3.0.
+
+    Output:
+    - xyz_blocks (list): XYZ block of every structure, in the input order.
+    """
+    labels, coords, offsets, frag_rank = concatenate_fragments(fragment_lists)
+    xyz = assemble_geometries(coords, offsets, frag_rank, dist_adduct)
+    return format_xyz_blocks(labels, xyz, offsets)
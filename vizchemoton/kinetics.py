@@ -0,0 +1,367 @@
+'''
+Microkinetic simulation of a processed reaction network. Every reaction of the graph from build_compact_graph() is
+split into its forward and backward steps, with Eyring rate constants computed from the barriers of all the edges at
+once, and the species are the compounds and flasks of the nodes (adducts contribute each of their fragments). The
+mass-action rate equations are held as sparse stoichiometry and reactant arrays, and integrated with a stiff solver
+of scipy that is given their analytic sparse Jacobian.
+'''
+
+import csv
+
+import numpy as np
+import scipy.sparse
+from scipy.sparse.linalg import splu
+from scipy.integrate import solve_ivp, BDF, Radau
+
+from .process import compound_fields
+
+# Boltzmann constant (J/K), Planck constant (J s) and gas constant (kJ/mol/K)
+KB = 1.380649e-23
+PLANCK = 6.62607015e-34
+GAS_CONSTANT = 8.314462618e-3
+
+# stiff solvers of scipy.integrate.solve_ivp, the first two taking a sparse Jacobian
+STIFF_METHODS = ("BDF", "Radau", "LSODA")
+
+
+def fill_reducing_order(pattern):
+    """
+    Symmetric fill-reducing ordering of a sparse matrix: the minimum-degree ordering of A^T+A computed by SuperLU.
+    As every reaction is reversible, the Jacobian is structurally symmetric and this ordering gives much sparser
+    factors than the default COLAMD.
+
+    Input:
+    - pattern (scipy.sparse matrix): square matrix with the structure to be factorized.
+
+    Output:
+    - order (np.ndarray): position in the matrix of every row and column of the reordered one.
+    """
+    pattern = abs(scipy.sparse.csc_matrix(pattern, dtype=float))
+    n = pattern.shape[0]
+    # a dominant diagonal, so that no pivoting changes the order
+    A = (pattern + pattern.T + scipy.sparse.identity(n) * (pattern.nnz + 1.0)).tocsc()
+    lu = splu(A, permc_spec="MMD_AT_PLUS_A", diag_pivot_thresh=0.0, options=dict(SymmetricMode=True))
+    return np.argsort(lu.perm_c)
+
+
+class PermutedLU:
+    """
+    Sparse LU factors of a matrix reordered with a precomputed fill-reducing ordering, which SuperLU then keeps
+    (pivoting only away from the diagonal when it is much smaller than the rest of its column), so that the
+    ordering is not computed again for every factorization.
+
+    Input:
+    - A (scipy.sparse matrix): square matrix.
+    - order (np.ndarray): ordering from fill_reducing_order().
+    """
+
+    def __init__(self, A, order):
+        self.order = order
+        self.lu = splu(scipy.sparse.csr_matrix(A)[order][:, order].tocsc(), permc_spec="NATURAL",
+                       diag_pivot_thresh=0.1, options=dict(SymmetricMode=True))
+
+    def solve(self, b):
+        y = self.lu.solve(b[self.order])
+        x = np.empty_like(y)
+        x[self.order] = y
+        return x
+
+
+def _sparse_solver(base, order):
+    """
+    Subclass of a scipy solver (BDF or Radau) factorizing its sparse iteration matrices with a PermutedLU.
+    """
+    class SparseSolver(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if scipy.sparse.issparse(self.J):
+                def lu(A):
+                    self.nlu += 1
+                    return PermutedLU(A, order)
+                self.lu = lu
+
+    SparseSolver.__name__ = SparseSolver.__qualname__ = "Sparse" + base.__name__
+    return SparseSolver
+
+
+def eyring_rate_constants(barriers, temperature=298.15):
+    """
+    Eyring rate constants of a set of barriers, as rate_constant_from_barrier() of SCINE but for whole arrays.
+    Negative barriers, e.g. from barrierless reactions or electronic energies, are floored to zero.
+
+    Input:
+    - barriers (np.ndarray): barriers in kJ/mol.
+    - temperature (float, optional): temperature in K. Default is 298.15.
+
+    Output:
+    - k (np.ndarray): rate constants in s^-1 (M^-1 s^-1 for bimolecular steps), with the shape of barriers.
+    """
+    barriers = np.maximum(np.asarray(barriers, dtype=float), 0.0)
+    return KB * temperature / PLANCK * np.exp(-barriers / (GAS_CONSTANT * temperature))
+
+
+def node_species(G):
+    """
+    Species forming every node of a compact graph: the node itself for compounds and flasks, its fragments for
+    adducts.
+
+    Input:
+    - G (CompactGraph): graph from build_compact_graph().
+
+    Output:
+    - species (list): crn_id of every species, in order of first appearance.
+    - members (np.ndarray): (n_nodes, order) int64 species indices of every node, padded with len(species).
+    """
+    index, node_members = dict(), []
+    for key in G.node_key.tolist():
+        crn_id = compound_fields(G.compounds, key, ["crn_id"])["crn_id"]
+        node_members.append([index.setdefault(name, len(index))
+                             for name in (crn_id if isinstance(crn_id, list) else [crn_id])])
+    species = list(index)
+    order = max([len(item) for item in node_members], default=1)
+    members = np.full((len(node_members), order), len(species), dtype=np.int64)
+    for ii, item in enumerate(node_members):
+        members[ii, :len(item)] = item
+    return species, members
+
+
+class KineticModel:
+    """
+    Mass-action kinetics of a reaction network, with one reversible reaction per edge of the graph: forward from the
+    first node to the second one (rate constant from barrier[:, 0]) and backward (from barrier[:, 1]). The net rate
+    of every reaction is taken before it is spread over the species, so that fast equilibria cancel out once instead
+    of adding up rounding errors over every species they touch.
+
+    Attributes:
+    - species (list): crn_id of every species.
+    - node_names (list): name of every node of the graph.
+    - members (np.ndarray): (n_nodes, order) species indices of every node, padded with n_species.
+    - reactants, products (np.ndarray): (n_reactions, order) species indices of both sides of every reaction,
+      padded with n_species.
+    - rate_constants (np.ndarray): (n_reactions, 2) forward and backward rate constants, in s^-1 or M^-1 s^-1.
+    - stoichiometry (scipy.sparse.csr_matrix): (n_species, n_reactions) net stoichiometric coefficients.
+    - temperature (float): temperature in K.
+
+    Input:
+    - G (CompactGraph): graph from build_compact_graph(), with barriers in kJ/mol.
+    - temperature (float, optional): temperature in K. Default is 298.15.
+    - max_rate_constant (float, optional): upper limit of the rate constants, e.g. the diffusion limit. Default is
+      None, only limited by the Eyring prefactor.
+    """
+
+    def __init__(self, G, temperature=298.15, max_rate_constant=None):
+        self.species, self.members = node_species(G)
+        self.node_names = list(G.names)
+        self.temperature = temperature
+        n_species, n_reactions = len(self.species), len(G.edges)
+        self.rate_constants = eyring_rate_constants(G.barrier, temperature).reshape(-1, 2)
+        if max_rate_constant is not None:
+            self.rate_constants = np.minimum(self.rate_constants, max_rate_constant)
+        # column-major, as the rates are computed slot by slot
+        self.reactants = np.asfortranarray(self.members[G.edges[:, 0]])
+        self.products = np.asfortranarray(self.members[G.edges[:, 1]])
+
+        # net coefficients: -1 per reactant and +1 per product, summed when a species is on both sides
+        reaction = np.repeat(np.arange(n_reactions), self.members.shape[1])
+        rows = np.concatenate([self.reactants.ravel(), self.products.ravel()])
+        values = np.concatenate([-np.ones(self.reactants.size), np.ones(self.products.size)])
+        valid = rows < n_species
+        self.stoichiometry = scipy.sparse.csr_matrix((values[valid], (rows[valid], np.tile(reaction, 2)[valid])),
+                                                     shape=(n_species, n_reactions))
+        self.stoichiometry.eliminate_zeros()
+        # entries of the Jacobian of the net rates (d rate_j / d c_i), one per reactant and product slot
+        self._jac_valid = valid
+        self._jac_reactions = np.tile(reaction, 2)[valid]
+        self._jac_species = rows[valid]
+
+    @property
+    def n_species(self):
+        return len(self.species)
+
+    @property
+    def n_reactions(self):
+        return len(self.rate_constants)
+
+    def initial_concentrations(self, initial):
+        """
+        Initial concentration vector from a mapping of crn_id to concentration. Adducts, given as 'c1+c2', set the
+        concentration of each of their fragments; repeated species are summed.
+
+        Input:
+        - initial (dict): mapping crn_id -> concentration in mol/L.
+
+        Output:
+        - c0 (np.ndarray): concentration of every species, zero for those not given.
+        """
+        index = {name: ii for ii, name in enumerate(self.species)}
+        c0 = np.zeros(self.n_species)
+        for name, value in initial.items():
+            for fragment in str(name).split("+"):
+                if fragment not in index:
+                    raise KeyError("No species %s in the network" % fragment)
+                c0[index[fragment]] += float(value)
+        return c0
+
+    def rates(self, c):
+        """
+        Net rate (forward minus backward) of every reaction at the given concentrations.
+        """
+        # the padding index points to a constant concentration of one
+        extended = np.append(c, 1.0)
+        forward, backward = self.rate_constants[:, 0].copy(), self.rate_constants[:, 1].copy()
+        for slot in range(self.members.shape[1]):
+            forward *= extended[self.reactants[:, slot]]
+            backward *= extended[self.products[:, slot]]
+        return forward - backward
+
+    def derivative(self, _t, c):
+        """
+        dc/dt = S r(c), in the signature of solve_ivp().
+        """
+        return self.stoichiometry @ self.rates(c)
+
+    def jacobian(self, _t, c):
+        """
+        Analytic Jacobian S dr/dc, as a sparse matrix, in the signature of solve_ivp().
+        """
+        extended = np.append(c, 1.0)
+        partials = []
+        for side, sign, k in [(self.reactants, 1.0, self.rate_constants[:, 0]),
+                              (self.products, -1.0, self.rate_constants[:, 1])]:
+            # derivative of every reaction with respect to each slot of a side: product of the other slots
+            factors = extended[side]
+            partial = np.empty_like(factors)
+            for slot in range(factors.shape[1]):
+                partial[:, slot] = sign * k * np.prod(np.delete(factors, slot, axis=1), axis=1)
+            partials.append(partial.ravel())
+        rate_jacobian = scipy.sparse.csr_matrix((np.concatenate(partials)[self._jac_valid],
+                                                 (self._jac_reactions, self._jac_species)),
+                                                shape=(self.n_reactions, self.n_species))
+        jacobian = (self.stoichiometry @ rate_jacobian).tocsc()
+        # reactions with a species at zero concentration do not couple the others, which keeps the LU factors sparse
+        jacobian.eliminate_zeros()
+        return jacobian
+
+    def jacobian_sparsity(self):
+        """
+        Sparsity pattern of the Jacobian, species coupled through a reaction.
+        """
+        pattern = scipy.sparse.csr_matrix((np.ones(len(self._jac_reactions)),
+                                           (self._jac_reactions, self._jac_species)),
+                                          shape=(self.n_reactions, self.n_species))
+        return abs(self.stoichiometry) @ pattern
+
+    def node_concentrations(self, c):
+        """
+        Concentration of every node of the graph: that of its species for compounds and flasks, the lowest of its
+        fragments for adducts, i.e. the concentration of pairs that can be formed.
+
+        Input:
+        - c (np.ndarray): concentration of every species.
+
+        Output:
+        - node_c (np.ndarray): concentration of every node, in the order of node_names.
+        """
+        return np.append(c, np.inf)[self.members].min(axis=1)
+
+
+def simulate(model, c0, t_end, method="BDF", n_points=50, rtol=1e-6, atol=1e-20):
+    """
+    Integrates the concentration profiles of a kinetic model. The profiles are sampled at t=0 and at n_points times
+    spaced logarithmically over the ten decades before t_end, as the steps of a network span many timescales.
+
+    Input:
+    - model (KineticModel): network to simulate.
+    - c0 (np.ndarray, dict): initial concentrations, as a vector or as a mapping crn_id -> concentration.
+    - t_end (float): simulated time in s.
+    - method (str, optional): stiff solver of solve_ivp(), one of STIFF_METHODS. BDF and Radau use the sparse
+      Jacobian; LSODA only takes it as a dense matrix, which limits it to small networks. Default is 'BDF'.
+    - n_points (int, optional): number of sampled times after t=0. Default is 50.
+    - rtol (float, optional): relative tolerance of the solver. Default is 1e-6.
+    - atol (float, optional): absolute tolerance in mol/L. It has to stay far below the concentrations of interest:
+      species consumed by fast bimolecular reactions are left at values of the order of atol, possibly negative,
+      which these reactions amplify at a rate k*atol. Default is 1e-20.
+
+    Output:
+    - times (np.ndarray): sampled times in s.
+    - concentrations (np.ndarray): (n_species, n_times) concentration profiles in mol/L.
+    """
+    if method not in STIFF_METHODS:
+        raise ValueError("Unknown kinetics method %s, expected one of %s" % (method, ", ".join(STIFF_METHODS)))
+    if isinstance(c0, dict):
+        c0 = model.initial_concentrations(c0)
+    t_eval = np.concatenate([[0.0], np.geomspace(t_end * 1e-10, t_end, n_points)])
+    if method == "LSODA":
+        solver, jac = method, lambda t, c: model.jacobian(t, c).toarray()
+    else:
+        # the ordering of the structure of all the Jacobians, those of the iterations only dropping entries
+        pattern = model.jacobian_sparsity() + scipy.sparse.identity(model.n_species)
+        solver, jac = _sparse_solver({"BDF": BDF, "Radau": Radau}[method], fill_reducing_order(pattern)), \
+            model.jacobian
+    solution = solve_ivp(model.derivative, (0.0, t_end), c0, method=solver, t_eval=t_eval, jac=jac, rtol=rtol,
+                         atol=atol)
+    if not solution.success:
+        raise RuntimeError("The kinetic simulation failed: %s" % solution.message)
+    return solution.t, solution.y
+
+
+def run_kinetics(G, kinetics_config, verbose=True):
+    """
+    Wrapper function simulating a network with the settings of the 'kinetics' section of the config file.
+
+    Input:
+    - G (CompactGraph): graph from build_compact_graph().
+    - kinetics_config (dict): temperature, initial concentrations, t_end, method, n_points, rtol, atol and
+      max_rate_constant.
+    - verbose (bool, optional): if True, print the size of the model and the solver used. Default is True.
+
+    Output:
+    - model (KineticModel): simulated model.
+    - times (np.ndarray), concentrations (np.ndarray): as returned by simulate().
+    """
+    initial = kinetics_config.get("initial") or {}
+    if not initial:
+        raise ValueError("The kinetic simulation needs the initial concentrations (kinetics.initial)")
+    max_rate_constant = kinetics_config.get("max_rate_constant")
+    model = KineticModel(G, temperature=float(kinetics_config.get("temperature", 298.15)),
+                         max_rate_constant=None if max_rate_constant is None else float(max_rate_constant))
+    method = kinetics_config.get("method", "BDF")
+    if verbose: print("## Simulating {s} species and {r} reversible reactions with {m}".format(
+        s=model.n_species, r=model.n_reactions, m=method))
+    times, concentrations = simulate(model, initial, float(kinetics_config.get("t_end", 3600.0)), method=method,
+                                     n_points=kinetics_config.get("n_points", 50),
+                                     rtol=float(kinetics_config.get("rtol", 1e-6)),
+                                     atol=float(kinetics_config.get("atol", 1e-20)))
+    return model, times, concentrations
+
+
+def write_profiles(model, times, concentrations, profile_file):
+    """
+    Writes the concentration profiles to a csv file, with one row per sampled time and one column per species.
+
+    Input:
+    - model (KineticModel): simulated model.
+    - times (np.ndarray), concentrations (np.ndarray): as returned by simulate().
+    - profile_file (str): path to the csv file.
+    """
+    with open(profile_file, "w", newline="") as fcsv:
+        writer = csv.writer(fcsv)
+        writer.writerow(["time"] + model.species)
+        for jj, time in enumerate(times.tolist()):
+            writer.writerow(["%.6e" % time] + ["%.6e" % value for value in concentrations[:, jj].tolist()])
+
+
+def set_concentrations(G, model, concentrations):
+    """
+    Adds the final concentration of every node as its 'concentration' field, to be used as map_field of
+    build_dashboard(). Nodes of G that are not in the model, e.g. when it was built for another network, are skipped.
+
+    Input:
+    - G (nx.Graph): graph from CompactGraph.to_networkx(), possibly of a selection of the simulated network.
+    - model (KineticModel): simulated model.
+    - concentrations (np.ndarray): (n_species, n_times) profiles from simulate().
+    """
+    node_c = model.node_concentrations(concentrations[:, -1]).tolist()
+    for name, value in zip(model.node_names, node_c):
+        if name in G:
+            G.nodes[name]["concentration"] = value
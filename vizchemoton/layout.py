@@ -0,0 +1,276 @@
+'''
+Scalable graph layouts for the dashboard, with positions persisted to a sidecar file so that re-runs warm-start from
+the previous layout: existing nodes keep their place and only new nodes are positioned.
+'''
+
+import os
+import json
+import inspect
+import functools
+
+import numpy as np
+import networkx as nx
+import scipy.fft
+from scipy.spatial import cKDTree
+
+# maximum number of neighbors per node handled exactly below the mesh resolution
+_SHORT_RANGE_NEIGHBORS = 8
+
+
+def _initial_positions(nodes, edges, pos, rng):
+    """
+    Places the nodes without a given position next to their already placed neighbors, or at random if they have
+    none, so that new nodes start close to the region they are connected to.
+    """
+    n_nodes = len(nodes)
+    xy = rng.random((n_nodes, 2))
+    placed = np.zeros(n_nodes, dtype=bool)
+    index = {nd: ii for ii, nd in enumerate(nodes)}
+    for nd, xy_nd in (pos or {}).items():
+        if nd in index:
+            xy[index[nd]] = xy_nd
+            placed[index[nd]] = True
+    if not placed.any():
+        return xy, placed
+    known = placed.copy()
+    scale = np.ptp(xy[known], axis=0).max() or 1.0
+    jitter = 0.05 * scale / np.sqrt(max(known.sum(), 1))
+    # breadth-first placement from the known region
+    neighbors = [[] for _ in range(n_nodes)]
+    for ii, jj in edges:
+        neighbors[ii].append(jj)
+        neighbors[jj].append(ii)
+    frontier = [ii for ii in range(n_nodes) if not placed[ii] and any(placed[jj] for jj in neighbors[ii])]
+    while frontier:
+        new_frontier = []
+        for ii in frontier:
+            if placed[ii]:
+                continue
+            anchors = [jj for jj in neighbors[ii] if placed[jj]]
+            xy[ii] = xy[anchors].mean(axis=0) + rng.normal(0.0, jitter, 2)
+            placed[ii] = True
+            new_frontier.extend(jj for jj in neighbors[ii] if not placed[jj])
+        frontier = new_frontier
+    return xy, known
+
+
+def place_new_nodes(G, positions, nodes, seed=None):
+    """
+    Positions for nodes added to a graph that is already laid out, next to their placed neighbors, without moving
+    the other nodes. Only the new nodes and their neighbors are visited, so that the cost does not depend on the
+    size of the graph.
+
+    Input:
+    - G (nx.Graph): graph holding the new nodes.
+    - positions (dict): mapping node -> (x, y) of the nodes already placed.
+    - nodes (iterable): nodes without position.
+    - seed (int, optional): seed for the random placement of nodes without placed neighbors. Default is None.
+
+    Output:
+    - new_positions (dict): mapping node -> np.array([x, y]) of the new nodes.
+    """
+    nodes = [nd for nd in nodes if nd not in positions]
+    if not nodes:
+        return dict()
+    local = list(dict.fromkeys(nodes + [nb for nd in nodes for nb in G.neighbors(nd)]))
+    index = {nd: ii for ii, nd in enumerate(local)}
+    edges = [(index[nd], index[nb]) for nd in nodes for nb in G.neighbors(nd)]
+    rng = np.random.default_rng(seed)
+    # nodes without placed neighbors keep a random position in the unit square
+    xy, _known = _initial_positions(local, edges, {nd: positions[nd] for nd in local if nd in positions}, rng)
+    return {nd: xy[index[nd]] for nd in nodes}
+
+
+def _mesh_kernel(n_cells):
+    """
+    Fourier transform of the repulsive force field r/|r|^2 (in cell units) on a zero-padded (2n x 2n) grid, so that
+    the circular convolution with the node density has no wrap-around between cells of the n x n mesh.
+    """
+    offsets = np.arange(2 * n_cells)
+    offsets = np.where(offsets < n_cells, offsets, offsets - 2 * n_cells).astype(float)
+    offsets[n_cells] = 0.0
+    dx, dy = np.meshgrid(offsets, offsets, indexing="ij")
+    r2 = dx * dx + dy * dy
+    r2[r2 == 0] = 1.0
+    return scipy.fft.rfft2(dx / r2), scipy.fft.rfft2(dy / r2)
+
+
+def _repulsion(xy, k, n_cells, kernel_fft):
+    """
+    Approximate all-pairs Fruchterman-Reingold repulsion (magnitude k^2/d) with a particle-mesh scheme: nodes are
+    binned on an n_cells x n_cells grid and the force field is obtained by FFT convolution, costing
+    O(n_nodes + n_cells^2 log n_cells). The closest neighbors within one cell, which the mesh cannot resolve, are
+    added exactly.
+    """
+    n_nodes = len(xy)
+    low = xy.min(axis=0)
+    h = max(np.ptp(xy, axis=0).max(), k) / (n_cells - 1)
+    cell = np.minimum(((xy - low) / h).astype(np.int64), n_cells - 1)
+    flat = cell[:, 0] * 2 * n_cells + cell[:, 1]
+    density = np.bincount(flat, minlength=4 * n_cells * n_cells).astype(float).reshape(2 * n_cells, 2 * n_cells)
+    density_fft = scipy.fft.rfft2(density, workers=-1)
+    disp = np.empty((n_nodes, 2))
+    for dim in range(2):
+        field = scipy.fft.irfft2(density_fft * kernel_fft[dim], s=density.shape, workers=-1)
+        disp[:, dim] = field.ravel()[flat] * (k * k / h)
+
+    # the nearest neighbors are bounded so that dense clusters in the first iterations do not blow up the cost
+    dist, nbr = cKDTree(xy).query(xy, k=_SHORT_RANGE_NEIGHBORS + 1, distance_upper_bound=h)
+    dist, nbr = dist[:, 1:], nbr[:, 1:]
+    valid = nbr < n_nodes
+    if valid.any():
+        owner = np.nonzero(valid)[0]
+        other = nbr[valid]
+        delta = xy[owner] - xy[other]
+        dist = np.maximum(dist[valid], 0.01 * k)
+        force = delta * (k * k / (dist * dist))[:, None]
+        for dim in range(2):
+            disp[:, dim] += np.bincount(owner, weights=force[:, dim], minlength=n_nodes)
+    return disp
+
+
+def force_directed_layout(G, pos=None, fixed=None, iterations=100, k=None, seed=None):
+    """
+    Fruchterman-Reingold force-directed layout scaling to large networks: the all-pairs repulsion is approximated on
+    a grid through FFT convolution (particle-mesh, as an alternative to a Barnes-Hut tree) and attraction only runs
+    over the sparse edge list, so each iteration is roughly linear in the size of the graph instead of quadratic as
+    in nx.kamada_kawai_layout or nx.spring_layout.
+
+    Input:
+    - G (nx.Graph): graph to be laid out.
+    - pos (dict, optional): initial positions for (some of) the nodes, e.g. from a previous run. Default is None.
+    - fixed (iterable, optional): nodes whose position from pos is kept. Default is None.
+    - iterations (int, optional): number of iterations. Default is 100.
+    - k (float, optional): optimal distance between nodes. Default is None, extent/sqrt(n_nodes).
+    - seed (int, optional): seed for the random placement of nodes without initial position. Default is None.
+
+    Output:
+    - positions (dict): mapping node -> np.array([x, y]). Fresh layouts are scaled to [-1, 1]; warm-started ones
+      keep the coordinates of the fixed nodes.
+    """
+    nodes = list(G.nodes)
+    n_nodes = len(nodes)
+    if n_nodes == 0:
+        return dict()
+    index = {nd: ii for ii, nd in enumerate(nodes)}
+    edges = np.array([(index[n1], index[n2]) for n1, n2 in G.edges if n1 != n2], dtype=np.int64).reshape(-1, 2)
+    rng = np.random.default_rng(seed)
+    xy, placed = _initial_positions(nodes, edges, pos, rng)
+
+    frozen = np.zeros(n_nodes, dtype=bool)
+    for nd in (fixed or []):
+        if nd in index and placed[index[nd]]:
+            frozen[index[nd]] = True
+    if frozen.all():
+        return {nd: xy[ii] for ii, nd in enumerate(nodes)}
+
+    extent = np.ptp(xy, axis=0).max() or 1.0
+    if k is None:
+        k = extent / np.sqrt(n_nodes)
+    temperature = 0.1 * extent
+    cooling = temperature / (iterations + 1)
+    n_cells = int(np.clip(np.sqrt(n_nodes), 16, 512))
+    kernel_fft = _mesh_kernel(n_cells)
+
+    for _ in range(iterations):
+        disp = _repulsion(xy, k, n_cells, kernel_fft)
+        # attraction along edges
+        if len(edges):
+            delta = xy[edges[:, 0]] - xy[edges[:, 1]]
+            dist = np.maximum(np.linalg.norm(delta, axis=1), 0.01 * k)
+            force = (delta / dist[:, None]) * (dist * dist / k)[:, None]
+            for dim in range(2):
+                disp[:, dim] -= np.bincount(edges[:, 0], weights=force[:, dim], minlength=n_nodes)
+                disp[:, dim] += np.bincount(edges[:, 1], weights=force[:, dim], minlength=n_nodes)
+        disp[frozen] = 0.0
+        length = np.maximum(np.linalg.norm(disp, axis=1), 1e-12)
+        xy += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature -= cooling
+
+    if not frozen.any():
+        xy = xy - xy.mean(axis=0)
+        lim = np.abs(xy).max()
+        if lim > 0:
+            xy = xy / lim
+    return {nd: xy[ii] for ii, nd in enumerate(nodes)}
+
+
+def load_layout_cache(cache_file):
+    """
+    Reads the positions stored in a layout sidecar file.
+
+    Input:
+    - cache_file (str): path to the json file.
+
+    Output:
+    - positions (dict): mapping node name (crn_id) -> np.array([x, y]), empty if the file does not exist.
+    """
+    if not os.path.isfile(cache_file):
+        return dict()
+    with open(cache_file, "r") as fcache:
+        return {nd: np.array(xy, dtype=float) for nd, xy in json.load(fcache).items()}
+
+
+def save_layout_cache(cache_file, positions):
+    """
+    Writes node positions to a layout sidecar file.
+
+    Input:
+    - cache_file (str): path to the json file.
+    - positions (dict): mapping node name (crn_id) -> (x, y).
+    """
+    with open(cache_file, "w") as fcache:
+        json.dump({str(nd): [float(val) for val in xy] for nd, xy in positions.items()}, fcache)
+
+
+def cached_layout(G, cache_file, layout_function=force_directed_layout):
+    """
+    Layout with positions persisted in a sidecar file keyed by node name (crn_id). Cached nodes never move: the
+    force-directed layout, and networkx layouts taking pos and fixed (e.g. spring), are warm-started keeping them
+    fixed, while for other layout functions the missing nodes are placed next to their neighbors with
+    place_new_nodes(). The layout function is only run on the whole graph when no node is cached. Cached nodes absent
+    from G are kept in the file.
+
+    Input:
+    - G (nx.Graph): graph to be laid out.
+    - cache_file (str): path to the json sidecar file.
+    - layout_function (function, optional): layout to be used. Default is force_directed_layout.
+
+    Output:
+    - positions (dict): mapping node -> np.array([x, y]).
+    """
+    cached = load_layout_cache(cache_file)
+    known = [nd for nd in G.nodes if nd in cached]
+    if len(known) == G.number_of_nodes():
+        positions = {nd: cached[nd] for nd in G.nodes}
+    elif not known:
+        positions = layout_function(G)
+    elif layout_function is force_directed_layout or "fixed" in inspect.signature(layout_function).parameters:
+        positions = layout_function(G, pos={nd: cached[nd] for nd in known}, fixed=known)
+    else:
+        positions = {nd: cached[nd] for nd in known}
+        positions.update(place_new_nodes(G, positions, [nd for nd in G.nodes if nd not in cached]))
+    cached.update(positions)
+    save_layout_cache(cache_file, cached)
+    return positions
+
+
+def get_layout_function(name, cache_file=None):
+    """
+    Layout function from its name in the config file: 'force_directed' for force_directed_layout(), or the prefix of
+    any networkx layout (e.g. 'kamada_kawai' for nx.kamada_kawai_layout).
+
+    Input:
+    - name (str): name of the layout.
+    - cache_file (str, optional): path to the sidecar file with cached positions. Default is None, no cache.
+
+    Output:
+    - layout_function (function): function taking a graph and returning a dictionary of positions.
+    """
+    if name == "force_directed":
+        layout_function = force_directed_layout
+    else:
+        layout_function = getattr(nx, "%s_layout" % name)
+    if cache_file:
+        return functools.partial(cached_layout, cache_file=cache_file, layout_function=layout_function)
+    return layout_function
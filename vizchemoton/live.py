@@ -0,0 +1,445 @@
+'''
+Live dashboard: a local Bokeh server keeps the processed graph in memory and watches the reactions and compounds files
+(extracting the new reactions from the Mongo-DB first, if it is active). The nodes and edges that are new or changed
+are pushed to the connected browsers through stream() and patch() of the data sources of the network view. They are
+found from the reaction rows added to the reactions file, and only the part of the network around them is built,
+with its geometries and JSmol models, so an update costs the size of the delta instead of a new HTML file.
+'''
+
+import os
+import threading
+import functools
+
+import numpy as np
+
+from bokeh.core.templates import get_env
+from bokeh.server.server import Server
+from bokeh.application import Application
+from bokeh.application.handlers.function import FunctionHandler
+import RXVisualizer as arxviz
+
+from .process import resolve_geometries, read_reactions, read_compounds_file, BARRIERLESS
+from .layout import get_layout_function, place_new_nodes
+from .render import dashboard_view, STYLE_TEMPLATE
+from .sidecars import GEOMETRY_FIELDS
+from . import profiling
+
+
+def file_signature(paths):
+    """
+    Modification times and sizes of a set of files, to tell whether any of them changed. Directories (compounds
+    stores) are described by the files they hold.
+
+    Input:
+    - paths (list): paths to files or directories.
+
+    Output:
+    - signature (list): one entry per path, None for missing paths.
+    """
+    signature = []
+    for path in paths:
+        if os.path.isdir(path):
+            signature.append(sorted((entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                                    for entry in os.scandir(path)))
+        elif os.path.exists(path):
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        else:
+            signature.append(None)
+    return signature
+
+
+def _fields(data):
+    return {key: value for key, value in data.items() if key not in GEOMETRY_FIELDS}
+
+
+def graph_delta(old, new):
+    """
+    Nodes and edges of a graph that are new or changed with respect to a former version of it. Fields are compared
+    without the geometries, so that both graphs can be built with lazy_geometry. The nodes that gain edges change
+    too, through their 'degree' and 'neighbors' fields.
+
+    Input:
+    - old (nx.Graph): former graph.
+    - new (nx.Graph): current graph.
+
+    Output:
+    - delta (dict): 'nodes' (list of names) and 'edges' (list of (n1, n2) pairs) new or changed in the current graph,
+      and 'removed' (bool), True if some node or edge of the former graph is missing from it.
+    """
+    removed = any(nd not in new for nd in old.nodes) or any(not new.has_edge(n1, n2) for n1, n2 in old.edges)
+    nodes = [nd for nd, data in new.nodes(data=True) if nd not in old or _fields(old.nodes[nd]) != _fields(data)]
+    edges = [(n1, n2) for n1, n2, data in new.edges(data=True)
+             if not old.has_edge(n1, n2) or _fields(old.edges[n1, n2]) != _fields(data)]
+    return {"nodes": nodes, "edges": edges, "removed": removed}
+
+
+def _row_view(reactions):
+    # one opaque item per [n1,n2,ts] row, so that rows are compared as a whole by np.isin()
+    reactions = np.ascontiguousarray(reactions, dtype=np.int64)
+    return reactions.view(np.dtype((np.void, 3 * reactions.dtype.itemsize))).ravel()
+
+
+def reaction_delta(old, new):
+    """
+    Reaction rows added to the reactions array with respect to a former version of it.
+
+    Input:
+    - old (np.ndarray): former (n_reactions, 3) array, as read by process.read_reactions().
+    - new (np.ndarray): current array.
+
+    Output:
+    - added (np.ndarray): rows of the current array missing from the former one, in their order in the file.
+    - removed (bool): True if some row of the former array is missing from the current one.
+    """
+    if old.shape == new.shape and np.array_equal(old, new):
+        return new[:0], False
+    old_rows, new_rows = _row_view(old), _row_view(new)
+    return new[~np.isin(new_rows, old_rows)], not np.isin(old_rows, new_rows).all()
+
+
+def _edge_key(n1, n2):
+    return frozenset((n1, n2))
+
+
+def _source_rows(source, keys):
+    """
+    Rows of a data source, as dicts of column -> value, by node name (nodes) or by _edge_key() (edges).
+    """
+    data = source.data
+    if "index" in data:
+        names = list(data["index"])
+    else:
+        names = [_edge_key(n1, n2) for n1, n2 in zip(data["start"], data["end"])]
+    return {key: {col: values[ii] for col, values in data.items()} for ii, key in enumerate(names) if key in keys}
+
+
+class LiveSession:
+    """
+    Dashboard of one browser session, holding the data sources that the updates of the network are applied to.
+
+    Attributes:
+    - doc (bokeh.document.Document): document of the session.
+    - version (int): version of the network shown.
+    """
+
+    def __init__(self, doc, network):
+        self.doc = doc
+        self.network = network
+        self.build()
+
+    def build(self):
+        """
+        Builds the whole dashboard from the current state of the network, replacing the former one, if any.
+        """
+        network = self.network
+        with network.lock:
+            lay, _bk_fig, bk_graph = dashboard_view(network.R, network.positions, network.title, size=network.size,
+                                                    map_field=network.map_field)
+            self.version = network.version
+        self.node_source = bk_graph.node_renderer.data_source
+        self.edge_source = bk_graph.edge_renderer.data_source
+        self.layout_provider = bk_graph.layout_provider
+        self.node_rows = {name: ii for ii, name in enumerate(self.node_source.data["index"])}
+        self.edge_rows = {_edge_key(n1, n2): ii for ii, (n1, n2) in enumerate(zip(self.edge_source.data["start"],
+                                                                                   self.edge_source.data["end"]))}
+        self.doc.clear()
+        self.doc.add_root(lay)
+        self.doc.title = network.title
+        self.doc.template = get_env().from_string("{% extends base %}\n" + STYLE_TEMPLATE)
+
+    def push(self, update):
+        """
+        Schedules an update on the event loop of the session, as documents may only be modified from there.
+
+        Input:
+        - update (dict): see LiveNetwork.poll().
+        """
+        self.doc.add_next_tick_callback(functools.partial(self.apply, update))
+
+    def _stream_and_patch(self, source, index, rows):
+        columns = source.column_names
+        new_keys = [key for key in rows if key not in index]
+        patches = dict()
+        for key, row in rows.items():
+            if key not in index:
+                continue
+            ii = index[key]
+            for col in columns:
+                if col in row and source.data[col][ii] != row[col]:
+                    patches.setdefault(col, []).append((ii, row[col]))
+        if patches:
+            source.patch(patches)
+        if new_keys:
+            for key in new_keys:
+                index[key] = len(index)
+            source.stream({col: [rows[key].get(col) for key in new_keys] for col in columns})
+
+    def apply(self, update):
+        """
+        Applies an update of the network to the data sources of the session, rebuilding the dashboard if the update
+        does not start from the version shown or some node or edge was removed. Updates already included in the
+        dashboard, built after they were computed, are skipped.
+
+        Input:
+        - update (dict): see LiveNetwork.poll().
+        """
+        if update["to"] <= self.version:
+            return
+        if update["full"] or update["from"] != self.version:
+            self.build()
+            return
+        if update["positions"]:
+            layout = dict(self.layout_provider.graph_layout)
+            layout.update(update["positions"])
+            # the layout of a graph renderer is a single property, so the positions are sent whole
+            self.layout_provider.graph_layout = layout
+        self._stream_and_patch(self.node_source, self.node_rows, update["nodes"])
+        self._stream_and_patch(self.edge_source, self.edge_rows, update["edges"])
+        self.version = update["to"]
+
+
+class LiveNetwork:
+    """
+    Network shared by all the sessions of the live dashboard.
+
+    Attributes:
+    - G (nx.Graph): graph as loaded, with lazy geometries, to compare the next versions with.
+    - R (nx.Graph): graph as rendered, with geometries and JSmol models.
+    - positions (dict): mapping node -> (x, y).
+    - version (int): number of updates applied.
+    - sessions (list): LiveSession of every open browser session.
+    """
+
+    def __init__(self, args, config):
+        self.args = args
+        self.config = config
+        self.title = config["output"]["title"]
+        self.size = tuple(config["graph"]["size"])
+        self.map_field = config["graph"]["map_field"]
+        self.verbose = config["output"]["verbose"]
+        self.lock = threading.Lock()
+        self.sessions = []
+        self.version = 0
+        self.signature = None
+        self.reactions = None
+        self._stop = threading.Event()
+
+    def watched_files(self):
+        files = self.config["files"]
+        return [files["reactions"]["path"], files["compounds"]["path"]]
+
+    def whole_network(self):
+        """
+        True if every node of the graph shown depends on the whole network, with graph.selection or the kinetics, so
+        that updates cannot be built from the new reactions alone.
+        """
+        selection = self.config["graph"].get("selection") or {}
+        paths = selection.get("paths") or {}
+        kinetics_active = (self.config.get("kinetics") or {}).get("active", False) or self.map_field == "concentration"
+        return bool(selection.get("centers") or selection.get("max_barrier") is not None or paths.get("source")
+                    or kinetics_active)
+
+    def load(self):
+        """
+        Loads the whole network and lays it out, as for a static dashboard.
+        """
+        from .__main__ import load_network_graph
+        signature = file_signature(self.watched_files())
+        # read before the graph, so that rows written meanwhile are found again by the next poll
+        reactions = read_reactions(self.watched_files()[0])
+        G = load_network_graph(self.config, lazy_geometry=True)
+        R = G.copy()
+        resolve_geometries(R)
+        with profiling.stage("render.layout"):
+            positions = get_layout_function(self.config["graph"]["layout"], self.config["graph"].get("layout_cache"))(R)
+        with profiling.stage("render.models"):
+            arxviz.add_models(R)
+        with self.lock:
+            self.G, self.R, self.signature, self.reactions = G, R, signature, reactions
+            # barrierless edges added by the updates are numbered after those of the loaded graph
+            self.barrierless = G.number_of_edges()
+            self.positions = {nd: [float(val) for val in xy] for nd, xy in positions.items()}
+            self.version += 1
+
+    def delta_rows(self, G, delta, positions):
+        """
+        Rows of the data sources for the new and changed nodes and edges: only the subgraph they span is resolved
+        and passed through the network view of RXVisualizer, so that the rows carry the same columns as those of
+        the dashboard.
+
+        Output:
+        - sub (nx.Graph): resolved subgraph of the delta, with the JSmol models.
+        - nodes (dict), edges (dict): rows by node name and by edge, see _source_rows().
+        """
+        touched = set(delta["nodes"]).union(*[set(ed) for ed in delta["edges"]])
+        sub = G.subgraph(touched).copy()
+        resolve_geometries(sub)
+        arxviz.add_models(sub)
+        _bk_fig, bk_graph = arxviz.bokeh_network_view(sub, positions={nd: positions[nd] for nd in sub},
+                                                       graph_title=self.title, map_field=self.map_field,
+                                                       hide_energy=True)
+        nodes = _source_rows(bk_graph.node_renderer.data_source, set(delta["nodes"]))
+        edges = _source_rows(bk_graph.edge_renderer.data_source, {_edge_key(n1, n2) for n1, n2 in delta["edges"]})
+        # with the orientation of the whole graph, which the subgraph may not keep
+        for n1, n2 in delta["edges"]:
+            edges[_edge_key(n1, n2)].update(start=n1, end=n2)
+        return sub, nodes, edges
+
+    def local_delta(self, reactions, added):
+        """
+        Nodes and edges changed by the reaction rows added to the network, built from the rows of the nodes they
+        touch only: these nodes get all their edges, hence their 'degree' and 'neighbors' fields, and the edges the
+        TS of their last row, as in the graph of the whole network. Barrierless edges are named after those already
+        shown.
+
+        Input:
+        - reactions (np.ndarray): current reaction rows.
+        - added (np.ndarray): rows added since the last version, see reaction_delta().
+
+        Output:
+        - L (nx.Graph): graph of the rows of the touched nodes, with lazy geometries.
+        - delta (dict): 'nodes' and 'edges' new or changed, as in graph_delta().
+        """
+        from .__main__ import compact_graph
+        files = self.config["files"]
+        compounds = read_compounds_file(files["compounds"]["path"], files["compounds"].get("format", "json"))
+        touched = np.unique(added[:, :2])
+        local_rows = reactions[np.isin(reactions[:, 0], touched) | np.isin(reactions[:, 1], touched)]
+        local = compact_graph(local_rows, compounds, self.config)
+        name_of = dict(zip(local.node_key.tolist(), local.names))
+        L = local.to_networkx(lazy_geometry=True)
+        nodes = [name_of[key] for key in touched.tolist()]
+        edges = list({_edge_key(name_of[n1], name_of[n2]): (name_of[n1], name_of[n2])
+                      for n1, n2 in added[:, :2].tolist()}.values())
+        for n1, n2 in edges:
+            data = L.edges[n1, n2]
+            if data["tsidx"] != BARRIERLESS:
+                continue
+            if self.R.has_edge(n1, n2) and self.R.edges[n1, n2]["tsidx"] == BARRIERLESS:
+                data["name"] = self.R.edges[n1, n2]["name"]
+            else:
+                data["name"] = "TSb_%04d" % self.barrierless
+                self.barrierless += 1
+        return L, {"nodes": nodes, "edges": edges, "removed": False}
+
+    def poll(self):
+        """
+        Extracts the new reactions (if the Mongo-DB is active) and, if the reactions or compounds files changed,
+        reloads them and sends the delta to every session as an update: dict with the versions it goes 'from' and
+        'to', whether it is 'full' (nodes or edges were removed and the sessions are rebuilt), and the 'nodes',
+        'edges' and 'positions' that are new or changed. The delta is found from the reaction rows added to the
+        file (see local_delta()), unless whole_network(), where the whole graph is loaded and compared with the
+        former one (see graph_delta()).
+
+        Output:
+        - update (dict): update sent, None if the network did not change.
+        """
+        from .__main__ import update_network_files, load_network_graph
+        if self.config["db"]["active"]:
+            update_network_files(self.args, self.config)
+        signature = file_signature(self.watched_files())
+        if signature == self.signature:
+            return None
+        if self.whole_network():
+            reactions = None
+            G = load_network_graph(self.config, lazy_geometry=True)
+            delta = graph_delta(self.G, G)
+        else:
+            reactions = read_reactions(self.watched_files()[0])
+            added, removed = reaction_delta(self.reactions, reactions)
+            if removed or not len(added):
+                G, delta = None, {"nodes": [], "edges": [], "removed": removed}
+            else:
+                G, delta = self.local_delta(reactions, added)
+        if delta["removed"]:
+            self.load()
+            update = {"from": self.version - 1, "to": self.version, "full": True}
+        elif not delta["nodes"] and not delta["edges"]:
+            self.signature, self.reactions = signature, reactions
+            return None
+        else:
+            new_positions = {nd: [float(val) for val in xy]
+                             for nd, xy in place_new_nodes(G, self.positions, delta["nodes"]).items()}
+            sub, nodes, edges = self.delta_rows(G, delta, dict(self.positions, **new_positions))
+            with self.lock:
+                # the loaded graph and the rendered one take the new and changed nodes and edges
+                for graph, source in [(self.G, G), (self.R, sub)]:
+                    for nd in delta["nodes"]:
+                        graph.add_node(nd)
+                        graph.nodes[nd].clear()
+                        graph.nodes[nd].update(source.nodes[nd])
+                    for n1, n2 in delta["edges"]:
+                        graph.add_edge(n1, n2)
+                        graph.edges[n1, n2].clear()
+                        graph.edges[n1, n2].update(source.edges[n1, n2])
+                self.G.graph.update(G.graph)
+                self.positions.update(new_positions)
+                self.signature, self.reactions = signature, reactions
+                self.version += 1
+                update = {"from": self.version - 1, "to": self.version, "full": False, "nodes": nodes,
+                          "edges": edges, "positions": new_positions}
+        if self.verbose:
+            print("## Update {v}: {n} nodes and {e} edges new or changed{full}".format(
+                v=update["to"], n=len(delta["nodes"]), e=len(delta["edges"]),
+                full=", dashboards rebuilt" if update["full"] else ""))
+        for session in list(self.sessions):
+            session.push(update)
+        return update
+
+    def watch(self, interval):
+        """
+        Polls the network every interval seconds until stop() is called. Failed updates, e.g. files read while
+        they are written, are reported and tried again at the next poll.
+        """
+        while not self._stop.wait(interval):
+            try:
+                self.poll()
+            except Exception as exc:
+                print("## Update failed: {t}: {e}".format(t=type(exc).__name__, e=exc))
+
+    def stop(self):
+        self._stop.set()
+
+    def add_session(self, doc):
+        """
+        Handler of the Bokeh application, building the dashboard of a new browser session.
+        """
+        session = LiveSession(doc, self)
+        self.sessions.append(session)
+        doc.on_session_destroyed(lambda _context: self.sessions.remove(session))
+
+
+def serve_live(args, config):
+    """
+    Serves the live dashboard on a local Bokeh server until the program is interrupted, polling the network for
+    updates.
+
+    Input:
+    - args (argparse.Namespace): command line options, with port and interval (None to use the 'live' section of
+      the config file).
+    - config (dict): parameters of the config file.
+    """
+    live_config = config.get("live") or {}
+    address = live_config.get("address", "localhost")
+    port = args.port if args.port is not None else live_config.get("port", 5006)
+    interval = args.interval if args.interval is not None else live_config.get("interval", 10.0)
+    verbose = config["output"]["verbose"]
+
+    network = LiveNetwork(args, config)
+    network.load()
+    server = Server({"/": Application(FunctionHandler(network.add_session))}, address=address, port=port,
+                    allow_websocket_origin=["%s:%d" % (host, port) for host in {address, "localhost", "127.0.0.1"}])
+    server.start()
+    watcher = threading.Thread(target=network.watch, args=(float(interval),), daemon=True)
+    watcher.start()
+    if verbose:
+        print("## Live dashboard at http://{a}:{p}/, polling every {i:g} s (Ctrl+C to stop)".format(
+            a=address, p=port, i=float(interval)))
+    try:
+        server.io_loop.start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        network.stop()
+        server.stop()
@@ -0,0 +1,193 @@
+'''
+Reader of the pathfinder graphs exported by Chemoton (crn_pathfinder.json), without SCINE nor networkx. The json
+file maps every node to its attributes and to the attributes of its outgoing edges; the extraction only needs the
+';0;' reaction nodes with their elementary steps and the types of the aggregates, so the file is streamed node by
+node and the edges are dropped as soon as they are parsed.
+'''
+
+import re
+import json
+from json.decoder import scanstring
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def iter_json_object(file, chunk_size=1 << 20):
+    """
+    Streams the items of a json file holding a single object, reading it in chunks, so that only one value has to
+    be held in memory at a time.
+
+    Input:
+    - file (str): path to the json file.
+    - chunk_size (int, optional): characters read at a time. Default is 2**20.
+
+    Output:
+    - items (generator): (key, value) pairs in file order.
+    """
+    decoder = json.JSONDecoder()
+    with open(file, "r") as fjson:
+        buffer, idx, eof = "", 0, False
+
+        def ensure(n_chars):
+            # at least n_chars characters after idx, unless the end of the file is reached
+            nonlocal buffer, idx, eof
+            while len(buffer) - idx < n_chars and not eof:
+                chunk = fjson.read(max(chunk_size, n_chars))
+                eof = not chunk
+                buffer, idx = buffer[idx:] + chunk, 0
+
+        def skip_whitespace():
+            nonlocal idx
+            while True:
+                ensure(1)
+                idx = _WHITESPACE.match(buffer, idx).end()
+                if idx < len(buffer) or eof:
+                    return
+
+        def expect(chars):
+            nonlocal idx
+            skip_whitespace()
+            if idx >= len(buffer) or buffer[idx] not in chars:
+                found = buffer[idx] if idx < len(buffer) else "end of file"
+                raise ValueError("Malformed json object in %s: expected %s, found %s" % (file, " or ".join(chars),
+                                                                                     found))
+            idx += 1
+            return buffer[idx - 1]
+
+        def decode(function):
+            # decodes the next token, reading more of the file while it is incomplete
+            nonlocal idx
+            while True:
+                try:
+                    value, end = function(buffer, idx)
+                except (json.JSONDecodeError, ValueError):
+                    if eof:
+                        raise
+                    ensure(len(buffer) - idx + chunk_size)
+                    continue
+                if end == len(buffer) and not eof:
+                    # a number or literal may continue in the next chunk
+                    ensure(len(buffer) - idx + chunk_size)
+                    continue
+                idx = end
+                return value
+
+        expect("{")
+        skip_whitespace()
+        if buffer[idx:idx + 1] == "}":
+            return
+        while True:
+            expect('"')
+            key = decode(lambda text, start: scanstring(text, start))
+            expect(":")
+            skip_whitespace()
+            value = decode(decoder.raw_decode)
+            yield key, value
+            if expect(",}") == "}":
+                return
+
+
+class PathfinderIndex:
+    """
+    Index of a pathfinder graph: the elementary step of every ';0;' reaction node, in graph order, its reactant and
+    product sides, and the type ('COMPOUND' or 'FLASK') of every aggregate node.
+
+    Attributes:
+    - steps (dict): mapping reaction node id -> elementary step id, None for nodes without step.
+    - node_types (dict): mapping aggregate id -> type name.
+    - sides (dict): mapping reaction node id -> (lhs, rhs), each side named as its node in the extraction (the
+      aggregate id, or the sorted ids joined with '//' for adducts), None if the edges of the node are unknown.
+    """
+
+    def __init__(self, steps, node_types, sides=None):
+        self.steps = steps
+        self.node_types = node_types
+        self.sides = dict() if sides is None else sides
+
+    @classmethod
+    def from_graph(cls, graph):
+        """
+        Index of a pathfinder graph already in memory, e.g. one just built by Chemoton.
+
+        Input:
+        - graph (nx.DiGraph): the pathfinder graph.
+        """
+        # same layout as the json export: the outgoing edges next to the attributes of every node
+        return cls.from_nodes((node, {**dict(graph.adj[node]), **data}) for node, data in graph.nodes(data=True))
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        """
+        Input:
+        - nodes (iterable): (node id, attributes) pairs in graph order, the outgoing edges being the attributes
+          holding a dict, as in the json export.
+        """
+        steps, node_types, inputs, outputs = dict(), dict(), dict(), dict()
+        for node, data in nodes:
+            if ";0;" in node:
+                steps[node] = data.get("elementary_step_id")
+                outputs[node] = [other for other, value in data.items() if isinstance(value, dict)]
+            elif ";" not in node:
+                if "type" in data:
+                    node_types[node] = data["type"]
+                # every edge from an aggregate to a reaction node lists the other aggregates of its side
+                for other, value in data.items():
+                    if isinstance(value, dict) and ";" in other:
+                        inputs[other] = "//".join(sorted([node] + list(value.get("required_compounds") or [])))
+        # the products are the reactants of the reverse node, or the targets of the edges of the node without it
+        sides = {node: (inputs.get(node), inputs.get(node.replace(";0;", ";1;")) or
+                        ("//".join(sorted(outputs[node])) if outputs[node] else None))
+                 for node in steps}
+        return cls(steps, node_types, sides)
+
+    def reaction_nodes(self):
+        """
+        Output:
+        - reaction_nodes (list): (reaction node id, elementary step id) pairs in graph order.
+        """
+        return list(self.steps.items())
+
+
+def read_pathfinder_index(pathfinder_file, chunk_size=1 << 20):
+    """
+    Builds the index of an exported pathfinder graph, streaming the file.
+
+    Input:
+    - pathfinder_file (str): path to the json file exported by the pathfinder.
+    - chunk_size (int, optional): characters read at a time. Default is 2**20.
+
+    Output:
+    - index (PathfinderIndex): reaction nodes with their elementary steps and aggregate types.
+    """
+    return PathfinderIndex.from_nodes((node, data) for node, data in iter_json_object(pathfinder_file, chunk_size))
+
+
+def read_pathfinder_nodes(pathfinder_file):
+    """
+    Reads the node attributes of an exported pathfinder graph without building the networkx object, e.g. to compare
+    a former export with the current graph.
+
+    Input:
+      - pathfinder_file (str): path to the json file exported by the pathfinder
+
+    Returns:
+      - nodes (dict): mapping node id -> dict with the non-edge attributes ('type', 'elementary_step_id')
+    """
+    return {node: {key: value for key, value in data.items() if not isinstance(value, dict)}
+            for node, data in iter_json_object(pathfinder_file)}
+
+
+def changed_reaction_nodes(previous_steps, current_steps):
+    """
+    Finds the ';0;' reaction nodes that are new or whose elementary step changed between two pathfinder graphs.
+
+    Input:
+      - previous_steps (dict): mapping reaction node id -> elementary step id of the former graph, as in
+        PathfinderIndex.steps
+      - current_steps (dict): mapping reaction node id -> elementary step id of the current graph
+
+    Returns:
+      - changed (set): ids of the new or changed reaction nodes
+    """
+    return {node for node, step in current_steps.items()
+            if node not in previous_steps or previous_steps[node] != step}
@@ -0,0 +1,739 @@
+'''
+Processing stage: reactions and compounds files and the nx.Graph built from them, with the geometries, formulas and
+barriers of nodes and edges. Only depends on numpy and networkx.
+'''
+
+# Standard Library Imports
+import os
+import json
+import shutil
+import itertools
+
+#Third-Party Library Imports
+import numpy as np
+import networkx as nx
+from .store import CompoundStore, write_compound_store, read_compound_store
+from .geometry import BOHR_TO_ANGSTROM, geometry_blocks
+from .formulas import fragment_formula
+
+# index of the TS of barrierless reactions in the reaction arrays, written as 'None' in the reactions file
+BARRIERLESS = -1
+
+
+def reaction_array(reaction_rows):
+    """
+    Converts reaction rows into a compact integer array, whatever their origin: strings as split from the reactions
+    file ('None' for barrierless TSs), integers with None as produced by get_reactions_and_compounds(), or an array.
+
+    Input:
+      - reaction_rows (list, np.ndarray): list of [n1,n2,ts] rows
+
+    Returns:
+      - reactions (np.ndarray): (n_reactions, 3) int64 array of [n1,n2,ts] rows, with BARRIERLESS (-1) as ts of the
+        barrierless reactions
+    """
+    if isinstance(reaction_rows, np.ndarray):
+        return reaction_rows.astype(np.int64, copy=False).reshape(-1, 3)
+    return np.array([[int(r), int(p), BARRIERLESS if ts is None or ts == "None" else int(ts)]
+                     for r, p, ts in reaction_rows], dtype=np.int64).reshape(-1, 3)
+
+
+def parse_reaction_rows(reaction_tuples):
+    """
+    Converts reaction rows as read from the reactions file (strings, 'None' for barrierless TSs) into integers.
+
+    Input:
+      - reaction_tuples (list, np.ndarray): list of [n1,n2,ts] rows, or the array from read_reactions()
+
+    Returns:
+      - reaction_rows (list): list of [n1,n2,ts] rows of integers, with None for barrierless TSs
+    """
+    return [[r, p, None if ts == BARRIERLESS else ts] for r, p, ts in reaction_array(reaction_tuples).tolist()]
+
+
+def iter_reaction_chunks(reaction_file, chunk_size=100000):
+    """
+    Streams the reactions file as integer arrays of at most chunk_size rows, so that very large files are never
+    held in memory as strings.
+
+    Input:
+      - reaction_file (str): path to the reactions file
+      - chunk_size (int, optional): number of lines parsed at once. Default is 100000.
+
+    Returns:
+      - chunks (generator): (n_rows, 3) int64 arrays as described in reaction_array()
+    """
+    with open(reaction_file, "r") as freac:
+        while True:
+            lines = [line for line in itertools.islice(freac, chunk_size) if line.strip()]
+            if not lines:
+                return
+            text = "".join(lines).replace("None", str(BARRIERLESS)).replace("\n", ",").strip(",")
+            try:
+                values = np.fromstring(text, dtype=np.int64, sep=",")
+            except ValueError:  # unparsable fields, raised by recent numpy versions
+                values = None
+            if values is None or values.size != 3 * len(lines):
+                raise ValueError("Malformed reactions file %s: expected 3 integer fields per line" % reaction_file)
+            yield values.reshape(-1, 3)
+
+
+def read_reactions(reaction_file, chunk_size=100000):
+    """
+    Reads the reactions file into a single integer array.
+
+    Input:
+      - reaction_file (str): path to the reactions file
+      - chunk_size (int, optional): number of lines parsed at once. Default is 100000.
+
+    Returns:
+      - reactions (np.ndarray): (n_reactions, 3) int64 array as described in reaction_array()
+    """
+    chunks = list(iter_reaction_chunks(reaction_file, chunk_size))
+    return np.concatenate(chunks) if chunks else np.zeros((0, 3), dtype=np.int64)
+
+
+def write_reactions(reactions, reaction_file, chunk_size=100000):
+    """
+    Writes reaction rows to the reactions file in chunks, as 'n1,n2,ts' lines with 'None' for barrierless TSs.
+
+    Input:
+      - reactions (iterable, np.ndarray): [n1,n2,ts] rows in any of the forms accepted by reaction_array(), possibly
+        a generator
+      - reaction_file (str): path to the reactions file
+      - chunk_size (int, optional): number of rows formatted at once. Default is 100000.
+    """
+    if isinstance(reactions, np.ndarray):
+        chunks = (reactions[start:start + chunk_size].tolist() for start in range(0, len(reactions), chunk_size))
+    else:
+        rows = iter(reactions)
+        chunks = iter(lambda: list(itertools.islice(rows, chunk_size)), [])
+    with open(reaction_file, "w") as freac:
+        for chunk in chunks:
+            freac.write("".join("{r},{p},{ts}\n".format(r=r, p=p, ts="None" if ts is None or ts == BARRIERLESS else ts)
+                                for r, p, ts in chunk))
+
+
+def _replace_path(tmp_path, path):
+    # moves a file or store directory written aside into place, so that readers never see it half written
+    if os.path.isdir(tmp_path) and os.path.isdir(path):
+        old_path = "%s.old%d" % (path, os.getpid())
+        os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path)
+    else:
+        os.replace(tmp_path, path)
+
+def write_compound_reactions_files(html_reactions, html_compounds, reaction_file, compound_file,
+                                   compound_format="json", verbose=True):
+    """
+    Helper function to write reaction and compound files parsed from Chemoton. Both are written next to their final
+    path and moved into place, so that the compounds can be read from the store being replaced, e.g. when merging an
+    update into a former extraction.
+
+    Input:
+    - html_reactions (list, np.ndarray): list of tuples of integers of the form [n1,n2,ts] specifying the indices of
+      nodes and transition states from the set of compounds to define all elementary reactions in the network.
+    - html_compounds (dict, Mapping): dictionary mapping node/ts indices to the different computed fields that are
+      available
+    - compound_format (str, optional): either 'json' for a single json file, or 'npy' for the columnar store (a
+      directory of memory-mappable arrays). Default is 'json'.
+
+    Output:
+    - reaction_file (str): path to the reactions file
+    - compounds_file (str): path to the compounds file
+    """
+
+    if verbose: print("## Writing {f1} and {f2} files".format(f1=reaction_file, f2=compound_file))
+    tmp_reaction_file = "%s.tmp%d" % (reaction_file, os.getpid())
+    tmp_compound_file = "%s.tmp%d" % (compound_file, os.getpid())
+    write_reactions(html_reactions, tmp_reaction_file)
+
+    if compound_format == "npy":
+        write_compound_store(html_compounds, tmp_compound_file)
+    else:
+        if not isinstance(html_compounds, dict):
+            html_compounds = dict(html_compounds)
+        with open(tmp_compound_file, 'w') as file:
+            file.write(json.dumps(html_compounds))  # use `json.loads` to do the revers
+    _replace_path(tmp_reaction_file, reaction_file)
+    _replace_path(tmp_compound_file, compound_file)
+
+    return None
+
+def read_compound_reactions_files(reaction_file,compounds_file, compound_format="json", verbose=True):
+    """
+    Helper function to read reaction and compound files parsed from Chemoton.
+
+    Input:
+    - reaction_file (str): path to the reactions file
+    - compounds_file (str): path to the compounds file
+    - compound_format (str, optional): either 'json' or 'npy' (columnar store, memory-mapped). Default is 'json'.
+
+    Output:
+    - reactions (np.ndarray): (n_reactions, 3) int64 array of [n1,n2,ts] rows specifying the indices of nodes and
+      transition states from the set of compounds to define all elementary reactions in the network, with
+      BARRIERLESS (-1) as ts of barrierless reactions.
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices (int) to the different computed fields that
+      are available, as produced by get_reactions_and_compounds(). For the 'npy' format, a read-only mapping with the
+      same interface.
+    """
+
+    if verbose: print("## Reading {f1} and {f2} files".format(f1=reaction_file, f2=compounds_file))
+    reactions = read_reactions(reaction_file)
+    compounds = read_compounds_file(compounds_file, compound_format)
+
+    return reactions,compounds
+
+def read_compounds_file(compounds_file, compound_format="json"):
+    """
+    Reads the compounds file alone, see read_compound_reactions_files().
+
+    Input:
+    - compounds_file (str): path to the compounds file
+    - compound_format (str, optional): either 'json' or 'npy' (columnar store, memory-mapped). Default is 'json'.
+
+    Output:
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices (int) to the different computed fields.
+    """
+    if compound_format == "npy":
+        return read_compound_store(compounds_file)
+    with open(compounds_file,"r") as fcomp:
+        return {int(key): value for key, value in json.load(fcomp).items()}
+
+def scale_xyz_list(xyz,displ_vector=np.zeros(3)):
+    """
+    Bohr-to-angstrom scaling of a list of XYZ coordinates of the form [atom, [x, y, z]].
+
+    Input:
+    - xyz (list): XYZ coordinates, containing a list [atom, [x,y,z]] with atom being a string and x,y,z floats.
+    - displ_vector (np.Array, optional): for translating the geometry.
+
+    Output:
+    - xyz_nw (list): scaled XYZ coordinates in the same format as the input.
+    """
+
+    xyz_arr = np.array([item[1] for item in xyz]) * BOHR_TO_ANGSTROM + displ_vector
+    xyz_nw = [[item[0],list(xyz_arr[ii])] for ii,item in enumerate(xyz)]
+    return xyz_nw
+
+def xyz_list_to_xyz_block(xyz):
+    """
+    Transform a list of xyz coordinates [atom, [x, y, z]] into a string block.
+
+    Input:
+    - xyz (list): XYZ coordinates, containing a list [atom, [x,y,z]] with atom being a string and x,y,z floats.
+
+    Output:
+    - xyz_block (str): newline-joined block of the form a1,x1,y1,z2\na2,x2,y2,z2...
+    """
+
+    xyz_block = "\n".join(["%s %.6f %.6f %.6f" % (item[0],*item[1]) for item in xyz])
+    return xyz_block
+
+def formula_from_xyz_block(xyz):
+    """
+    Generates the molecular formula for a given XYZ geometry.
+
+    Input:
+    - xyz (list): XYZ coordinates, containing a list [atom, [x,y,z]] with atom being a string and x,y,z floats.
+
+    Output:
+    - formula (str): molecular formula from the input geometry.
+    """
+    return fragment_formula(item[0] for item in xyz)
+
+def sort_edge_names(edge_tuple):
+    """
+    Helper function to sort edge tuples lexicographically.
+
+    Input:
+    - edge_tuple (tuple): edge specification as a pair of node names.
+
+    Output:
+    - lexico_tuple (tuple): lexicographically sorted tuple.
+    """
+
+    n1,n2 = [int(nd) for nd in edge_tuple]
+    srt_pair = sorted([n1,n2])
+    lexico_tuple = tuple([str(nd) for nd in srt_pair])
+    return lexico_tuple
+
+def compound_fields(compounds, key, fields):
+    """
+    Reads some fields of a compound entry, without touching its geometry when using the columnar store.
+
+    Input:
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields
+    - key (int, str): node/ts index
+    - fields (list): names of the fields
+
+    Output:
+    - entry (dict): mapping field -> value
+    """
+    if isinstance(compounds, CompoundStore):
+        return compounds.get_fields(key, fields)
+    comp = compounds[key]
+    return {field: comp[field] for field in fields}
+
+def compound_ids(compounds):
+    """
+    Mapping node id -> index of all the entries of a compounds dictionary, read from the mongodb_id column when using
+    the columnar store, without rebuilding the entries.
+
+    Input:
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields
+
+    Output:
+    - cmp_dict (dict): mapping mongodb_id -> node/ts index (int)
+    """
+    if isinstance(compounds, CompoundStore):
+        return dict(zip(compounds.mongodb_id.tolist(), compounds.keys_array.tolist()))
+    return {value["mongodb_id"]: int(key) for key, value in compounds.items()}
+
+def compound_has_field(compounds, key, field):
+    """
+    Whether a compound entry holds a field, e.g. an energy type that older files were not extracted with.
+
+    Input:
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields
+    - key (int, str): node/ts index
+    - field (str): name of the field
+
+    Output:
+    - present (bool): True if the field can be read with compound_fields()
+    """
+    if isinstance(compounds, CompoundStore):
+        return field in compounds.entry_fields(key)
+    return field in compounds[key]
+
+def compound_fragments(compounds, key):
+    """
+    Geometries of the fragments of a compound entry (a single one except for adducts). For the columnar store, the
+    coordinates are views on the memory-mapped array.
+
+    Input:
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields
+    - key (int, str): node/ts index
+
+    Output:
+    - fragments (list): list of (labels, coords) tuples, with the element labels and an (n_atoms, 3) array in bohr.
+    """
+    if isinstance(compounds, CompoundStore):
+        return compounds.fragments(key)
+    comp = compounds[key]
+    xyz_list = comp["xyz"] if isinstance(comp["crn_id"], list) else [comp["xyz"]]
+    return [([item[0] for item in xyz], np.array([item[1] for item in xyz])) for xyz in xyz_list]
+
+def compound_labels(compounds, key):
+    """
+    Element labels of the fragments of a compound entry, without reading the coordinates.
+
+    Input:
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields
+    - key (int, str): node/ts index
+
+    Output:
+    - labels (list): list with the element labels of every fragment
+    """
+    if isinstance(compounds, CompoundStore):
+        return [labels for labels, _coords in compounds.fragments(key)]
+    comp = compounds[key]
+    xyz_list = comp["xyz"] if isinstance(comp["crn_id"], list) else [comp["xyz"]]
+    return [[item[0] for item in xyz] for xyz in xyz_list]
+
+def entry_formulas(compounds, keys):
+    """
+    Molecular formulas of a set of compound entries, with one ';'-separated formula per fragment. The columnar store
+    holds them in a column written with the store; otherwise every distinct structure is only counted once, as the
+    formulas are memoized by sequence of element labels.
+
+    Input:
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields
+    - keys (list): node/ts indices
+
+    Output:
+    - formulas (list): formula of every entry, in the order of keys
+    """
+    if isinstance(compounds, CompoundStore) and compounds.has_formulas():
+        return compounds.entry_formulas(keys)
+    return [";".join([fragment_formula(labels) for labels in compound_labels(compounds, key)]) for key in keys]
+
+def _as_list(value):
+    # for consistency, single elements are handled as 1-element lists
+    return value if isinstance(value, list) else [value]
+
+def node_geometry(compounds, key, dist_adduct=3.0):
+    """
+    XYZ block of a node or TS in angstrom, where the fragments of adducts are displaced to be shown together.
+
+    Input:
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields
+    - key (int, str): node/ts index
+    - dist_adduct (float, optional): distance in angstrom between the fragments of adducts.
+
+    Output:
+    - xyz_block (str): newline-joined block of the form a1,x1,y1,z2\na2,x2,y2,z2...
+    """
+    return geometry_blocks([compound_fragments(compounds, key)], dist_adduct)[0]
+
+def set_geometries(G, compounds, node_items, edge_items, dist_adduct=3.0):
+    """
+    Computes the XYZ blocks of a set of nodes and edges in a single batch and stores them in their 'geometry' field.
+
+    Input:
+    - G (nx.Graph): graph to be modified in place.
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields
+    - node_items (list): (node, compound index) pairs.
+    - edge_items (list): ((n1, n2), TS index) pairs.
+    - dist_adduct (float, optional): distance in angstrom between the fragments of adducts.
+    """
+    keys = [key for _nd, key in node_items] + [key for _ed, key in edge_items]
+    blocks = geometry_blocks([compound_fragments(compounds, key) for key in keys], dist_adduct)
+    for (nd, _key), block in zip(node_items, blocks[:len(node_items)]):
+        G.nodes[nd]["geometry"] = block
+    for (ed, _key), block in zip(edge_items, blocks[len(node_items):]):
+        G.edges[ed]["geometry"] = block
+
+def resolve_geometries(G, nodes=None, edges=None):
+    """
+    Fills the 'geometry' field of nodes and edges of a graph built by process_graph(lazy_geometry=True), reading the
+    structures from the compounds referenced in G.graph["geometry_source"]. Entries already resolved are skipped.
+
+    Input:
+    - G (nx.Graph): graph from process_graph().
+    - nodes (iterable, optional): names of the nodes to resolve. Default is None, resolving all of them.
+    - edges (iterable, optional): (n1, n2) pairs of the edges to resolve. Default is None, resolving all of them.
+
+    Output:
+    - G (nx.Graph): the same graph, modified in place.
+    """
+    if "geometry_source" not in G.graph:
+        return G
+    compounds, dist_adduct = G.graph["geometry_source"]
+    nodes = G.nodes if nodes is None else nodes
+    edges = G.edges if edges is None else edges
+    node_items = [(nd, G.nodes[nd]["cmp_idx"]) for nd in nodes if "geometry" not in G.nodes[nd]]
+    edge_items = [(ed, G.edges[ed]["tsidx"]) for ed in edges if "geometry" not in G.edges[ed]]
+    set_geometries(G, compounds, node_items, edge_items, dist_adduct)
+    if all("geometry" in data for _nd, data in G.nodes(data=True)) and \
+            all("geometry" in data for _n1, _n2, data in G.edges(data=True)):
+        del G.graph["geometry_source"]
+    return G
+
+def set_barriers(edge_data, delta_e1, delta_e2):
+    """
+    Stores the barriers of an edge as floats next to their deltaE1/deltaE2 string representations, together with
+    the node each barrier is computed from, as the order of the nodes of an edge is not kept by nx.Graph.
+
+    Input:
+    - edge_data (dict): attributes of the edge, modified in place.
+    - delta_e1, delta_e2 (tuple): (barrier, node) pairs for both sides of the reaction.
+    """
+    edge_data["barrier1"], edge_data["node1"] = float(delta_e1[0]), delta_e1[1]
+    edge_data["barrier2"], edge_data["node2"] = float(delta_e2[0]), delta_e2[1]
+
+class CompactGraph:
+    """
+    Array-backed reaction network, as built by build_compact_graph(): nodes are numbered 0..n-1 and every attribute is
+    a typed column, so that the analyses before rendering (selection, path queries) do not need one dict per node and
+    edge. The nx.Graph used by RXVisualizer is only produced by to_networkx().
+
+    Node columns:
+    - node_key (np.ndarray): int64 index of the compound of every node.
+    - names (list): name (crn_id) of every node, adducts joined with '+'.
+    - energy (np.ndarray): float64 energy of every node, from the energy field selected in build_compact_graph().
+    - charge, multiplicity, formula (np.ndarray): int32 indices of the labels of every node in labels, with one
+      ';'-separated value per fragment.
+
+    Edge columns, in the order in which the edges of process_graph() were numbered (TSb_<position>): by their first
+    node, then by their first reaction:
+    - edges (np.ndarray): (n_edges, 2) int64 node positions.
+    - edge_ts (np.ndarray): int64 index of the TS compound, BARRIERLESS for barrierless reactions.
+    - edge_names (list): crn_id of the TS, or TSb_<position> for barrierless reactions.
+    - ts_energy (np.ndarray): float64 energy of the TS, the highest of both nodes for barrierless reactions.
+    - barrier (np.ndarray): (n_edges, 2) float64 barriers from the first and from the second node.
+    - edge_charge, edge_multiplicity, edge_formula (np.ndarray): int32 label indices, -1 for barrierless reactions.
+
+    - labels (list): interned charge, multiplicity and formula strings.
+    - compounds (dict, CompoundStore), dist_adduct (float): source of the geometries, only read by to_networkx().
+    - energies (dict): mapping energy field -> float64 energy of every node (NaN where missing), for the other energy
+      types extracted with the compounds, set as node fields by to_networkx().
+    """
+
+    def __init__(self, node_key, names, energy, charge, multiplicity, formula, edges, edge_ts, edge_names, ts_energy,
+                 barrier, edge_charge, edge_multiplicity, edge_formula, labels, compounds, dist_adduct, energies=None):
+        self.node_key, self.names, self.energy = node_key, names, energy
+        self.charge, self.multiplicity, self.formula = charge, multiplicity, formula
+        self.edges, self.edge_ts, self.edge_names, self.ts_energy = edges, edge_ts, edge_names, ts_energy
+        self.barrier = barrier
+        self.edge_charge, self.edge_multiplicity, self.edge_formula = edge_charge, edge_multiplicity, edge_formula
+        self.labels = labels
+        self.compounds, self.dist_adduct = compounds, dist_adduct
+        self.energies = energies or dict()
+        self._index = None
+
+    def number_of_nodes(self):
+        return len(self.names)
+
+    def number_of_edges(self):
+        return len(self.edges)
+
+    @property
+    def index(self):
+        """
+        Mapping node name -> node position.
+        """
+        if self._index is None:
+            self._index = {name: ii for ii, name in enumerate(self.names)}
+        return self._index
+
+    @property
+    def degree(self):
+        """
+        Degree of every node, self-loops counted twice as in networkx.
+        """
+        return np.bincount(self.edges.ravel(), minlength=len(self.names))
+
+    def subgraph(self, nodes, edges=None):
+        """
+        Compact graph restricted to some nodes and, optionally, to some of the edges between them.
+
+        Input:
+        - nodes (iterable): names of the nodes to keep.
+        - edges (iterable, optional): (n1, n2) pairs of names of the edges to keep among those nodes. Default is None,
+          keeping all of them.
+
+        Output:
+        - H (CompactGraph): new compact graph, with the nodes and edges in their original order.
+        """
+        keep = np.zeros(len(self.names), dtype=bool)
+        keep[[self.index[nd] for nd in nodes]] = True
+        edge_keep = keep[self.edges].all(axis=1)
+        if edges is not None:
+            pairs = set()
+            for n1, n2 in edges:
+                if n1 in self.index and n2 in self.index:
+                    pairs.add(tuple(sorted((self.index[n1], self.index[n2]))))
+            edge_keep &= np.array([(n1, n2) in pairs for n1, n2 in np.sort(self.edges, axis=1).tolist()],
+                                  dtype=bool).reshape(-1)
+        position = np.cumsum(keep) - 1
+        kept = np.flatnonzero(keep)
+        kept_edges = np.flatnonzero(edge_keep)
+        return CompactGraph(self.node_key[kept], [self.names[ii] for ii in kept], self.energy[kept],
+                            self.charge[kept], self.multiplicity[kept], self.formula[kept],
+                            position[self.edges[kept_edges]], self.edge_ts[kept_edges],
+                            [self.edge_names[jj] for jj in kept_edges], self.ts_energy[kept_edges],
+                            self.barrier[kept_edges], self.edge_charge[kept_edges],
+                            self.edge_multiplicity[kept_edges], self.edge_formula[kept_edges],
+                            self.labels, self.compounds, self.dist_adduct,
+                            {field: values[kept] for field, values in self.energies.items()})
+
+    def topology(self):
+        """
+        Bare nx.Graph with the node names and only the barrier1/node1 and barrier2/node2 edge fields, enough for the
+        functions of the selection module.
+        """
+        T = nx.Graph()
+        T.add_nodes_from(self.names)
+        for (n1, n2), (b1, b2) in zip(self.edges.tolist(), self.barrier.tolist()):
+            T.add_edge(self.names[n1], self.names[n2], barrier1=b1, node1=self.names[n1], barrier2=b2,
+                       node2=self.names[n2])
+        return T
+
+    def to_networkx(self, lazy_geometry=False):
+        """
+        nx.Graph with the fields required by RXVisualizer, as returned by process_graph(). Nodes, edges and the
+        neighbors lists are in the order of the graph built by the former process_graph(), whose nodes were renamed
+        in place by nx.relabel_nodes(): every node re-added its edges, so that the neighbors of a node end up with
+        its self-loop first and the other nodes by position, and the edges are iterated by position of both nodes.
+
+        Input:
+        - lazy_geometry (bool, optional): if True, the 'geometry' fields are left to resolve_geometries(). Default is
+          False.
+
+        Output:
+        - G (nx.Graph): graph whose nodes are named by their crn_id.
+        """
+        labels, names = self.labels, self.names
+        node_key = self.node_key.tolist()
+        degree = self.degree.tolist()
+        energies = {field: values.tolist() for field, values in self.energies.items()}
+        G = nx.Graph()
+        node_data = []
+        for ii, (name, energy, charge, multiplicity, formula) in enumerate(zip(
+                names, self.energy.tolist(), self.charge.tolist(), self.multiplicity.tolist(), self.formula.tolist())):
+            data = {"cmp_idx": node_key[ii]} if lazy_geometry else {}
+            data.update(energy=energy, ZPVE=0.0, name=name, degree=degree[ii], charge=labels[charge],
+                        multiplicity=labels[multiplicity], formula=labels[formula])
+            for field, values in energies.items():
+                data[field] = values[ii]
+            node_data.append((name, data))
+        G.add_nodes_from(node_data)
+
+        edge_data = []
+        # self-loops first, then by position of both nodes, which sets the order of the adjacency of every node
+        low, high = self.edges.min(axis=1), self.edges.max(axis=1)
+        for jj in np.lexsort((high, low, low != high)).tolist():
+            n1, n2 = self.edges[jj].tolist()
+            ts = int(self.edge_ts[jj])
+            b1, b2 = self.barrier[jj].tolist()
+            data = {"tsidx": ts, "name": self.edge_names[jj]}
+            if ts == BARRIERLESS:
+                data.update(geometry=None, energy=0.0, ZPVE=0.0)
+            data["deltaE1"] = "%.2f (%s)" % (b1, node_key[n1])
+            data["deltaE2"] = "%.2f (%s)" % (b2, node_key[n2])
+            set_barriers(data, (b1, names[n1]), (b2, names[n2]))
+            if ts != BARRIERLESS:
+                data.update(energy=float(self.ts_energy[jj]), ZPVE=0.0, charge=labels[self.edge_charge[jj]],
+                            multiplicity=labels[self.edge_multiplicity[jj]], formula=labels[self.edge_formula[jj]])
+            edge_data.append((names[n1], names[n2], data))
+        G.add_edges_from(edge_data)
+        for nd, data in G.nodes(data=True):
+            data["neighbors"] = list(G.neighbors(nd))
+
+        if lazy_geometry:
+            G.graph["geometry_source"] = (self.compounds, self.dist_adduct)
+        else:
+            node_items = list(zip(names, node_key))
+            edge_items = [((names[n1], names[n2]), ts) for (n1, n2), ts in zip(self.edges.tolist(),
+                                                                               self.edge_ts.tolist())
+                          if ts != BARRIERLESS]
+            set_geometries(G, self.compounds, node_items, edge_items, self.dist_adduct)
+        return G
+
+
+def build_compact_graph(reaction_list, compounds, dist_adduct=3.0, energy_field="energy", energy_columns=None):
+    """
+    Builds the array-backed network from a list of reactions and a dictionary of compounds. Nodes are in order of
+    first appearance, and repeated reactions between the same pair of nodes are merged into one edge that keeps the
+    last TS, numbered as in CompactGraph; to_networkx() gives the order of the nx.Graph of process_graph(). Node energies, TS energies and barriers are read from
+    energy_field, so that another energy type extracted with the compounds is used without querying the database.
+
+    Input:
+    - reaction_list (list, np.ndarray): [n1,n2,ts] rows in any of the forms accepted by reaction_array().
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields that are
+    available, or the equivalent columnar store
+    - dist_adduct (float, optional): distance in angstrom between the fragments of adducts, used by to_networkx().
+    - energy_field (str, optional): field of the compounds with the energies, e.g. 'gibbs_free_energy'. Default is
+    'energy', the first energy type of the extraction.
+    - energy_columns (list, optional): other energy fields kept as node columns in CompactGraph.energies, if the
+    compounds hold them. Default is None.
+
+    Output:
+    - graph (CompactGraph): network with typed node and edge columns.
+    """
+    graph_fields = ["crn_id", energy_field, "charge", "multiplicity"]
+    reactions = reaction_array(reaction_list)
+
+    # nodes in order of first appearance
+    keys, first_seen = np.unique(reactions[:, :2].ravel(), return_index=True)
+    node_order = np.argsort(first_seen, kind="stable")
+    node_key = keys[node_order]
+    position = np.empty(len(keys), dtype=np.int64)
+    position[node_order] = np.arange(len(keys))
+    ends = position[np.searchsorted(keys, reactions[:, :2])].reshape(-1, 2)
+
+    # one edge per pair of nodes: first added as the first reaction, with the TS of the last one
+    low, high = ends.min(axis=1), ends.max(axis=1)
+    _codes, first_row, inverse = np.unique(low * max(len(keys), 1) + high, return_index=True, return_inverse=True)
+    last_row = np.zeros(len(first_row), dtype=np.int64)
+    np.maximum.at(last_row, inverse.ravel(), np.arange(len(reactions)))
+    # edges numbered by their first node, then by insertion in its adjacency, as nx.Graph iterated them
+    edge_order = np.lexsort((first_row, low[first_row]))
+    edges = np.stack([low[first_row], high[first_row]], axis=1)[edge_order].reshape(-1, 2)
+    edge_ts = reactions[last_row, 2][edge_order]
+
+    labels, label_index, value_index = [], dict(), dict()
+
+    def intern(label):
+        if label not in label_index:
+            label_index[label] = len(labels)
+            labels.append(label)
+        return label_index[label]
+
+    def intern_values(values):
+        # handle charge and multiplicity as strings to properly treat fragments, formatted once per distinct value
+        values = tuple(_as_list(values))
+        if values not in value_index:
+            value_index[values] = intern(";".join([str(item) for item in values]))
+        return value_index[values]
+
+    ts_keys = [ts for ts in edge_ts.tolist() if ts != BARRIERLESS]
+    formulas = entry_formulas(compounds, node_key.tolist() + ts_keys)
+    node_formulas, ts_formulas = formulas[:len(node_key)], iter(formulas[len(node_key):])
+
+    def entry_energy(comp, field):
+        values = _as_list(comp[field])
+        return np.nan if None in values else sum(values)
+
+    def selected_energy(comp):
+        value = entry_energy(comp, energy_field)
+        if np.isnan(value):
+            name = "+".join(comp["crn_id"]) if isinstance(comp["crn_id"], list) else comp["crn_id"]
+            raise ValueError("Compound %s has no %s" % (name, energy_field))
+        return value
+
+    n_nodes, n_edges = len(node_key), len(edges)
+    columns = [field for field in dict.fromkeys(energy_columns or [])
+               if field != energy_field and n_nodes and compound_has_field(compounds, int(node_key[0]), field)]
+    names = []
+    energy = np.zeros(n_nodes)
+    energies = {field: np.full(n_nodes, np.nan) for field in columns}
+    node_labels = np.zeros((n_nodes, 3), dtype=np.int32)
+    for ii, key in enumerate(node_key.tolist()):
+        comp = compound_fields(compounds, key, graph_fields + columns)
+        # adducts join the IDs of both molecules
+        names.append("+".join(comp["crn_id"]) if isinstance(comp["crn_id"], list) else comp["crn_id"])
+        energy[ii] = selected_energy(comp)
+        for field in columns:
+            energies[field][ii] = entry_energy(comp, field)
+        node_labels[ii] = (intern_values(comp["charge"]), intern_values(comp["multiplicity"]),
+                           intern(node_formulas[ii]))
+
+    edge_names = []
+    ts_energy = energy[edges].max(axis=1) if n_edges else np.zeros(0)
+    edge_labels = np.full((n_edges, 3), -1, dtype=np.int32)
+    for jj, ts in enumerate(edge_ts.tolist()):
+        if ts == BARRIERLESS:
+            edge_names.append("TSb_%04d" % jj)
+            continue
+        ts_compound = compound_fields(compounds, ts, graph_fields)
+        edge_names.append(ts_compound["crn_id"])
+        ts_energy[jj] = selected_energy(ts_compound)
+        edge_labels[jj] = (intern_values(ts_compound["charge"]), intern_values(ts_compound["multiplicity"]),
+                           intern(next(ts_formulas)))
+    barrier = ts_energy[:, None] - energy[edges] if n_edges else np.zeros((0, 2))
+
+    return CompactGraph(node_key, names, energy, node_labels[:, 0], node_labels[:, 1], node_labels[:, 2], edges,
+                        edge_ts, edge_names, ts_energy, barrier, edge_labels[:, 0], edge_labels[:, 1],
+                        edge_labels[:, 2], labels, compounds, dist_adduct, energies)
+
+
+def process_graph(reaction_list,compounds,dist_adduct=3.0,lazy_geometry=False,energy_field="energy",
+                  energy_columns=None):
+    """
+    Wrapper function to generate a nx.Graph from a list of reactions and a dictionary of compounds,
+    including XYZ-formatted geometries where individual geometries of the species forming adducts are joined.
+
+    Input:
+    - reaction_list (list, np.ndarray): [n1,n2,ts] rows specifying the indices of nodes and transition states from the
+    set of compounds to define all elementary reactions in the network, in any of the forms accepted by
+    reaction_array(), e.g. the array from read_compound_reactions_files().
+    - compounds (dict, CompoundStore): dictionary mapping node/ts indices to the different computed fields that are
+    available, or the equivalent columnar store
+    - dist_adduct (float, optional): float, distance in angstrom between the centers of mass of adduct fragments for the
+    joined 3D geometry.
+    - lazy_geometry (bool, optional): if True, the 'geometry' fields are not computed: nodes keep the index of their
+    compound in 'cmp_idx' and geometries are only built by resolve_geometries(), e.g. when rendering. Default is False.
+    - energy_field (str, optional): field of the compounds with the energies used for the nodes, TSs and barriers, e.g.
+    'gibbs_free_energy' when it was extracted. Default is 'energy'.
+    - energy_columns (list, optional): other energy fields of the compounds set as node fields, e.g. to be used as
+    map_field of build_dashboard(). Default is None.
+
+    Output:
+    - G (nx.Graph): containing network structure and the information required by RXVisualizer module to build the final
+     dashboard. Analyses that do not need it can use build_compact_graph() instead.
+    """
+    return build_compact_graph(reaction_list, compounds, dist_adduct, energy_field=energy_field,
+                               energy_columns=energy_columns).to_networkx(lazy_geometry=lazy_geometry)
@@ -0,0 +1,161 @@
+'''
+Instrumentation of the pipeline: wall time, number of calls and peak memory per stage, plus counters for the hot
+calls of the extraction (database queries per collection, energies and barriers of elementary steps). Disabled by
+default, in which case stages cost a single check.
+'''
+
+import sys
+import json
+import time
+import cProfile
+import contextlib
+from collections import defaultdict
+
+try:
+    import resource
+except ImportError:  # not available on Windows, peak memory is then not reported
+    resource = None
+
+_enabled = False
+_stages = defaultdict(lambda: {"calls": 0, "wall_time": 0.0, "peak_rss_mb": 0.0})
+_counters = defaultdict(int)
+_start_time = None
+
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident memory of the process (or of its finished children) in MB, None if it cannot be measured.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return usage / (1024.0 * 1024.0) if sys.platform == "darwin" else usage / 1024.0
+
+
+def enable():
+    """
+    Starts collecting statistics, discarding the former ones.
+    """
+    global _enabled, _start_time
+    _enabled = True
+    _start_time = time.perf_counter()
+    _stages.clear()
+    _counters.clear()
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+@contextlib.contextmanager
+def _timed_stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _stages[name]
+        stats["calls"] += 1
+        stats["wall_time"] += time.perf_counter() - start
+        stats["peak_rss_mb"] = max(stats["peak_rss_mb"], peak_rss_mb() or 0.0)
+
+
+def stage(name):
+    """
+    Context manager accounting the wall time of a block to a stage. Nested stages are accounted separately, so
+    that the time of a stage includes that of its sub-stages; dotted names are used for the latter.
+
+    Input:
+    - name (str): name of the stage, e.g. 'extract.structures'.
+    """
+    if not _enabled:
+        return contextlib.nullcontext()
+    return _timed_stage(name)
+
+
+def count(name, n=1):
+    """
+    Increments a counter, e.g. the number of queries to a collection.
+
+    Input:
+    - name (str): name of the counter.
+    - n (int, optional): increment. Default is 1.
+    """
+    if _enabled:
+        _counters[name] += n
+
+
+def snapshot():
+    """
+    Output:
+    - stats (dict): picklable copy of the stages and counters, e.g. to be sent back from a worker process.
+    """
+    return {"stages": {name: dict(stats) for name, stats in _stages.items()}, "counters": dict(_counters)}
+
+
+def merge(stats):
+    """
+    Adds the statistics collected in another process, as returned by snapshot(). Wall times are summed over the
+    workers, so they may exceed the elapsed time of the stage that ran them.
+    """
+    if not _enabled:
+        return
+    for name, worker_stats in stats["stages"].items():
+        own = _stages[name]
+        own["calls"] += worker_stats["calls"]
+        own["wall_time"] += worker_stats["wall_time"]
+        own["peak_rss_mb"] = max(own["peak_rss_mb"], worker_stats["peak_rss_mb"])
+    for name, value in stats["counters"].items():
+        _counters[name] += value
+
+
+def report():
+    """
+    Output:
+    - report (dict): total wall time, peak memory of the process and its workers, stages and counters.
+    """
+    total = time.perf_counter() - _start_time if _start_time is not None else 0.0
+    return {"total_wall_time": total, "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_mb_workers": peak_rss_mb(children=True),
+            "stages": {name: dict(stats) for name, stats in _stages.items()}, "counters": dict(_counters)}
+
+
+def write_report(report_file, verbose=True):
+    """
+    Writes the report to a json file and prints a summary of the stages.
+
+    Input:
+    - report_file (str): path to the json file.
+    """
+    data = report()
+    with open(report_file, "w") as freport:
+        json.dump(data, freport, indent=2)
+    if verbose:
+        print("## Profiling report written to {f}".format(f=report_file))
+        for name, stats in sorted(data["stages"].items(), key=lambda item: -item[1]["wall_time"]):
+            print("##   {name:<40} {t:10.3f} s {n:8d} calls".format(name=name, t=stats["wall_time"], n=stats["calls"]))
+
+
+@contextlib.contextmanager
+def cprofile(pstats_file):
+    """
+    Runs a block under cProfile and dumps the statistics to a file readable with pstats, if a file is given.
+
+    Input:
+    - pstats_file (str, None): path to the output file, None to skip profiling.
+    """
+    if not pstats_file:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(pstats_file)
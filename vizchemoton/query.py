@@ -0,0 +1,283 @@
+'''
+Path queries over a processed reaction network. The graph from process_graph() is indexed once as a CSR adjacency
+matrix of elementary steps weighted by their barriers, so that lowest-barrier and energy-span routes between sets of
+compounds are answered by Dijkstra searches on arrays, and repeated queries are served from a cache.
+'''
+
+import os
+import json
+import heapq
+import hashlib
+import itertools
+
+import numpy as np
+import networkx as nx
+import scipy.sparse
+from scipy.sparse.csgraph import dijkstra
+
+from .process import BARRIERLESS, CompactGraph
+from .selection import crossing_barrier
+
+QUERY_KINDS = ("barrier", "span")
+
+
+class PathQueryEngine:
+    """
+    Index of a reaction network for path queries. Every reaction is split into its forward and backward steps, each
+    weighted by the barrier from its starting compound (negative barriers floored to zero) and by the energy of its
+    transition state (the highest of both compounds for barrierless reactions).
+
+    Input:
+    - G (nx.Graph, CompactGraph): graph from process_graph(), with the barrier1/node1 and barrier2/node2 edge fields,
+      or from build_compact_graph(), whose columns are indexed directly.
+    """
+
+    def __init__(self, G):
+        if isinstance(G, CompactGraph):
+            self.nodes = list(G.names)
+            self.node_energy = G.energy.astype(float)
+            rows = np.concatenate([G.edges[:, 0], G.edges[:, 1]])
+            cols = np.concatenate([G.edges[:, 1], G.edges[:, 0]])
+            barriers = np.maximum(np.concatenate([G.barrier[:, 0], G.barrier[:, 1]]), 0.0)
+            ts_energies = np.concatenate([G.ts_energy, G.ts_energy])
+        else:
+            self.nodes = list(G.nodes)
+            self.node_energy = np.array([G.nodes[nd]["energy"] for nd in self.nodes], dtype=float)
+            position = {nd: ii for ii, nd in enumerate(self.nodes)}
+            rows, cols, barriers, ts_energies = [], [], [], []
+            for n1, n2, data in G.edges(data=True):
+                if data["tsidx"] != BARRIERLESS:
+                    ts_energy = data["energy"]
+                else:
+                    ts_energy = max(G.nodes[n1]["energy"], G.nodes[n2]["energy"])
+                for start, end in [(n1, n2), (n2, n1)]:
+                    rows.append(position[start])
+                    cols.append(position[end])
+                    barriers.append(max(crossing_barrier(data, start), 0.0))
+                    ts_energies.append(ts_energy)
+        self.index = {nd: ii for ii, nd in enumerate(self.nodes)}
+        n_nodes = len(self.nodes)
+        order = np.lexsort((cols, rows))
+        rows = np.array(rows, dtype=np.int64)[order]
+        self.indices = np.array(cols, dtype=np.int64)[order]
+        self.indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_nodes), out=self.indptr[1:])
+        self.barrier = np.array(barriers, dtype=float)[order]
+        self.ts_energy = np.array(ts_energies, dtype=float)[order]
+        # explicit zeros are kept as edges by scipy.sparse.csgraph, as long as the matrix is built directly
+        self.matrix = scipy.sparse.csr_matrix((self.barrier, self.indices, self.indptr), shape=(n_nodes, n_nodes))
+        self.fingerprint = self._fingerprint()
+        self._digraph = None
+        self._cache = dict()
+        self.hits, self.misses = 0, 0
+
+    def _fingerprint(self):
+        """
+        Hash of the indexed network, identifying the results that can be reused.
+        """
+        digest = hashlib.sha1("\n".join(str(nd) for nd in self.nodes).encode())
+        for array in [self.indptr, self.indices, self.barrier, self.ts_energy]:
+            digest.update(array.tobytes())
+        return digest.hexdigest()
+
+    def _node_indices(self, names):
+        missing = [nd for nd in names if nd not in self.index]
+        if missing:
+            raise KeyError("Nodes not in the network: %s" % ", ".join(str(nd) for nd in missing))
+        return [self.index[nd] for nd in names]
+
+    def _path_from_predecessors(self, predecessors, target):
+        path = [target]
+        while predecessors[path[-1]] >= 0:
+            path.append(predecessors[path[-1]])
+        return [self.nodes[ii] for ii in reversed(path)]
+
+    def lowest_barrier(self, sources, targets):
+        """
+        Path with the lowest sum of barriers from any of the sources to any of the targets, through a single
+        multi-source Dijkstra search.
+
+        Input:
+        - sources, targets (list): names (crn_id) of the nodes.
+
+        Output:
+        - result (tuple): (cost, path) with the sum of barriers and the list of node names, or (inf, []) if no
+          target can be reached.
+        """
+        src, tgt = self._node_indices(sources), self._node_indices(targets)
+        dist, predecessors, _origin = dijkstra(self.matrix, indices=src, min_only=True, return_predecessors=True)
+        best = tgt[int(np.argmin(dist[tgt]))]
+        if not np.isfinite(dist[best]):
+            return np.inf, []
+        return float(dist[best]), self._path_from_predecessors(predecessors, best)
+
+    def _minimax(self, source, targets):
+        """
+        Dijkstra variant where the cost of a path is the maximum of its transition state energies instead of their
+        sum, stopping at the first target reached.
+        """
+        n_nodes = len(self.nodes)
+        cost = np.full(n_nodes, np.inf)
+        predecessors = np.full(n_nodes, -1, dtype=np.int64)
+        done = np.zeros(n_nodes, dtype=bool)
+        cost[source] = -np.inf
+        heap = [(-np.inf, source)]
+        while heap:
+            current, ii = heapq.heappop(heap)
+            if done[ii]:
+                continue
+            done[ii] = True
+            if ii in targets:
+                return current, self._path_from_predecessors(predecessors, ii)
+            start, end = self.indptr[ii], self.indptr[ii + 1]
+            steps = np.maximum(current, self.ts_energy[start:end])
+            for jj, step_cost in zip(self.indices[start:end].tolist(), steps.tolist()):
+                if step_cost < cost[jj]:
+                    cost[jj], predecessors[jj] = step_cost, ii
+                    heapq.heappush(heap, (step_cost, jj))
+        return np.inf, []
+
+    def energy_span(self, sources, targets):
+        """
+        Path whose highest transition state, relative to the compound it starts from, is the lowest: the apparent
+        barrier of the whole route. One minimax search is run per source, as the reference energy depends on it.
+
+        Input:
+        - sources, targets (list): names (crn_id) of the nodes.
+
+        Output:
+        - result (tuple): (span, path) with the energy span of the route and the list of node names, or (inf, [])
+          if no target can be reached.
+        """
+        src, tgt = self._node_indices(sources), set(self._node_indices(targets))
+        best = (np.inf, [])
+        for ii in src:
+            highest, path = self._minimax(ii, tgt)
+            if not path:
+                continue
+            # a source that is also a target needs no reaction at all
+            span = max(highest - self.node_energy[ii], 0.0) if len(path) > 1 else 0.0
+            if span < best[0]:
+                best = (float(span), path)
+        return best
+
+    def k_lowest_barrier(self, source, target, k=1):
+        """
+        The k paths with the lowest sum of barriers between two compounds, through Yen's algorithm.
+
+        Input:
+        - source, target (str): names (crn_id) of the nodes.
+        - k (int, optional): number of paths. Default is 1.
+
+        Output:
+        - results (list): up to k (cost, path) tuples sorted by increasing cost.
+        """
+        self._node_indices([source, target])
+        if self._digraph is None:
+            self._digraph = nx.DiGraph()
+            self._digraph.add_nodes_from(range(len(self.nodes)))
+            rows = np.repeat(np.arange(len(self.nodes)), np.diff(self.indptr))
+            self._digraph.add_weighted_edges_from(zip(rows.tolist(), self.indices.tolist(), self.barrier.tolist()),
+                                                  weight="barrier")
+        results = []
+        try:
+            paths = nx.shortest_simple_paths(self._digraph, self.index[source], self.index[target], weight="barrier")
+            for path in itertools.islice(paths, k):
+                cost = sum(self._digraph.edges[ii, jj]["barrier"] for ii, jj in zip(path[:-1], path[1:]))
+                results.append((cost, [self.nodes[ii] for ii in path]))
+        except nx.NetworkXNoPath:
+            pass
+        return results
+
+    def query(self, kind, sources, targets, k=1):
+        """
+        Cached entry point for path queries.
+
+        Input:
+        - kind (str): 'barrier' for the lowest sum of barriers or 'span' for the lowest energy span.
+        - sources, targets (list): names (crn_id) of the nodes.
+        - k (int, optional): number of paths, only for 'barrier' queries between a single source and target.
+          Default is 1.
+
+        Output:
+        - results (list): (cost, path) tuples, empty if no target can be reached.
+        """
+        if kind not in QUERY_KINDS:
+            raise ValueError("Unknown query kind %s, expected one of %s" % (kind, ", ".join(QUERY_KINDS)))
+        key = (kind, tuple(sorted(sources)), tuple(sorted(targets)), k)
+        if key in self._cache:
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        if kind == "barrier" and k > 1:
+            if len(sources) != 1 or len(targets) != 1:
+                raise ValueError("k > 1 paths are only available between a single source and target")
+            results = self.k_lowest_barrier(sources[0], targets[0], k)
+        else:
+            search = self.lowest_barrier if kind == "barrier" else self.energy_span
+            cost, path = search(sources, targets)
+            results = [(cost, path)] if path else []
+        self._cache[key] = results
+        return results
+
+    def save_cache(self, cache_file):
+        """
+        Writes the cached results to a json file, tagged with the fingerprint of the network.
+
+        Input:
+        - cache_file (str): path to the json file.
+        """
+        entries = [[[kind, list(sources), list(targets), k], results]
+                   for (kind, sources, targets, k), results in self._cache.items()]
+        with open(cache_file, "w") as fcache:
+            json.dump({"fingerprint": self.fingerprint, "entries": entries}, fcache)
+
+    def load_cache(self, cache_file):
+        """
+        Reads the results cached by a former run, only if they were computed for the same network.
+
+        Input:
+        - cache_file (str): path to the json file.
+
+        Output:
+        - loaded (bool): True if the cached results were reused.
+        """
+        if not os.path.isfile(cache_file):
+            return False
+        with open(cache_file, "r") as fcache:
+            stored = json.load(fcache)
+        if stored.get("fingerprint") != self.fingerprint:
+            return False
+        for (kind, sources, targets, k), results in stored["entries"]:
+            self._cache[(kind, tuple(sources), tuple(targets), k)] = [(cost, path) for cost, path in results]
+        return True
+
+
+def parse_query_line(line):
+    """
+    Parses a query from a line of the form 'kind sources targets [k]', with comma-separated node names.
+
+    Input:
+    - line (str): line of the queries file.
+
+    Output:
+    - query (tuple): (kind, sources, targets, k).
+    """
+    fields = line.split()
+    if len(fields) not in (3, 4):
+        raise ValueError("Malformed query line: %s" % line.strip())
+    k = int(fields[3]) if len(fields) == 4 else 1
+    return fields[0], fields[1].split(","), fields[2].split(","), k
+
+
+def format_results(kind, sources, targets, results):
+    """
+    Human-readable summary of the results of a query.
+    """
+    header = "## {kind} {s} -> {t}".format(kind=kind, s=",".join(sources), t=",".join(targets))
+    if not results:
+        return header + ": no path"
+    lines = [header]
+    for cost, path in results:
+        lines.append("%10.2f  %s" % (cost, " > ".join(str(nd) for nd in path)))
+    return "\n".join(lines)
@@ -0,0 +1,167 @@
+'''
+Rendering stage: HTML dashboard of a processed graph through bokeh and RXVisualizer (amk-tools).
+'''
+
+#Third-Party Library Imports
+import networkx as nx
+import bokeh.plotting
+import bokeh.models as bkm
+import RXVisualizer as arxviz
+from .process import resolve_geometries
+from .sidecars import externalize_geometries, geometry_loader_js
+from . import profiling
+
+# Jinja2 block added to the page of the dashboard: JSmol loader and font sizes
+STYLE_TEMPLATE = """
+{% block postamble %}
+<script type="text/javascript" src="https://cdn.jsdelivr.net/gh/dgarayr/jsmol_to_bokeh/jsmol_to_bokeh.min.js"></script>
+<style>
+.bk-root .bk-btn-default {
+    font-size: 1.2vh;
+}
+.bk-root .bk-input {
+    font-size: 1.2vh;
+    padding-bottom: 5px;
+    padding-top: 5px;
+}
+.bk-root .bk {
+    font-size: 1.2vh;
+}
+.bk-root .bk-clearfix{
+    padding-bottom: 0.8vh;
+}
+</style>
+{% endblock %}
+"""
+
+# custom edge hovering to reduce noise
+HOVER_EDGE_JS = '''
+var erend = graph.edge_renderer.data_source
+var label1 = String.fromCharCode(916).concat("E1")
+var label2 = String.fromCharCode(916).concat("E2")
+if (cb_data.index.indices.length > 0) {
+    var ndx = cb_data.index.indices[0]
+    var tsname = erend.data["name"][ndx]
+    if (tsname.includes('TSb')){
+        hover.tooltips = [["tag","@name"]]
+    } else {
+        hover.tooltips = [["tag","@name"],["charge","@charge"],
+                            ["multiplicity","@multiplicity"],["formula","@formula"],
+                            [label1,"@deltaE1"],[label2,"@deltaE2"]]
+    }
+}
+'''
+
+def dashboard_view(G,positions,title,size=(1400,800),map_field="energy",base_url=None):
+    """
+    Bokeh layout of the dashboard of a graph whose nodes and edges already carry their JSmol models, without
+    writing it: the network view of RXVisualizer with the custom hovers and the highlight button.
+
+    Input:
+    - G (nx.Graph): graph with the fields of add_models() of RXVisualizer.
+    - positions (dict): mapping node -> (x, y).
+    - title (str): title for the visualization.
+    - size (tuple): tuple of integers, size of the final visualization in pixels.
+    - map_field (str): name of the field used for node coloring.
+    - base_url (str, optional): url of the geometry shards from externalize_geometries(). Default is None, inline
+      geometries.
+
+    Output:
+    - lay (bokeh.obj), bk_fig (bokeh.plotting.figure), bk_graph (bokeh.models.GraphRenderer): layout, figure and
+      graph renderer.
+    """
+    ### Define sizing
+    w1 = int(size[0]*4/7)
+    w2 = int(size[0]*3/7)
+    wu = int(size[0]/7)
+    h = int(size[1]*6/8)
+
+    sizing_dict = {'w1':w1,'w2':w2,'wu':wu,'h':h}
+
+    # Bokeh-powered visualization via RXVisualizer
+    bk_fig,bk_graph = arxviz.bokeh_network_view(G,positions=positions,graph_title=title,width=w1,height=h,
+                                                map_field=map_field,hide_energy=True)
+
+    # bk_graph.selection_policy = bkm.NodesAndLinkedEdges()
+    bk_graph.selection_policy = bkm.EdgesAndLinkedNodes()
+
+    ### Modify the hovering tools here to add additional fields, removing the previous ones first
+    valid_tools = [tool for tool in bk_fig.tools if tool.description]
+    old_hovers = [tool for tool in valid_tools if "hover" in tool.description]
+    for tool in old_hovers:
+        bk_fig.tools.remove(tool)
+
+    node_tooltips = [("tag","@name"),("charge","@charge"),("multiplicity","@multiplicity"),("formula","@formula")]
+    if G.number_of_nodes() and all("concentration" in data for _nd, data in G.nodes(data=True)):
+        # final concentrations of a kinetic simulation (see kinetics.set_concentrations)
+        node_tooltips.append(("concentration","@concentration{%.3e} M"))
+    if G.number_of_nodes() and all("cluster_size" in data for _nd, data in G.nodes(data=True)):
+        # super-nodes of an overview (see coarsen.overview_networkx)
+        node_tooltips += [("nodes","@cluster_size"),("members","@members")]
+    hover_node = bkm.HoverTool(description="Node hover",renderers=[bk_graph.node_renderer],tooltips=node_tooltips,
+                               formatters={"@energy":"printf","@concentration":"printf"})
+    bk_fig.add_tools(hover_node)
+    hover_edge = bkm.HoverTool(description="Edge hover",renderers=[bk_graph.edge_renderer],
+                               formatters={"@energy":"printf"},line_policy="interp")
+    hover_edge.callback = bkm.CustomJS(args={"hover":hover_edge,"graph":bk_graph},code=HOVER_EDGE_JS)
+    bk_fig.add_tools(hover_edge)
+
+    highl_callback = bkm.CustomJS(args={"graph":bk_graph}, code=arxviz.js_callback_dict["highlightNeighbors"])
+
+    if base_url is not None:
+        for renderer in [bk_graph.node_renderer, bk_graph.edge_renderer]:
+            source = renderer.data_source
+            source.selected.js_on_change("indices", bkm.CustomJS(args={"source":source},
+                                                                 code=geometry_loader_js(base_url)))
+
+
+    lay = arxviz.full_view_layout(bk_fig,bk_graph,sizing_dict=sizing_dict)
+
+    # add a button to the layout
+    b_highlight = bkm.Button(label="Highlight neighbors",max_width=int(w1/4),align="center")
+    b_highlight.js_on_click(highl_callback)
+
+
+    sel_row = lay.children[0][0].children[2]
+    sel_row.children = sel_row.children[0:2] + [b_highlight] + [sel_row.children[-1]]
+    return lay,bk_fig,bk_graph
+
+def build_dashboard(G,title,outfile,size=(1400,800), layout_function=nx.kamada_kawai_layout,  map_field="energy",
+                    geometry="inline", shard_size=500, verbose=True):
+    """
+    Wrapper function to generate HTML visualizations for a given network.
+
+    Input:
+    - G (nx.Graph): object as generated from RXReader. For profile support, it should contain a graph["pathList"] property.
+    - title (str): title for the visualization.
+    - outfile (str): name of the output HTML file.
+    - size (tuple): tuple of integers, size of the final visualization in pixels.
+    - layout_function (nx.object, optional): Function to generate graph layout.
+    - map_field (str): name of the field used for node coloring.
+    - geometry (str, optional): 'inline' to embed all geometries in the HTML file, or 'external' to write them to
+      compressed shards in <outfile>_geometries, fetched on selection (requires serving the files over http, see
+      serve_dashboard()). Default is 'inline'.
+    - shard_size (int, optional): number of structures per shard in 'external' mode. Default is 500.
+
+    Output:
+    - lay (bokey.obj): Bokeh layout as generated by full_view_layout()
+    """
+    if verbose: print("## Writing {f1} output file".format(f1=outfile))
+    # geometries are only needed from here on for graphs processed with lazy_geometry
+    resolve_geometries(G)
+
+    with profiling.stage("render.layout"):
+        posx = layout_function(G)
+    # Add model field to all nodes and edges & also vibrations
+    with profiling.stage("render.models"):
+        arxviz.add_models(G)
+    base_url = None
+    if geometry == "external":
+        base_url = externalize_geometries(G, outfile, shard_size=shard_size, verbose=verbose)
+
+    lay,bk_fig,bk_graph = dashboard_view(G,posx,title,size=size,map_field=map_field,base_url=base_url)
+    bokeh.plotting.output_file(outfile,title=title,mode="cdn")
+    with profiling.stage("render.save"):
+        bokeh.plotting.save(lay,template=STYLE_TEMPLATE)
+
+    return lay,bk_fig,bk_graph
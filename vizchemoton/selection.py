@@ -0,0 +1,170 @@
+'''
+Selection of the region of interest of a reaction network between process_graph() and build_dashboard(): ego networks
+around some compounds, barrier cutoffs and lowest-barrier paths, so that layout and rendering only handle the
+selected part of the graph.
+'''
+
+import itertools
+
+import networkx as nx
+
+from .process import CompactGraph
+
+
+def crossing_barrier(edge_data, node):
+    """
+    Barrier to cross an edge starting from one of its nodes.
+
+    Input:
+    - edge_data (dict): attributes of the edge, with the barrier1/node1 and barrier2/node2 fields from process_graph().
+    - node (str): name of the starting node.
+
+    Output:
+    - barrier (float): barrier of the reaction from the given node.
+    """
+    return edge_data["barrier1"] if edge_data["node1"] == node else edge_data["barrier2"]
+
+
+def ego_nodes(G, centers, radius=1):
+    """
+    Nodes at most radius reactions away from any of the centers.
+
+    Input:
+    - G (nx.Graph): graph from process_graph().
+    - centers (list): names (crn_id) of the central nodes. Unknown names raise a KeyError.
+    - radius (int, optional): number of hops. Default is 1.
+
+    Output:
+    - nodes (set): names of the selected nodes.
+    """
+    missing = [nd for nd in centers if nd not in G]
+    if missing:
+        raise KeyError("Nodes not in the network: %s" % ", ".join(str(nd) for nd in missing))
+    # unit weights: a single search from all centers at once, cut at the given number of hops
+    lengths = nx.multi_source_dijkstra_path_length(G, set(centers), cutoff=radius, weight=lambda u, v, d: 1)
+    return set(lengths)
+
+
+def barrier_edges(G, max_barrier):
+    """
+    Edges whose reaction can be crossed, in at least one direction, with a barrier not above max_barrier.
+
+    Input:
+    - G (nx.Graph): graph from process_graph().
+    - max_barrier (float): energy cutoff, in the units of the energies of the network.
+
+    Output:
+    - edges (list): (n1, n2) pairs of the selected edges.
+    """
+    return [(n1, n2) for n1, n2, data in G.edges(data=True)
+            if min(data["barrier1"], data["barrier2"]) <= max_barrier]
+
+
+def barrier_digraph(G, max_barrier=None):
+    """
+    Directed version of the network where every reaction is split into its forward and backward steps, weighted by
+    the barrier from the starting node.
+
+    Input:
+    - G (nx.Graph): graph from process_graph().
+    - max_barrier (float, optional): steps with higher barriers are left out. Default is None, keeping all of them.
+
+    Output:
+    - D (nx.DiGraph): directed graph with 'barrier' edge weights.
+    """
+    D = nx.DiGraph()
+    D.add_nodes_from(G.nodes)
+    for n1, n2, data in G.edges(data=True):
+        for start, end in [(n1, n2), (n2, n1)]:
+            barrier = crossing_barrier(data, start)
+            if max_barrier is None or barrier <= max_barrier:
+                # negative barriers (e.g. downhill barrierless steps) are floored so that Dijkstra remains valid
+                D.add_edge(start, end, barrier=max(barrier, 0.0))
+    return D
+
+
+def lowest_barrier_paths(G, source, target, k=1, max_barrier=None):
+    """
+    The k paths between two compounds with the lowest sum of barriers, through Yen's algorithm.
+
+    Input:
+    - G (nx.Graph): graph from process_graph().
+    - source, target (str): names (crn_id) of the first and last nodes.
+    - k (int, optional): number of paths. Default is 1.
+    - max_barrier (float, optional): steps with higher barriers are not used. Default is None.
+
+    Output:
+    - paths (list): up to k lists of node names, sorted by increasing cost. Empty if the nodes are not connected.
+    """
+    D = barrier_digraph(G, max_barrier)
+    try:
+        return list(itertools.islice(nx.shortest_simple_paths(D, source, target, weight="barrier"), k))
+    except (nx.NetworkXNoPath, nx.NodeNotFound):
+        return []
+
+
+def restrict_graph(G, nodes, edges=None):
+    """
+    Subgraph with the given nodes (and edges), updating the degree and neighbors fields of the nodes so that the
+    dashboard is consistent with what is shown.
+
+    Input:
+    - G (nx.Graph): graph from process_graph().
+    - nodes (iterable): names of the nodes to keep.
+    - edges (iterable, optional): (n1, n2) pairs of the edges to keep among those nodes. Default is None, all of them.
+
+    Output:
+    - H (nx.Graph): independent copy of the selected part of G.
+    """
+    H = G.subgraph(nodes)
+    if edges is not None:
+        H = H.edge_subgraph([ed for ed in edges if ed[0] in H and ed[1] in H])
+    H = H.copy()
+    for nd, data in H.nodes(data=True):
+        data["degree"] = H.degree(nd)
+        data["neighbors"] = list(H.neighbors(nd))
+    return H
+
+
+def select_subgraph(G, centers=None, radius=1, max_barrier=None, source=None, target=None, k_paths=1,
+                    verbose=True):
+    """
+    Wrapper applying the selection options from the config file, in this order: ego network around the centers,
+    barrier cutoff and lowest-barrier paths between source and target. Options left to None are skipped.
+
+    Input:
+    - G (nx.Graph, CompactGraph): graph from process_graph() or build_compact_graph().
+    - centers (list, optional): names (crn_id) of the nodes whose neighborhood is kept. Default is None.
+    - radius (int, optional): number of hops of the neighborhood. Default is 1.
+    - max_barrier (float, optional): reactions with both barriers above it are removed. Default is None.
+    - source, target (str, optional): only the nodes in the k_paths lowest-barrier paths between them are kept, if
+      they are connected. Default is None.
+    - k_paths (int, optional): number of paths. Default is 1.
+
+    Output:
+    - H (nx.Graph, CompactGraph): selected subgraph of the same type as G, G itself if no option is set.
+    """
+    if isinstance(G, CompactGraph):
+        # the selection runs on the bare topology and is then applied to the arrays
+        T = G.topology()
+        H = select_subgraph(T, centers, radius, max_barrier, source, target, k_paths, verbose=verbose)
+        return G if H is T else G.subgraph(H.nodes, H.edges)
+    H = G
+    if centers:
+        H = restrict_graph(H, ego_nodes(H, centers, radius))
+    if max_barrier is not None:
+        edges = barrier_edges(H, max_barrier)
+        H = restrict_graph(H, set(itertools.chain.from_iterable(edges)), edges)
+    if source is not None and target is not None:
+        paths = lowest_barrier_paths(H, source, target, k_paths, max_barrier)
+        if paths:
+            path_edges = set()
+            for path in paths:
+                path_edges.update(zip(path[:-1], path[1:]))
+            H = restrict_graph(H, set(itertools.chain.from_iterable(paths)), path_edges)
+        elif verbose:
+            print("## No path between {s} and {t} in the selected network, kept as it is".format(s=source, t=target))
+    if verbose and H is not G:
+        print("## Selected {n} of {n0} nodes and {e} of {e0} edges".format(
+            n=H.number_of_nodes(), n0=G.number_of_nodes(), e=H.number_of_edges(), e0=G.number_of_edges()))
+    return H
@@ -0,0 +1,145 @@
+'''
+External geometry output: the JSmol models of nodes and TSs are moved out of the dashboard HTML into gzipped json
+shards next to it, which the page fetches when a node or edge is selected. The main document then only carries the
+topology, energies and labels of the network.
+'''
+
+import os
+import glob
+import gzip
+import json
+import functools
+import http.server
+
+# attributes holding the geometry of a structure, as set by process_graph() and arxviz.add_models()
+GEOMETRY_FIELDS = ("geometry", "model")
+
+# fetches the shard of the selected structure, fills the model in the data source and selects it again, so that the
+# JSmol callback of the dashboard loads it as if it had been inline
+LOADER_JS = '''
+const base = %s
+const selected = source.selected.indices
+if (selected.length == 0 || !("geometry_ref" in source.data)) {
+    return
+}
+const ndx = selected[0]
+const ref = source.data["geometry_ref"][ndx]
+if (!ref || source.data["model"][ndx]) {
+    return
+}
+const sep = ref.indexOf("/")
+const shard = ref.slice(0, sep)
+const key = ref.slice(sep + 1)
+window.vizchemotonShards = window.vizchemotonShards || {}
+if (!(shard in window.vizchemotonShards)) {
+    window.vizchemotonShards[shard] = fetch(base + shard).then(function (resp) {
+        if (!resp.ok) {
+            throw new Error("cannot fetch " + base + shard + ": " + resp.status)
+        }
+        return resp.arrayBuffer()
+    }).then(function (buffer) {
+        const bytes = new Uint8Array(buffer)
+        // the file may reach us still compressed, depending on the Content-Encoding sent by the server
+        if (bytes[0] == 0x1f && bytes[1] == 0x8b) {
+            const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"))
+            return new Response(stream).text()
+        }
+        return new TextDecoder().decode(bytes)
+    }).then(JSON.parse)
+}
+window.vizchemotonShards[shard].then(function (entries) {
+    const entry = entries[key]
+    if (!entry || !entry["model"]) {
+        return
+    }
+    for (const field in entry) {
+        source.data[field][ndx] = entry[field]
+    }
+    source.change.emit()
+    source.selected.indices = selected.slice()
+}).catch(function (err) {
+    delete window.vizchemotonShards[shard]
+    console.error(err)
+})
+'''
+
+
+def sidecar_directory(outfile):
+    """
+    Directory holding the geometry shards of a dashboard: <name>_geometries next to the <name>.html file.
+    """
+    return os.path.splitext(outfile)[0] + "_geometries"
+
+
+def externalize_geometries(G, outfile, shard_size=500, verbose=True):
+    """
+    Moves the geometry fields of all nodes and edges of the graph to gzipped json shards, leaving empty strings in
+    their place and a 'geometry_ref' attribute (shard/key) pointing to the stored entry. Stale shards from former
+    runs are removed.
+
+    Input:
+    - G (nx.Graph): graph after arxviz.add_models(), modified in place.
+    - outfile (str): name of the output HTML file.
+    - shard_size (int, optional): number of structures per shard. Default is 500.
+
+    Output:
+    - base_url (str): url of the shard directory relative to the HTML file.
+    """
+    directory = sidecar_directory(outfile)
+    os.makedirs(directory, exist_ok=True)
+    for old_shard in glob.glob(os.path.join(directory, "shard_*.json.gz")):
+        os.remove(old_shard)
+
+    items = [("n%s" % nd, attrs) for nd, attrs in G.nodes(data=True)]
+    items += [("e%s-%s" % (n1, n2), attrs) for n1, n2, attrs in G.edges(data=True)]
+    n_stored = 0
+    for start in range(0, len(items), shard_size):
+        shard = "shard_%05d.json.gz" % (start // shard_size)
+        entries = dict()
+        for key, attrs in items[start:start + shard_size]:
+            # structures without geometry, e.g. barrierless TSs, are left as they are
+            fields = {field: attrs[field] for field in GEOMETRY_FIELDS if attrs.get(field)}
+            attrs["geometry_ref"] = "%s/%s" % (shard, key) if fields else ""
+            if not fields:
+                continue
+            entries[key] = fields
+            for field in fields:
+                attrs[field] = ""
+        n_stored += len(entries)
+        with gzip.open(os.path.join(directory, shard), "wt") as fshard:
+            json.dump(entries, fshard, separators=(",", ":"))
+    if verbose: print("## Geometries of {n} structures written to {d}".format(n=n_stored, d=directory))
+    return os.path.basename(directory) + "/"
+
+
+def geometry_loader_js(base_url):
+    """
+    JavaScript body of the CustomJS loading the geometry of the selected structure from its shard.
+
+    Input:
+    - base_url (str): url of the shard directory relative to the HTML file.
+
+    Output:
+    - code (str): code of the callback, which takes the data source as 'source' argument.
+    """
+    return LOADER_JS % json.dumps(base_url)
+
+
+def serve_dashboard(outfile, port=8000, verbose=True):
+    """
+    Serves the directory of a dashboard through a local static file server, as browsers do not allow fetching the
+    geometry shards from pages opened as file://. Runs until interrupted.
+
+    Input:
+    - outfile (str): name of the output HTML file.
+    - port (int, optional): port of the server. Default is 8000.
+    """
+    directory = os.path.dirname(os.path.abspath(outfile))
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=directory)
+    with http.server.ThreadingHTTPServer(("127.0.0.1", port), handler) as server:
+        if verbose: print("## Serving http://127.0.0.1:{p}/{f} (Ctrl+C to stop)".format(
+            p=port, f=os.path.basename(outfile)))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,294 @@
+'''
+Columnar binary store for the compounds extracted from Chemoton, alternative to the monolithic compounds.json. All
+atom coordinates are kept in a single contiguous array with per-fragment offsets, elements as small integers and the
+remaining fields as typed columns, saved as .npy files in a directory so that they can be memory-mapped. The molecular
+formula of every fragment is stored as well, so that it is not recomputed from the labels on every run.
+'''
+
+import os
+import json
+from collections.abc import Mapping
+
+import numpy as np
+
+from .formulas import fragment_formula
+
+# version 2 adds the formula column, version 3 the fields of every entry and the masks of the None values of text
+# columns, older stores are still readable
+STORE_VERSION = 3
+# fields handled by the layout of the store itself, not as fragment columns
+_STRUCTURAL_FIELDS = ("xyz", "mongodb_id")
+
+
+def _as_list(value, is_adduct):
+    return value if is_adduct else [value]
+
+
+def _column_array(values):
+    """
+    Converts the values of a fragment field into a typed array.
+
+    Input:
+    - values (list): values of the field for every fragment, None for missing ones.
+
+    Output:
+    - array (np.ndarray): int64, float64 (None stored as NaN) or unicode array.
+    - kind (str): 'int', 'float' or 'str', used to restore the original Python types.
+    - mask (np.ndarray): for 'str' columns holding None values, boolean array flagging them, otherwise None.
+    """
+    present = [val for val in values if val is not None]
+    if all(isinstance(val, (int, np.integer)) and not isinstance(val, bool) for val in present) \
+            and len(present) == len(values):
+        return np.array(values, dtype=np.int64), "int", None
+    if all(isinstance(val, (int, float, np.integer, np.floating)) and not isinstance(val, bool) for val in present):
+        return np.array([np.nan if val is None else val for val in values], dtype=np.float64), "float", None
+    mask = np.array([val is None for val in values], dtype=bool) if len(present) < len(values) else None
+    return np.array(["" if val is None else str(val) for val in values], dtype=str), "str", mask
+
+
+def write_compound_store(compounds, path):
+    """
+    Writes a compounds dictionary to the columnar store.
+
+    Input:
+    - compounds (dict): dictionary mapping node/ts indices to the different computed fields, in the format produced by
+      get_reactions_and_compounds(). Adducts hold lists with one item per fragment. Entries may hold different
+      fields, e.g. an energy type that older entries were not extracted with.
+    - path (str): directory of the store, created if missing.
+    """
+    os.makedirs(path, exist_ok=True)
+    keys, mongodb_ids, adducts, fragment_offsets, atom_offsets = [], [], [], [0], [0]
+    labels, coords, formulas = [], [], []
+    # union of the fields of every kind of entry, and the distinct field lists with the one of every entry
+    field_order = {"single": [], "adduct": []}
+    field_sets, field_set_index, entry_field_sets = [], dict(), []
+    fragment_values = dict()
+    n_fragments = 0
+
+    for key, comp in compounds.items():
+        is_adduct = isinstance(comp["crn_id"], list)
+        kind = "adduct" if is_adduct else "single"
+        fields = tuple(comp.keys())
+        if fields not in field_set_index:
+            field_set_index[fields] = len(field_sets)
+            field_sets.append(list(fields))
+            field_order[kind] += [field for field in fields if field not in field_order[kind]]
+        entry_field_sets.append(field_set_index[fields])
+        keys.append(int(key))
+        adducts.append(is_adduct)
+        mongodb_ids.append(comp["mongodb_id"])
+        xyz_list = _as_list(comp["xyz"], is_adduct)
+        for ii, xyz in enumerate(xyz_list):
+            for atom, pos in xyz:
+                labels.append(atom)
+                coords.append(pos)
+            formulas.append(fragment_formula(atom for atom, _pos in xyz))
+            atom_offsets.append(len(labels))
+            for field, value in comp.items():
+                if field in _STRUCTURAL_FIELDS:
+                    continue
+                column = fragment_values.setdefault(field, [None] * n_fragments)
+                column.append(_as_list(value, is_adduct)[ii])
+            n_fragments += 1
+            for column in fragment_values.values():
+                if len(column) < n_fragments:
+                    column.append(None)
+        fragment_offsets.append(n_fragments)
+
+    symbols = sorted(set(labels))
+    symbol_index = {sym: ii for ii, sym in enumerate(symbols)}
+    np.save(os.path.join(path, "keys.npy"), np.array(keys, dtype=np.int64))
+    np.save(os.path.join(path, "mongodb_id.npy"), np.array(mongodb_ids, dtype=str))
+    np.save(os.path.join(path, "adduct.npy"), np.array(adducts, dtype=bool))
+    np.save(os.path.join(path, "fragment_offsets.npy"), np.array(fragment_offsets, dtype=np.int64))
+    np.save(os.path.join(path, "atom_offsets.npy"), np.array(atom_offsets, dtype=np.int64))
+    np.save(os.path.join(path, "elements.npy"), np.array([symbol_index[sym] for sym in labels], dtype=np.uint8))
+    np.save(os.path.join(path, "coords.npy"), np.array(coords, dtype=np.float64).reshape(-1, 3))
+    np.save(os.path.join(path, "formula.npy"), np.array(formulas, dtype=str))
+    np.save(os.path.join(path, "field_set.npy"), np.array(entry_field_sets, dtype=np.int32))
+
+    column_kinds, masked = dict(), []
+    for field, values in fragment_values.items():
+        array, column_kinds[field], mask = _column_array(values)
+        np.save(os.path.join(path, "col_%s.npy" % field), array)
+        if mask is not None:
+            np.save(os.path.join(path, "mask_%s.npy" % field), mask)
+            masked.append(field)
+
+    meta = {"version": STORE_VERSION, "symbols": symbols, "columns": column_kinds, "fields": field_order,
+            "field_sets": field_sets, "masked": masked}
+    with open(os.path.join(path, "meta.json"), "w") as fmeta:
+        json.dump(meta, fmeta)
+
+
+class CompoundStore(Mapping):
+    """
+    Read access to a columnar compounds store. It behaves as the compounds dictionary read from compounds.json
+    (integer keys, entries rebuilt on access), and additionally gives direct access to the coordinate arrays.
+
+    Input:
+    - path (str): directory of the store.
+    - mmap (bool, optional): if True, the arrays are memory-mapped instead of read into memory. Default is True.
+    """
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as fmeta:
+            self.meta = json.load(fmeta)
+        mode = "r" if mmap else None
+        load = lambda name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mode)
+        self.keys_array = load("keys")
+        self.mongodb_id = load("mongodb_id")
+        self.adduct = load("adduct")
+        self.fragment_offsets = load("fragment_offsets")
+        self.atom_offsets = load("atom_offsets")
+        self.elements = load("elements")
+        self.coords = load("coords")
+        self.symbols = np.array(self.meta["symbols"], dtype=str)
+        self.columns = {field: load("col_" + field) for field in self.meta["columns"]}
+        self.formula = load("formula") if os.path.isfile(os.path.join(path, "formula.npy")) else None
+        # stores before version 3 hold the same fields for every entry of a kind and no masks
+        self.field_set = load("field_set") if "field_sets" in self.meta else None
+        self.masks = {field: load("mask_" + field) for field in self.meta.get("masked", [])}
+        self._index = {int(key): ii for ii, key in enumerate(self.keys_array)}
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __contains__(self, key):
+        try:
+            return int(key) in self._index
+        except (TypeError, ValueError):
+            return False
+
+    def entry_index(self, key):
+        """
+        Position of the entry for a given node/ts index (int or str) in the columns of the store.
+        """
+        return self._index[int(key)]
+
+    def is_adduct(self, key):
+        """
+        True if the entry for a given node/ts index was stored with per-fragment lists (adducts).
+        """
+        return bool(self.adduct[self.entry_index(key)])
+
+    def entry_fields(self, key):
+        """
+        Names of the fields held by the entry for a given node/ts index, in the order they were written.
+        """
+        if self.field_set is None:
+            return self.meta["fields"]["adduct" if self.is_adduct(key) else "single"]
+        return self.meta["field_sets"][int(self.field_set[self.entry_index(key)])]
+
+    def fragments(self, key):
+        """
+        Geometries of the fragments of an entry, as views on the coordinate array (no copy when memory-mapped).
+
+        Input:
+        - key (int, str): node/ts index.
+
+        Output:
+        - fragments (list): list of (labels, coords) tuples, labels being an array of element symbols and coords an
+          (n_atoms, 3) array in bohr.
+        """
+        ii = self.entry_index(key)
+        fragments = []
+        for jj in range(self.fragment_offsets[ii], self.fragment_offsets[ii + 1]):
+            start, end = self.atom_offsets[jj], self.atom_offsets[jj + 1]
+            fragments.append((self.symbols[self.elements[start:end]], self.coords[start:end]))
+        return fragments
+
+    def has_formulas(self):
+        """
+        True if the store holds the formula column (stores written since version 2).
+        """
+        return self.formula is not None
+
+    def formulas(self, key):
+        """
+        Molecular formulas of the fragments of an entry, as stored.
+
+        Input:
+        - key (int, str): node/ts index.
+
+        Output:
+        - formulas (list): formula of every fragment.
+        """
+        ii = self.entry_index(key)
+        return [str(formula) for formula in self.formula[self.fragment_offsets[ii]:self.fragment_offsets[ii + 1]]]
+
+    def entry_formulas(self, keys):
+        """
+        Formulas of several entries at once, joining those of the fragments of adducts with ';'.
+
+        Input:
+        - keys (list): node/ts indices.
+
+        Output:
+        - formulas (list): formula of every entry, in the order of keys.
+        """
+        rows = np.array([self.entry_index(key) for key in keys], dtype=np.int64)
+        start, end = self.fragment_offsets[rows], self.fragment_offsets[rows + 1]
+        formulas = self.formula[start].tolist()
+        for ii in np.flatnonzero(end - start != 1).tolist():
+            formulas[ii] = ";".join(self.formula[start[ii]:end[ii]].tolist())
+        return formulas
+
+    def _value(self, field, jj):
+        value = self.columns[field][jj]
+        kind = self.meta["columns"][field]
+        if kind == "int":
+            return int(value)
+        if kind == "float":
+            return None if np.isnan(value) else float(value)
+        if field in self.masks and self.masks[field][jj]:
+            return None
+        return str(value)
+
+    def get_fields(self, key, fields):
+        """
+        Reads some fields of an entry, e.g. without rebuilding its geometry when 'xyz' is not requested.
+
+        Input:
+        - key (int, str): node/ts index.
+        - fields (list): names of the fields.
+
+        Output:
+        - entry (dict): mapping field -> value, with per-fragment lists for adducts.
+        """
+        ii = self.entry_index(key)
+        is_adduct = bool(self.adduct[ii])
+        frag_range = range(self.fragment_offsets[ii], self.fragment_offsets[ii + 1])
+        entry = dict()
+        for field in fields:
+            if field == "mongodb_id":
+                entry[field] = str(self.mongodb_id[ii])
+                continue
+            if field == "xyz":
+                values = [[[str(sym), pos] for sym, pos in zip(labels, coords.tolist())]
+                          for labels, coords in self.fragments(key)]
+            else:
+                values = [self._value(field, jj) for jj in frag_range]
+            entry[field] = values if is_adduct else values[0]
+        return entry
+
+    def __getitem__(self, key):
+        return self.get_fields(key, self.entry_fields(key))
+
+
+def read_compound_store(path, mmap=True):
+    """
+    Opens a columnar compounds store.
+
+    Input:
+    - path (str): directory of the store.
+    - mmap (bool, optional): if True, the arrays are memory-mapped. Default is True.
+
+    Output:
+    - store (CompoundStore): mapping-like access to the compounds.
+    """
+    return CompoundStore(path, mmap=mmap)